@@ -167,7 +167,7 @@ Write-Info "Step 5: Configuring startup command..."
 az webapp config set `
     --name $WebAppName `
     --resource-group $ResourceGroupName `
-    --startup-file "gunicorn --bind=0.0.0.0 --timeout 600 app:app" `
+    --startup-file "gunicorn --bind=0.0.0.0 --timeout 120 app:app" `
     --output none
 
 Write-Success "Startup command configured."
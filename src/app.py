@@ -1,29 +1,170 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-from datetime import datetime
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context
+from flask import abort, g, has_app_context, session
+from datetime import datetime, timedelta, timezone
+import click
+import functools
+import glob
+import hashlib
+import io
 import json
 import os
 import calendar
+import math
+import threading
+import time
 import holidays
+from werkzeug.local import LocalProxy
+
+from availability import (
+    AVAILABLE,
+    REASON_NAMES,
+    availability_bits,
+    date_range,
+    encode_row,
+    first_run,
+    iter_availability_rows,
+)
+from availability_snapshot import SnapshotStore
+from change_log import ChangeJournal
+from coverage import compute_coverage, coverage_report
+from datastore import atomic_write, data_store
+from holiday_generation import HolidayHorizon, HolidayUnitCache, generate_holidays, resolved_units
+from ics_feed import FeedCache, iter_feed
+from jobs import JobRunner
+from location_index import LocationIndex
+from metrics import Metrics
+from month_cache import MonthCache, changed_holiday_months, months_between
+from ooo_import import detect_format, iter_csv_rows, iter_ics_rows, validate
+from ooo_index import OOOIndex, parse_ordinal
+from storage import SqliteStorage, TeamStorage, create_storage
+from teams import DEFAULT_TEAM, TEAM_ENVIRON_KEY, Team, TeamPrefixMiddleware, TeamRegistry
 
 app = Flask(__name__)
 app.secret_key = "your-secret-key-change-this"
+# /t/<team>/... serves the same routes for one team (see teams.py)
+app.wsgi_app = TeamPrefixMiddleware(app.wsgi_app)
 
 # Get the directory where this script is located
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Data storage (in production, use a proper database)
-DATA_DIR = os.path.join(SCRIPT_DIR, "data")
+# Data storage: "json" (files in DATA_DIR, the default) or "sqlite" (SQLITE_FILE)
+DATA_DIR = os.environ.get("DATA_DIR", os.path.join(SCRIPT_DIR, "data"))
 CONFIG_DIR = os.path.join(SCRIPT_DIR, "config")
-HOLIDAYS_FILE = os.path.join(DATA_DIR, "holidays.json")
-MEMBERS_FILE = os.path.join(DATA_DIR, "members.json")
-OOO_FILE = os.path.join(DATA_DIR, "ooo.json")
-HISTORY_FILE = os.path.join(DATA_DIR, "history.json")
 COUNTRIES_CONFIG_FILE = os.path.join(CONFIG_DIR, "countries.json")
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json")
+SQLITE_FILE = os.environ.get("SQLITE_FILE", os.path.join(DATA_DIR, "leave.db"))
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+CHANGES_FILE = os.path.join(DATA_DIR, "changes.jsonl")
+# Per-process metrics snapshots, summed by /metrics (shared by all workers)
+METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(DATA_DIR, "metrics"))
 
 # Ensure directories exist
 os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(CONFIG_DIR, exist_ok=True)
 
+# The default team's storage, which also holds the holidays shared by every team
+shared_storage = create_storage(STORAGE_BACKEND, DATA_DIR, SQLITE_FILE)
+holiday_unit_cache = HolidayUnitCache(CACHE_DIR)
+# Years of holidays are generated the first time they are viewed (see holiday_generation.py)
+holiday_horizon = HolidayHorizon(holiday_unit_cache)
+# The years the holidays library covers; others are rejected with 400 rather than shown without holidays
+MIN_YEAR = 1901
+MAX_YEAR = 2100
+
+# Rendered calendar months kept in memory per team (see month_cache.py)
+MONTH_CACHE_SIZE = 24
+
+metrics = Metrics(METRICS_DIR)
+metrics.describe("leave_http_requests_total", "counter", "HTTP requests by route, method and status")
+metrics.describe("leave_http_request_duration_seconds", "histogram", "Time to build a response, by route")
+metrics.describe("leave_storage_operations_total", "counter", "Dataset loads (calls), reads (parses) and writes")
+metrics.describe("leave_storage_bytes_total", "counter", "Bytes read and written per data file")
+metrics.describe("leave_holiday_generation_seconds", "histogram", "Time spent computing holidays, per country")
+metrics.describe("leave_cache_events_total", "counter", "Cache hits, misses, reloads, invalidations and evictions")
+metrics.describe("leave_cache_entries", "gauge", "Entries held by each cache, per worker")
+
+# Live updates (/api/events): changes are tailed from CHANGES_FILE every SSE_POLL_SECONDS. Threaded/async
+# workers hold a connection open for up to SSE_MAX_SECONDS; sync workers answer at once and the browser
+# reconnects after SSE_SYNC_RETRY_MS, so no sync worker is ever parked on a client.
+change_journal = ChangeJournal(CHANGES_FILE)
+SSE_POLL_SECONDS = 1.0
+SSE_KEEPALIVE_SECONDS = 15
+SSE_MAX_SECONDS = 60
+SSE_SYNC_RETRY_MS = 3000
+# Change kinds that reach the live calendars of every team
+SHARED_CHANGES = ("holidays_generated", "holidays_resolved", "holiday_added")
+
+# Complete .ics feed bodies kept in memory per team (see ics_feed.py)
+FEED_CACHE_SIZE = 64
+
+# Long operations run as background jobs on JOB_WORKERS threads per process (see jobs.py); the job
+# table is shared by every worker and team. Uploaded files wait in UPLOADS_DIR until their job runs.
+JOB_WORKERS = 2
+job_runner = JobRunner(os.path.join(DATA_DIR, "jobs.json"), JOB_WORKERS)
+UPLOADS_DIR = os.path.join(DATA_DIR, "uploads")
+
+# Availability snapshot shared by the workers of a team, relative to its data directory (see availability_snapshot.py)
+SNAPSHOT_FILE = os.path.join("cache", "availability.snapshot")
+
+
+def make_team(name, team_dir, team_storage):
+    """A team with empty indexes and caches over team_storage"""
+    month_cache = MonthCache(MONTH_CACHE_SIZE, team_storage.is_next_version)
+    snapshot = SnapshotStore(os.path.join(team_dir, SNAPSHOT_FILE))
+    return Team(
+        name,
+        team_dir,
+        team_storage,
+        OOOIndex(),
+        LocationIndex(),
+        month_cache,
+        FeedCache(FEED_CACHE_SIZE),
+        snapshot,
+    )
+
+
+def load_team(name, team_dir):
+    """Open the shard of a team under DATA_DIR/teams"""
+    shard = create_storage(STORAGE_BACKEND, team_dir, os.path.join(team_dir, "leave.db"))
+    return make_team(name, team_dir, TeamStorage(shard, shared_storage))
+
+
+teams = TeamRegistry(DATA_DIR, make_team(DEFAULT_TEAM, DATA_DIR, shared_storage), load_team)
+
+
+def current_team():
+    """The team of the current request or CLI command (the default team outside of one)"""
+    if has_app_context() and "team" in g:
+        return g.team
+    return teams.get(DEFAULT_TEAM)
+
+
+# The storage, indexes and caches of the current team; views only ever see their own team's data
+storage = LocalProxy(lambda: current_team().storage)
+ooo_index = LocalProxy(lambda: current_team().ooo_index)
+location_index = LocalProxy(lambda: current_team().location_index)
+month_cache = LocalProxy(lambda: current_team().month_cache)
+feed_cache = LocalProxy(lambda: current_team().feed_cache)
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 500
+# Months of history (the current one included) kept in the hot journal by roll-history
+HISTORY_KEEP_MONTHS = 3
+
+# Longest date ranges served by /api/availability (NDJSON streams rows, so it can serve more)
+AVAILABILITY_MAX_DAYS = 366
+AVAILABILITY_STREAM_MAX_DAYS = 3660
+
+# Per-row errors returned by a bulk OOO import (the total is always reported)
+IMPORT_MAX_ERRORS = 1000
+
+# Longest search range for /api/find_window
+FIND_WINDOW_MAX_DAYS = 3660
+
+# Coverage reports: longest range, and the default share of the team that must be available
+COVERAGE_MAX_DAYS = 3660
+COVERAGE_MIN_RATIO = 0.5
+
 
 def load_countries_config():
     """Load countries configuration from JSON file"""
@@ -81,65 +222,347 @@ COUNTRIES_CONFIG = load_countries_config()
 TOP_10_ECONOMIES = {code: country_data["name"] for code, country_data in COUNTRIES_CONFIG.items()}
 COUNTRY_CODE_MAP = {country_data["name"]: country_data["code"] for country_data in COUNTRIES_CONFIG.values()}
 
-# Generate regions map dynamically from holidays library
-REGIONS_MAP = generate_regions_map()
+# Regions map, generated from the holidays library on first use (see get_regions_map)
+_regions_map = None
+_regions_map_lock = threading.Lock()
 
 
-def load_data(filename, default=None):
-    """Load data from JSON file"""
-    if default is None:
-        default = {}
-    try:
-        with open(filename, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return default
+def regions_map_cache_file():
+    """Cache file for the regions map, keyed by holidays library version and countries config"""
+    config_hash = hashlib.sha256(json.dumps(COUNTRIES_CONFIG, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"regions-{holidays.__version__}-{config_hash}.json")
+
+
+def get_regions_map():
+    """Get the regions map, from memory, the cache file, or the holidays library (in that order)"""
+    global _regions_map
 
+    if _regions_map is not None:
+        return _regions_map
 
-def save_data(filename, data):
-    """Save data to JSON file"""
-    with open(filename, "w") as f:
-        json.dump(data, f, indent=2, default=str)
+    with _regions_map_lock:
+        if _regions_map is None:
+            cache_file = regions_map_cache_file()
+            try:
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    _regions_map = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                regions_map = generate_regions_map()
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                atomic_write(cache_file, lambda f: json.dump(regions_map, f, indent=2))
+                _regions_map = regions_map
+
+    return _regions_map
 
 
 def get_holidays():
-    """Get all holidays"""
-    return load_data(HOLIDAYS_FILE, {})
+    """Get all holidays (shared, read-only)"""
+    return storage.get_holidays()
 
 
 def get_members():
-    """Get all team members"""
-    return load_data(MEMBERS_FILE, {})
+    """Get all team members (shared, read-only)"""
+    return storage.get_members()
 
 
 def get_ooo():
-    """Get all out of office entries"""
-    return load_data(OOO_FILE, {})
+    """Get all out of office entries (shared, read-only)"""
+    return storage.get_ooo()
+
+
+def append_history(history_entry):
+    """Append one entry to the history"""
+    storage.append_history(history_entry)
+
+
+def get_ooo_index():
+    """Get the OOO interval index, rebuilt only when the OOO data changed since it was last synced"""
+    # The version comes with the data, so another thread's reload cannot stamp the index with a newer one
+    ooo_data, version = storage.get_versioned("ooo")
+    return ooo_index.ensure(ooo_data, version)
+
+
+def sync_ooo_index():
+    """Mark the OOO index as matching the OOO data after an incremental update.
+
+    If another worker wrote in between, the index is left stale so the next
+    get_ooo_index() rebuilds it.
+    """
+    current = storage.version("ooo")
+    ooo_index.mark_synced(current if storage.is_next_version(ooo_index.version, current) else None)
+
+
+def get_location_index():
+    """Get the (country, region) -> members index, rebuilt only when the members changed since it was last synced"""
+    # As for the OOO index, the version must be the one of the members the index is built from
+    members, version = storage.get_versioned("members")
+    return location_index.ensure(members, version)
+
+
+def sync_location_index():
+    """Mark the location index as matching the members after an incremental update (see sync_ooo_index)"""
+    current = storage.version("members")
+    location_index.mark_synced(current if storage.is_next_version(location_index.version, current) else None)
+
+
+def history_cutoff(keep_months):
+    """Timestamp before which history is archived when keep_months months (the current one included) stay hot"""
+    today = datetime.now()
+    month = today.year * 12 + today.month - 1 - (keep_months - 1)
+    return f"{month // 12:04d}-{month % 12 + 1:02d}-01 00:00:00"
+
+
+def month_versions():
+    """Versions of the datasets a calendar month is built from"""
+    return {dataset: storage.version(dataset) for dataset in ("members", "holidays", "ooo")}
+
+
+def snapshot_versions():
+    """On-disk versions of the datasets the availability snapshot is built from (nothing is loaded)"""
+    return {dataset: storage.current_version(dataset) for dataset in ("members", "holidays", "ooo")}
+
+
+def get_availability_snapshot(versions=None):
+    """Get the team's availability snapshot, rebuilt by one worker when the data changed since it was published"""
+    if versions is None:
+        versions = snapshot_versions()
+    return current_team().snapshot.get(versions, lambda: (get_members(), get_holidays(), get_ooo()))
+
+
+def sync_month_cache(dataset, months=None):
+    """Tell the month cache that this process wrote dataset, touching months (None: every month)"""
+    version = storage.version(dataset)
+    # Holidays are shared, so a holiday write touches the cached months of every team
+    caches = [team.month_cache for team in teams.loaded()] if dataset == "holidays" else [month_cache]
+    for cache in caches:
+        cache.note_write(dataset, version, months)
+
+
+def years_error(start, end):
+    """Return an error message if the dates start..end reach outside MIN_YEAR..MAX_YEAR, else None"""
+    if start.year < MIN_YEAR or end.year > MAX_YEAR:
+        return f"Dates must be between {MIN_YEAR} and {MAX_YEAR}"
+    return None
+
+
+def ensure_holiday_years(years, snapshot=None):
+    """Generate the holidays of every member location for any of years that were never generated.
+
+    The first view of a year pays for it once; later views, and other teams
+    with members at the same locations, find it in the shared holidays.
+    Given the team's availability snapshot, the years are first looked up in
+    the units it was built with, so views of resolved years load nothing.
+    Callers reject years outside MIN_YEAR..MAX_YEAR first (see years_error).
+    Returns True if the holidays may have changed, in which case data
+    versions read earlier in the request are out of date.
+    """
+    if snapshot is not None:
+        locations = [location for location in snapshot.locations() if location[0] in COUNTRY_CODE_MAP]
+        if not holiday_horizon.missing({"resolved": snapshot.resolved}, locations, list(years)):
+            return False
+    locations = [location for location in get_location_index().locations() if location[0] in COUNTRY_CODE_MAP]
+    missing = holiday_horizon.missing(get_holidays(), locations, list(years))
+    if not missing:
+        return False
+    # The ETag computed by @conditional before the view ran no longer matches the data
+    g.data_changed = True
+
+    def store(generated, units):
+        holidays_before = get_holidays()
+        storage.add_generated_holidays(generated, units)
+        sync_month_cache("holidays", changed_holiday_months(holidays_before, get_holidays()))
+
+    generated = holiday_horizon.resolve(missing, COUNTRY_CODE_MAP, get_holidays, store)
+    if generated is not None:
+        for country_code, seconds in generated["durations"].items():
+            metrics.observe("leave_holiday_generation_seconds", seconds, {"country": country_code})
+    if generated is not None and generated["units"]:
+        resolved_years = sorted({year for _, _, year in generated["units"]})
+        publish_change("holidays_resolved", start=f"{resolved_years[0]}-01-01", end=f"{resolved_years[-1]}-12-31")
+    return True
+
+
+def get_code_version():
+    """Fingerprint of everything besides the data that shapes a response (code, templates, config, library)"""
+    sources = glob.glob(os.path.join(SCRIPT_DIR, "*.py")) + glob.glob(os.path.join(SCRIPT_DIR, "templates", "*"))
+    fingerprint = [holidays.__version__, COUNTRIES_CONFIG]
+    fingerprint += [(os.path.basename(f), os.stat(f).st_mtime_ns) for f in sorted(sources)]
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+CODE_VERSION = get_code_version()
+
+
+def conditional(*datasets, key=None):
+    """Answer conditional GETs with 304 before running the view.
+
+    The ETag is derived from the current versions of the given datasets, the
+    request URL and key() (for anything else the response depends on, such as
+    today's date), so an unchanged poll costs a few stat calls instead of
+    loading the data and recomputing the body.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            # A pending flash message must be rendered, not answered with 304
+            if "_flashes" in session:
+                return view(*args, **kwargs)
+
+            versions = [storage.current_version(dataset) for dataset in datasets]
+            fingerprint = [CODE_VERSION, storage.name, current_team().name, versions, request.full_path]
+            fingerprint.append(key() if key else None)
+            etag = hashlib.sha256(json.dumps(fingerprint, default=str).encode("utf-8")).hexdigest()[:32]
+
+            last_modified = storage.last_modified(datasets) if datasets else None
+            if last_modified is not None:
+                last_modified = datetime.fromtimestamp(int(last_modified), timezone.utc)
+
+            # If-None-Match takes precedence; If-Modified-Since only applies without it
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                not_modified = (
+                    last_modified is not None
+                    and request.if_modified_since is not None
+                    and last_modified <= request.if_modified_since
+                )
+
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                # A view that changed the data (e.g. generated holidays) is answered untagged
+                if response.status_code != 200 or g.get("data_changed"):
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Let clients keep the response but revalidate it on every use
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def collect_storage_metrics():
+    """Storage I/O counters of this process, per team, for the metrics snapshot"""
+    samples = []
+    for team in teams.loaded():
+        for dataset, counters in team.storage.io_stats().items():
+            labels = {"team": team.name, "dataset": dataset, "file": counters["file"]}
+            for operation in ("loads", "reads", "writes"):
+                if operation in counters:
+                    operation_labels = dict(labels, operation=operation)
+                    samples.append(("leave_storage_operations_total", operation_labels, counters[operation]))
+            for direction in ("read", "written"):
+                if f"bytes_{direction}" in counters:
+                    direction_labels = dict(labels, direction=direction)
+                    samples.append(("leave_storage_bytes_total", direction_labels, counters[f"bytes_{direction}"]))
+    return samples
+
+
+def summed_cache_stats(caches):
+    """Add up the counters of one kind of cache over every team"""
+    total = {}
+    for cache in caches:
+        for name, value in cache.stats().items():
+            total[name] = total.get(name, 0) + value
+    return total
+
+
+def collect_cache_metrics():
+    """Cache counters and sizes of this process (all teams together), for the metrics snapshot"""
+    samples = []
+    loaded = teams.loaded()
+    month_stats = summed_cache_stats(team.month_cache for team in loaded)
+    feed_stats = summed_cache_stats(team.feed_cache for team in loaded)
+    snapshot_stats = summed_cache_stats(team.snapshot for team in loaded)
+    caches = (
+        ("data_store", data_store.stats()),
+        ("month", month_stats),
+        ("feed", feed_stats),
+        ("snapshot", snapshot_stats),
+    )
+    for cache, stats in caches:
+        for event in ("hits", "misses", "reloads", "invalidations", "evictions"):
+            if event in stats:
+                samples.append(("leave_cache_events_total", {"cache": cache, "event": event}, stats[event]))
+    samples.append(("leave_cache_entries", {"cache": "data_store"}, data_store.stats()["files"]))
+    samples.append(("leave_cache_entries", {"cache": "month"}, month_stats["size"]))
+    samples.append(("leave_cache_entries", {"cache": "feed"}, feed_stats["size"]))
+    return samples
+
+
+metrics.add_collector(collect_storage_metrics)
+metrics.add_collector(collect_cache_metrics)
+
+
+@app.before_request
+def select_team():
+    """Bind the request to the team of its /t/<team>/ prefix; unknown teams are 404"""
+    team = teams.get(request.environ.get(TEAM_ENVIRON_KEY, DEFAULT_TEAM))
+    if team is None:
+        abort(404)
+    g.team = team
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
 
+@app.after_request
+def record_request_metrics(response):
+    """Count the request and record its latency under its route pattern (not the raw URL)"""
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        labels = {"route": route, "method": request.method, "status": response.status_code}
+        metrics.inc("leave_http_requests_total", labels)
+        metrics.observe("leave_http_request_duration_seconds", time.perf_counter() - started, {"route": route})
+        metrics.flush()
+    return response
 
-def get_history():
-    """Get all history entries"""
-    return load_data(HISTORY_FILE, [])
 
+def publish_change(kind, member_id=None, start=None, end=None):
+    """Tell live calendars (any worker) that data changed; start/end bound the affected days if known.
+
+    Holiday changes concern every team; the others only the current team.
+    """
+    team = None if kind in SHARED_CHANGES else current_team().name
+    try:
+        change_journal.append({"kind": kind, "team": team, "member_id": member_id, "start": start, "end": end})
+    except OSError as e:
+        print(f"Could not record change: {e}")
 
-def save_holidays(holidays_data):
-    """Save holidays data"""
-    save_data(HOLIDAYS_FILE, holidays_data)
 
+def job_response(job):
+    """The public fields of a job, with the URL to poll for its status"""
+    fields = ("id", "kind", "status", "progress", "result", "error", "created", "started", "finished")
+    return dict({field: job.get(field) for field in fields}, status_url=url_for("api_job", job_id=job["id"]))
 
-def save_members(members):
-    """Save members data"""
-    save_data(MEMBERS_FILE, members)
 
+def submit_job(kind, params, run, on_duplicate=None):
+    """Run run(progress) as a background job of the current team and answer 202 with the job.
 
-def save_ooo(ooo):
-    """Save OOO data"""
-    save_data(OOO_FILE, ooo)
+    If an identical job is still queued or running, that job is returned
+    instead and on_duplicate() is called.
+    """
+    team = current_team()
 
+    def run_for_team(progress):
+        with app.app_context():
+            g.team = team
+            return run(progress)
 
-def save_history(history):
-    """Save history data"""
-    save_data(HISTORY_FILE, history)
+    job, created = job_runner.submit(kind, params, run_for_team, scope=team.name)
+    if not created and on_duplicate is not None:
+        on_duplicate()
+    return jsonify(dict(job_response(job), duplicate=not created)), 202
 
 
 def get_sorted_holidays():
@@ -239,8 +662,6 @@ def get_holidays_by_year():
 
 def log_operation(operation_type, member_id, details, member_name=None):
     """Log an operation to the history"""
-    history = get_history()
-
     # Get member name if not provided
     if not member_name and member_id:
         members = get_members()
@@ -254,118 +675,48 @@ def log_operation(operation_type, member_id, details, member_name=None):
         "details": details,
     }
 
-    history.append(history_entry)
-    save_history(history)
-
-
-def is_holiday(date_str, country, region=None):
-    """Check if a date is a holiday for given country/region"""
-    holidays_data = get_holidays()
-
-    # Check national holidays
-    if country in holidays_data.get("national", {}):
-        if date_str in holidays_data["national"][country]:
-            return True
-
-    # Check regional holidays
-    if region and country in holidays_data.get("regional", {}):
-        if region in holidays_data["regional"][country]:
-            if date_str in holidays_data["regional"][country][region]:
-                return True
-
-    return False
-
-
-def get_holiday_name(date_str, country, region=None):
-    """Get the name of the holiday for a given date and location"""
-    holidays_data = get_holidays()
-
-    # Check regional holidays first (more specific)
-    if region and country in holidays_data.get("regional", {}):
-        if region in holidays_data["regional"][country]:
-            if date_str in holidays_data["regional"][country][region]:
-                return holidays_data["regional"][country][region][date_str]
-
-    # Check national holidays
-    if country in holidays_data.get("national", {}):
-        if date_str in holidays_data["national"][country]:
-            return holidays_data["national"][country][date_str]
-
-    return None
-
-
-def is_member_ooo(member_id, date_str):
-    """Check if a member is out of office on a given date"""
-    ooo_data = get_ooo()
-
-    if member_id in ooo_data:
-        for ooo_entry in ooo_data[member_id]:
-            start_date = datetime.strptime(ooo_entry["start_date"], "%Y-%m-%d").date()
-            end_date = datetime.strptime(ooo_entry["end_date"], "%Y-%m-%d").date()
-            check_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-
-            if start_date <= check_date <= end_date:
-                return True
-
-    return False
+    append_history(history_entry)
 
 
 @app.route("/")
+@conditional("members", "holidays", "ooo", key=lambda: datetime.now().strftime("%Y-%m"))
 def index():
     """Main calendar view"""
     # Get current month or requested month
     year = request.args.get("year", datetime.now().year, type=int)
     month = request.args.get("month", datetime.now().month, type=int)
+    if not MIN_YEAR <= year <= MAX_YEAR or not 1 <= month <= 12:
+        abort(400, description=f"year must be between {MIN_YEAR} and {MAX_YEAR} and month between 1 and 12")
 
     # Get calendar data
     cal = calendar.monthcalendar(year, month)
     month_name = calendar.month_name[month]
 
-    # Get members and their availability
-    members = get_members()
-    availability = {}
-
-    # Calculate availability for each day of the month
-    for week in cal:
-        for day in week:
-            if day == 0:  # Empty day
-                continue
-
-            date_str = f"{year}-{month:02d}-{day:02d}"
-            availability[date_str] = {}
-
-            for member_id, member_info in members.items():
-                country = member_info["country"]
-                region = member_info.get("region")
-
-                # Check if member is available
-                is_available = True
-                reason = None
-
-                # Check holidays
-                if is_holiday(date_str, country, region):
-                    is_available = False
-                    holiday_name = get_holiday_name(date_str, country, region)
-                    reason = f"Holiday: {holiday_name}"
-
-                # Check OOO
-                elif is_member_ooo(member_id, date_str):
-                    is_available = False
-                    # Get specific OOO reason
-                    ooo_data = get_ooo()
-                    reason = "OOO"  # default
-                    if member_id in ooo_data:
-                        for ooo_entry in ooo_data[member_id]:
-                            start_date = datetime.strptime(ooo_entry["start_date"], "%Y-%m-%d").date()
-                            end_date = datetime.strptime(ooo_entry["end_date"], "%Y-%m-%d").date()
-                            check_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-                            if start_date <= check_date <= end_date:
-                                reason = f"OOO: {ooo_entry['reason']}"
-                                break
-
-                availability[date_str][member_id] = {"available": is_available, "reason": reason}
+    # The data versions are checked without loading anything; a cached page needs no data at all
+    versions = snapshot_versions()
+
+    # A page with pending flash messages is rendered fresh and not cached
+    cacheable = "_flashes" not in session
+    cached = month_cache.get(year, month, versions)
+    if cached is not None and cached["html"] is not None and cacheable:
+        return cached["html"]
+
+    # Members and their availability for every day of the month, read from the shared snapshot.
+    # A cached month was rendered after its year was resolved; otherwise resolve it, then re-read the versions
+    snapshot = get_availability_snapshot(versions)
+    if cached is None and ensure_holiday_years([year], snapshot):
+        versions = snapshot_versions()
+        cached = month_cache.get(year, month, versions)
+        snapshot = get_availability_snapshot(versions)
+    members = snapshot.members()
+    if cached is not None:
+        availability = cached["availability"]
+    else:
+        first_day = datetime(year, month, 1).date()
+        last_day = datetime(year, month, calendar.monthrange(year, month)[1]).date()
+        availability = snapshot.compute(first_day, last_day).to_calendar_dict()
 
-    return render_template(
+    html = render_template(
         "calendar.html",
         calendar_data=cal,
         year=year,
@@ -375,42 +726,49 @@ def index():
         availability=availability,
     )
 
+    # The snapshot never holds data older than versions, so the page can be cached under them
+    month_cache.put(year, month, versions, availability, html if cacheable else None)
+
+    return html
+
 
 @app.route("/members")
 def members():
     """Manage team members"""
     members_data = get_members()
     return render_template(
-        "members.html", members=members_data, top_economies=TOP_10_ECONOMIES, regions_map=REGIONS_MAP
+        "members.html", members=members_data, top_economies=TOP_10_ECONOMIES, regions_map=get_regions_map()
     )
 
 
 @app.route("/api/regions/<country>")
+@conditional()
 def get_regions(country):
     """Get regions/states for a specific country"""
-    regions = REGIONS_MAP.get(country, [])
+    regions = get_regions_map().get(country, [])
     return jsonify(regions)
 
 
 @app.route("/api/member_locations")
+@conditional("members")
 def get_member_locations():
     """Get unique countries and regions from member data"""
     try:
-        members_data = get_members()
-
-        countries = set()
-        regions = []
-
-        for member_id, member in members_data.items():
-            country = member.get("country")
-            region = member.get("region")
-
-            if country:
-                countries.add(country)
-                if region:  # Only add regions that are not empty
-                    regions.append(f"{region} ({country})")
+        index = get_location_index()
+        locations = index.locations()
+
+        countries = {country for country, region in locations if country}
+        # Only add regions that are not empty
+        regions = [f"{region} ({country})" for country, region in locations if country and region]
+
+        counts = {
+            "countries": dict(sorted(index.countries().items())),
+            "regions": {
+                f"{region} ({country})": count for (country, region), count in sorted(locations.items()) if region
+            },
+        }
 
-        return jsonify({"countries": sorted(list(countries)), "regions": sorted(regions)})
+        return jsonify({"countries": sorted(countries), "regions": sorted(regions), "counts": counts})
 
     except Exception as e:
         print(f"Error getting member locations: {e}")
@@ -419,103 +777,50 @@ def get_member_locations():
 
 @app.route("/api/generate_holidays", methods=["POST"])
 def generate_holidays_api():
-    """Generate holidays for all countries and regions in the member list for the next 2 years"""
-    try:
-        from datetime import datetime
-
-        # Always generate for current year and next year
-        current_year = datetime.now().year
-        years = [current_year, current_year + 1]
-
-        # Get all members to extract countries and regions
-        members_data = get_members()
-
-        if not members_data:
-            return jsonify({"error": "No members found. Add team members first."}), 400
-
-        # Extract unique countries and regions from member data
-        countries_in_use = set()
-        regions_in_use = []
-
-        for member_id, member in members_data.items():
-            country = member.get("country")
-            region = member.get("region")
-
-            if country:
-                countries_in_use.add(country)
-                if region:  # Only add regions that are not empty
-                    regions_in_use.append({"country": country, "region": region})
-
-        if not countries_in_use:
-            return jsonify({"error": "No countries found in member data"}), 400
-
-        # Clear all existing holidays and start fresh
-        holidays_data = {"national": {}, "regional": {}}
-
-        holiday_count = 0
-
-        # Generate national holidays for each country used by members for all years
-        for country in countries_in_use:
-            country_code = COUNTRY_CODE_MAP.get(country)
-            if not country_code:
-                continue
-
-            holidays_data["national"][country] = {}
-
-            for year in years:
-                try:
-                    # Get holidays for the country for this year
-                    country_holidays = holidays.country_holidays(country_code, years=year)
-
-                    # Add holidays to our data
-                    for date, name in country_holidays.items():
-                        date_str = date.strftime("%Y-%m-%d")
-                        holidays_data["national"][country][date_str] = name
-                        holiday_count += 1
-
-                except Exception as e:
-                    print(f"Error generating holidays for {country} in {year}: {e}")
-
-        # Generate regional holidays for regions used by members for all years
-        for region_data in regions_in_use:
-            region = region_data.get("region")
-            country = region_data.get("country")
-            country_code = COUNTRY_CODE_MAP.get(country)
-
-            if not country_code or not region:
-                continue
-
-            if country not in holidays_data["regional"]:
-                holidays_data["regional"][country] = {}
-            holidays_data["regional"][country][region] = {}
-
-            for year in years:
-                try:
-                    # Get holidays for the region using subdivision codes directly
-                    region_holidays = None
-
-                    # For different countries, the holidays library uses different parameter names
-                    if country_code == "CA":
-                        # Canada uses 'prov' parameter
-                        region_holidays = holidays.country_holidays(country_code, prov=region, years=year)
-                    else:
-                        # Most other countries use 'state' parameter (US, AU, DE, etc.)
-                        region_holidays = holidays.country_holidays(country_code, state=region, years=year)
-
-                    # Add regional holidays to our data if we got them
-                    if region_holidays:
-                        for date, name in region_holidays.items():
-                            date_str = date.strftime("%Y-%m-%d")
-                            # Only add if it's not already in national holidays
-                            if date_str not in holidays_data["national"].get(country, {}):
-                                holidays_data["regional"][country][region][date_str] = name
-                                holiday_count += 1
-
-                except Exception as e:
-                    print(f"Error generating holidays for {region}, {country} in {year}: {e}")
-
-        # Save the updated holidays
-        save_holidays(holidays_data)
+    """Regenerate the holidays of every country and region in the member list (as a job).
+
+    Covers the current and next year plus every year already resolved for
+    these locations (see ensure_holiday_years), so years viewed before are
+    refreshed too; other years are still generated when first viewed.
+    """
+    # Countries and regions in use, from the location index
+    locations_in_use = get_location_index().locations()
+
+    if not locations_in_use:
+        return jsonify({"error": "No members found. Add team members first."}), 400
+
+    countries_in_use = sorted({country for country, region in locations_in_use if country})
+    regions_in_use = [
+        {"country": country, "region": region} for country, region in locations_in_use if country and region
+    ]
+
+    if not countries_in_use:
+        return jsonify({"error": "No countries found in member data"}), 400
+
+    # One (country, region) location per country and per region in use; each is split
+    # into (country, subdivision, year) units that are cached and computed in parallel
+    locations = [(country, COUNTRY_CODE_MAP.get(country), None) for country in countries_in_use]
+    locations += [(r["country"], COUNTRY_CODE_MAP.get(r["country"]), r["region"]) for r in regions_in_use]
+    locations = [location for location in locations if location[1]]
+
+    current_year = datetime.now().year
+    years = {current_year, current_year + 1}
+    resolved = get_holidays().get("resolved", {})
+    for country, _, region in locations:
+        years.update(resolved.get(country, {}).get(region or "", []))
+    years = sorted(years)
+
+    def run(progress):
+        generated = generate_holidays(locations, years, holiday_unit_cache, progress=progress)
+        holiday_count = generated["count"]
+        for country_code, seconds in generated["durations"].items():
+            metrics.observe("leave_holiday_generation_seconds", seconds, {"country": country_code})
+
+        # Replace generated holidays; manually added holidays are kept
+        holidays_before = get_holidays()
+        storage.replace_generated_holidays(generated["holidays"], resolved_units(locations, years, generated["errors"]))
+        sync_month_cache("holidays", changed_holiday_months(holidays_before, get_holidays()))
+        publish_change("holidays_generated")
 
         # Log the operation
         countries_list = list(countries_in_use)
@@ -527,20 +832,17 @@ def generate_holidays_api():
             "System",
         )
 
-        return jsonify(
-            {
-                "success": True,
-                "count": holiday_count,
-                "years": years,
-                "countries": countries_list,
-                "regions": regions_list,
-                "message": f"Generated {holiday_count} holidays for {len(years)} years ({', '.join(map(str, years))}) covering {len(countries_list)} countries and {len(regions_list)} regions",
-            }
-        )
+        return {
+            "success": True,
+            "count": holiday_count,
+            "years": years,
+            "countries": countries_list,
+            "regions": regions_list,
+            "message": f"Generated {holiday_count} holidays for {len(years)} years ({', '.join(map(str, years))}) covering {len(countries_list)} countries and {len(regions_list)} regions",
+        }
 
-    except Exception as e:
-        print(f"Error in generate_holidays_api: {e}")
-        return jsonify({"error": "Internal server error"}), 500
+    params = {"years": years, "locations": sorted([country, region or ""] for country, _, region in locations)}
+    return submit_job("generate_holidays", params, run)
 
 
 @app.route("/add_member", methods=["POST"])
@@ -550,12 +852,14 @@ def add_member():
     country = request.form["country"]
     region = request.form.get("region", "")
 
-    members_data = get_members()
-    member_id = str(len(members_data) + 1)
-
-    members_data[member_id] = {"name": name, "country": country, "region": region}
-
-    save_members(members_data)
+    member_id = str(len(get_members()) + 1)
+    member_info = {"name": name, "country": country, "region": region}
+    locations = get_location_index()
+    storage.put_member(member_id, member_info)
+    locations.add(member_id, member_info)
+    sync_location_index()
+    sync_month_cache("members")
+    publish_change("member_added", member_id)
 
     # Log the operation
     log_operation("ADD_MEMBER", member_id, f"Added member: {name} from {country}, {region}", name)
@@ -567,38 +871,35 @@ def add_member():
 @app.route("/delete_member", methods=["POST"])
 def delete_member():
     """Delete a team member"""
-    print("Delete member endpoint called")
     try:
         data = request.get_json()
-        print(f"Received data: {data}")
         member_id = data.get("member_id")
-        print(f"Member ID: {member_id}")
 
         if not member_id:
-            print("No member ID provided")
             return jsonify({"success": False, "error": "Member ID is required"}), 400
 
         members_data = get_members()
-        print(f"Current members: {list(members_data.keys())}")
 
         if member_id not in members_data:
-            print(f"Member {member_id} not found")
             return jsonify({"success": False, "error": "Member not found"}), 404
 
         # Get member details before deletion for logging
         member_info = members_data[member_id]
         member_name = member_info["name"]
-        print(f"Deleting member: {member_name}")
-
-        # Delete the member
-        del members_data[member_id]
-        save_members(members_data)
 
-        # Also remove any OOO entries for this member
-        ooo_data = get_ooo()
-        if member_id in ooo_data:
-            del ooo_data[member_id]
-            save_ooo(ooo_data)
+        # Delete the member, along with any OOO entries for this member
+        index = get_ooo_index()
+        locations = get_location_index()
+        had_ooo = member_id in get_ooo()
+        storage.delete_member(member_id)
+        locations.remove(member_id)
+        sync_location_index()
+        sync_month_cache("members")
+        if had_ooo:
+            index.remove_member(member_id)
+            sync_ooo_index()
+            sync_month_cache("ooo")
+        publish_change("member_deleted", member_id)
 
         # Log the operation
         log_operation(
@@ -608,9 +909,7 @@ def delete_member():
             member_name,
         )
 
-        response = {"success": True, "message": f"Member {member_name} deleted successfully!"}
-        print(f"Returning response: {response}")
-        return jsonify(response)
+        return jsonify({"success": True, "message": f"Member {member_name} deleted successfully!"})
 
     except Exception as e:
         print(f"Error in delete_member: {e}")
@@ -621,6 +920,7 @@ def delete_member():
 
 
 @app.route("/holidays")
+@conditional("holidays")
 def holidays_page():
     """Manage holidays"""
     holidays_data = get_holidays()
@@ -632,21 +932,49 @@ def holidays_page():
     )
 
 
+def get_history_filters():
+    """Read history pagination and filter parameters from the query string"""
+    limit = request.args.get("limit", HISTORY_PAGE_SIZE, type=int)
+    return {
+        "limit": max(1, min(limit, HISTORY_MAX_PAGE_SIZE)),
+        "cursor": request.args.get("cursor") or None,
+        "operation_type": request.args.get("operation_type") or None,
+        "member_id": request.args.get("member_id") or None,
+        "since": request.args.get("since") or None,
+        "until": request.args.get("until") or None,
+    }
+
+
 @app.route("/history")
 def history():
-    """View operation history"""
-    history_data = get_history()
+    """View operation history (newest first, one page at a time)"""
+    filters = get_history_filters()
+    try:
+        page = storage.history_page(**filters)
+    except ValueError:
+        flash("Invalid history cursor", "error")
+        return redirect(url_for("history"))
 
-    # Sort by timestamp (newest first) - convert to datetime for proper sorting
-    def parse_timestamp(entry):
-        try:
-            return datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S")
-        except (ValueError, KeyError):
-            # Fallback for any malformed timestamps
-            return datetime.min
+    return render_template(
+        "history.html",
+        history=page["entries"],
+        next_cursor=page["next_cursor"],
+        filters=filters,
+        total=storage.history_total(),
+        operations_summary=storage.history_operation_counts(),
+    )
+
+
+@app.route("/api/history")
+def api_history():
+    """API endpoint for paginated, filtered operation history (newest first)"""
+    filters = get_history_filters()
+    try:
+        page = storage.history_page(**filters)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
 
-    history_data.sort(key=parse_timestamp, reverse=True)
-    return render_template("history.html", history=history_data)
+    return jsonify({"entries": page["entries"], "next_cursor": page["next_cursor"], "total": storage.history_total()})
 
 
 @app.route("/add_holiday", methods=["POST"])
@@ -656,25 +984,10 @@ def add_holiday():
     date_str = request.form["date"]
     country = request.form["country"]
     region = request.form.get("region", "")
-    holiday_type = "regional" if region else "national"
 
-    holidays_data = get_holidays()
-
-    # Initialize structure if needed
-    if holiday_type not in holidays_data:
-        holidays_data[holiday_type] = {}
-
-    if country not in holidays_data[holiday_type]:
-        holidays_data[holiday_type][country] = {}
-
-    if holiday_type == "regional":
-        if region not in holidays_data[holiday_type][country]:
-            holidays_data[holiday_type][country][region] = {}
-        holidays_data[holiday_type][country][region][date_str] = name
-    else:
-        holidays_data[holiday_type][country][date_str] = name
-
-    save_holidays(holidays_data)
+    storage.put_holiday(country, region, date_str, name)
+    sync_month_cache("holidays", months_between(date_str, date_str))
+    publish_change("holiday_added", start=date_str, end=date_str)
 
     # Log the operation
     location = f"{country}, {region}" if region else country
@@ -692,14 +1005,22 @@ def add_ooo():
     end_date = request.form["end_date"]
     reason = request.form.get("reason", "Vacation")
 
-    ooo_data = get_ooo()
-
-    if member_id not in ooo_data:
-        ooo_data[member_id] = []
-
-    ooo_data[member_id].append({"start_date": start_date, "end_date": end_date, "reason": reason})
-
-    save_ooo(ooo_data)
+    # Validate before writing: a stored entry with a bad date would break every rebuild of the OOO index
+    start, end = parse_ordinal(start_date), parse_ordinal(end_date)
+    if start is None or end is None:
+        return jsonify({"success": False, "error": "Invalid date, expected YYYY-MM-DD"}), 400
+    if end < start:
+        return jsonify({"success": False, "error": "end_date must not be before start_date"}), 400
+    if member_id not in get_members():
+        return jsonify({"success": False, "error": f"Unknown member id: {member_id}"}), 400
+
+    index = get_ooo_index()
+    entry = {"start_date": start_date, "end_date": end_date, "reason": reason}
+    storage.add_ooo(member_id, entry)
+    index.add(member_id, entry)
+    sync_ooo_index()
+    sync_month_cache("ooo", months_between(start_date, end_date))
+    publish_change("ooo_added", member_id, start_date, end_date)
 
     # Log the operation
     members = get_members()
@@ -714,36 +1035,114 @@ def add_ooo():
     return jsonify({"success": True, "message": "Out of office entry added successfully!"})
 
 
+def import_ooo(lines, file_format, source, default_member_id=None, dry_run=False):
+    """Validate OOO entries streamed from a CSV or iCalendar file and add them in a single write"""
+    if file_format == "ics":
+        rows = iter_ics_rows(lines, default_member_id)
+    else:
+        rows = iter_csv_rows(lines)
+
+    index = get_ooo_index()
+    result = validate(rows, get_members(), get_ooo())
+
+    if result.entries and not dry_run:
+        storage.add_ooo_many(result.entries)
+        months = set()
+        for member_id, entry in result.entries:
+            index.add(member_id, entry)
+            months |= months_between(entry["start_date"], entry["end_date"])
+        sync_ooo_index()
+        sync_month_cache("ooo", months)
+        publish_change("ooo_imported")
+
+        member_count = len({member_id for member_id, _ in result.entries})
+        log_operation(
+            "IMPORT_OOO",
+            None,
+            f"Imported {len(result.entries)} OOO entries for {member_count} members from {source}"
+            f" ({len(result.errors)} of {result.rows} rows rejected)",
+            "System",
+        )
+
+    return dict(result.to_dict(IMPORT_MAX_ERRORS), dry_run=dry_run)
+
+
+@app.route("/api/import_ooo", methods=["POST"])
+def api_import_ooo():
+    """Bulk import OOO entries from an uploaded CSV or .ics file (multipart field "file"), as a job.
+
+    Query/form parameters: format (csv or ics, default: from the file name),
+    member_id (for .ics events without X-MEMBER-ID) and dry_run=1 to only
+    validate. Invalid rows are reported and skipped; the rest are imported.
+    The job's result is the import report.
+    """
+    upload = request.files.get("file")
+    if upload is None:
+        return jsonify({"error": "Upload the file in a multipart field named 'file'"}), 400
+
+    file_format = request.values.get("format") or detect_format(upload.filename or "")
+    if file_format not in ("csv", "ics"):
+        return jsonify({"error": "format must be csv or ics"}), 400
+
+    # Keep the upload on disk until the job runs; its digest tells identical imports apart
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    upload_file = os.path.join(UPLOADS_DIR, f"{os.getpid()}-{threading.get_ident()}-{time.time_ns()}")
+    digest = hashlib.sha256()
+    with open(upload_file, "wb") as f:
+        for chunk in iter(lambda: upload.stream.read(1024 * 1024), b""):
+            digest.update(chunk)
+            f.write(chunk)
+
+    source = upload.filename or "upload"
+    default_member_id = request.values.get("member_id") or None
+    dry_run = request.values.get("dry_run") in ("1", "true")
+
+    def run(progress):
+        def counted(lines):
+            for count, line in enumerate(lines, 1):
+                progress(count, None, "Reading rows")
+                yield line
+
+        try:
+            with open(upload_file, "r", encoding="utf-8-sig", newline="") as lines:
+                result = import_ooo(counted(lines), file_format, source, default_member_id, dry_run)
+        except UnicodeDecodeError:
+            raise ValueError("The file must be UTF-8 encoded") from None
+        finally:
+            os.remove(upload_file)
+        return dict(result, success=True)
+
+    params = {
+        "sha256": digest.hexdigest(),
+        "format": file_format,
+        "source": source,
+        "member_id": default_member_id,
+        "dry_run": dry_run,
+    }
+    return submit_job("import_ooo", params, run, on_duplicate=lambda: os.remove(upload_file))
+
+
 @app.route("/delete_ooo", methods=["POST"])
 def delete_ooo():
     """Delete an out of office entry"""
     data = request.get_json()
     member_id = data["member_id"]
     target_date = data["date"]
+    target = parse_ordinal(target_date)
+    if target is None:
+        return jsonify({"success": False, "error": "Invalid date, expected YYYY-MM-DD"}), 400
 
-    ooo_data = get_ooo()
+    index = get_ooo_index()
     deleted_entry = None
 
-    if member_id in ooo_data:
-        # Find and remove the OOO entry that contains the target date
-        from datetime import datetime
-
-        target_date_obj = datetime.strptime(target_date, "%Y-%m-%d").date()
-
-        for i, entry in enumerate(ooo_data[member_id]):
-            start_date = datetime.strptime(entry["start_date"], "%Y-%m-%d").date()
-            end_date = datetime.strptime(entry["end_date"], "%Y-%m-%d").date()
-
-            if start_date <= target_date_obj <= end_date:
-                deleted_entry = ooo_data[member_id][i]
-                del ooo_data[member_id][i]
-                break
-
-        # Remove member entirely if no more OOO entries
-        if not ooo_data[member_id]:
-            del ooo_data[member_id]
-
-    save_ooo(ooo_data)
+    # Find and remove the OOO entry that contains the target date
+    interval = index.covering(member_id, target)
+    if interval is not None:
+        deleted_entry = storage.remove_ooo(member_id, interval.position, interval.entry)
+        index.remove(member_id, interval.position)
+        sync_ooo_index()
+        sync_month_cache("ooo", months_between(interval.entry["start_date"], interval.entry["end_date"]))
+        publish_change("ooo_removed", member_id, interval.entry["start_date"], interval.entry["end_date"])
 
     # Log the operation
     if deleted_entry:
@@ -759,30 +1158,26 @@ def delete_ooo():
 @app.route("/api/ooo_details/<member_id>/<date>")
 def get_ooo_details(member_id, date):
     """Get detailed OOO information for a specific member and date"""
-    from datetime import datetime
-
     ooo_data = get_ooo()
     members_data = get_members()
 
+    day = parse_ordinal(date)
+    if day is None:
+        return jsonify({"success": False, "error": "Invalid date, expected YYYY-MM-DD"}), 400
+
     if member_id not in ooo_data:
         return jsonify({"success": False, "error": "No OOO data found for this member"})
 
-    target_date_obj = datetime.strptime(date, "%Y-%m-%d").date()
-
-    for entry in ooo_data[member_id]:
-        start_date = datetime.strptime(entry["start_date"], "%Y-%m-%d").date()
-        end_date = datetime.strptime(entry["end_date"], "%Y-%m-%d").date()
-
-        if start_date <= target_date_obj <= end_date:
-            duration = (end_date - start_date).days + 1
-            return jsonify(
-                {
-                    "success": True,
-                    "entry": entry,
-                    "member_name": members_data.get(member_id, {}).get("name", "Unknown"),
-                    "duration": duration,
-                }
-            )
+    interval = get_ooo_index().covering(member_id, day)
+    if interval is not None:
+        return jsonify(
+            {
+                "success": True,
+                "entry": interval.entry,
+                "member_name": members_data.get(member_id, {}).get("name", "Unknown"),
+                "duration": interval.duration,
+            }
+        )
 
     return jsonify({"success": False, "error": "No OOO entry found for this date"})
 
@@ -790,35 +1185,25 @@ def get_ooo_details(member_id, date):
 @app.route("/cancel_vacation", methods=["POST"])
 def cancel_vacation():
     """Cancel an entire vacation/OOO period"""
-    from datetime import datetime
-
     data = request.get_json()
     member_id = data["member_id"]
     start_date_str = data["start_date"]
     end_date_str = data["end_date"]
+    start, end = parse_ordinal(start_date_str), parse_ordinal(end_date_str)
+    if start is None or end is None:
+        return jsonify({"success": False, "error": "Invalid date, expected YYYY-MM-DD"}), 400
 
-    ooo_data = get_ooo()
+    index = get_ooo_index()
     canceled_entry = None
 
-    if member_id in ooo_data:
-        start_date_obj = datetime.strptime(start_date_str, "%Y-%m-%d").date()
-        end_date_obj = datetime.strptime(end_date_str, "%Y-%m-%d").date()
-
-        # Find and remove the matching vacation entry
-        for i, entry in enumerate(ooo_data[member_id]):
-            entry_start = datetime.strptime(entry["start_date"], "%Y-%m-%d").date()
-            entry_end = datetime.strptime(entry["end_date"], "%Y-%m-%d").date()
-
-            if entry_start == start_date_obj and entry_end == end_date_obj:
-                canceled_entry = ooo_data[member_id][i]
-                del ooo_data[member_id][i]
-                break
-
-        # Remove member entirely if no more OOO entries
-        if not ooo_data[member_id]:
-            del ooo_data[member_id]
-
-    save_ooo(ooo_data)
+    # Find and remove the matching vacation entry
+    interval = index.find_exact(member_id, start, end)
+    if interval is not None:
+        canceled_entry = storage.remove_ooo(member_id, interval.position, interval.entry)
+        index.remove(member_id, interval.position)
+        sync_ooo_index()
+        sync_month_cache("ooo", months_between(interval.entry["start_date"], interval.entry["end_date"]))
+        publish_change("ooo_removed", member_id, interval.entry["start_date"], interval.entry["end_date"])
 
     # Log the operation
     if canceled_entry:
@@ -834,29 +1219,467 @@ def cancel_vacation():
 
 
 @app.route("/api/availability/<date>")
+@conditional("members", "holidays", "ooo")
 def api_availability(date):
     """API endpoint to get availability for a specific date"""
-    members = get_members()
+    try:
+        day = datetime.strptime(date, "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "Invalid date, expected YYYY-MM-DD"}), 400
+    if years_error(day, day):
+        return jsonify({"error": years_error(day, day)}), 400
+
+    snapshot = get_availability_snapshot()
+    if ensure_holiday_years([day.year], snapshot):
+        snapshot = get_availability_snapshot()
+    members = snapshot.members()
+    matrix = snapshot.compute(day, day)
     result = {}
 
-    for member_id, member_info in members.items():
-        country = member_info["country"]
-        region = member_info.get("region")
+    for member_index, member_id in enumerate(matrix.member_ids):
+        code = matrix.codes[member_index][0]
+        result[member_id] = {
+            "name": members[member_id]["name"],
+            "available": code == AVAILABLE,
+            "reason": REASON_NAMES[code],
+        }
+
+    return jsonify(result)
+
 
-        is_available = True
-        reason = None
+@app.route("/api/availability")
+def api_availability_range():
+    """Compact availability matrix (members x days) for a date range.
 
-        if is_holiday(date, country, region):
-            is_available = False
-            reason = "Holiday"
-        elif is_member_ooo(member_id, date):
-            is_available = False
-            reason = "OOO"
+    Query parameters: start, end (YYYY-MM-DD, inclusive), members (comma
+    separated ids), country and region filters, and format=ndjson to stream
+    one line per member instead of a single JSON document.
+    """
+    stream = request.args.get("format") == "ndjson"
+    max_days = AVAILABILITY_STREAM_MAX_DAYS if stream else AVAILABILITY_MAX_DAYS
+
+    try:
+        start = datetime.strptime(request.args.get("start", ""), "%Y-%m-%d").date()
+        end = datetime.strptime(request.args.get("end", ""), "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "start and end are required, expected YYYY-MM-DD"}), 400
+    if end < start:
+        return jsonify({"error": "end must not be before start"}), 400
+    if (end - start).days + 1 > max_days:
+        return jsonify({"error": f"Date range is limited to {max_days} days"}), 400
+    if years_error(start, end):
+        return jsonify({"error": years_error(start, end)}), 400
+
+    snapshot = get_availability_snapshot()
+    if ensure_holiday_years(range(start.year, end.year + 1), snapshot):
+        snapshot = get_availability_snapshot()
+    members = snapshot.members()
+    member_ids = [m.strip() for m in request.args.get("members", "").split(",") if m.strip()]
+    unknown = [member_id for member_id in member_ids if member_id not in members]
+    if unknown:
+        return jsonify({"error": f"Unknown member ids: {', '.join(unknown)}"}), 400
+    if member_ids:
+        members = {member_id: members[member_id] for member_id in member_ids}
+
+    country = request.args.get("country")
+    region = request.args.get("region")
+    if country or region:
+        at_location = snapshot.members_at(country, region)
+        members = {member_id: members[member_id] for member_id in at_location if member_id in members}
+
+    header = {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "days": (end - start).days + 1,
+        "reason_codes": {str(code): name for code, name in REASON_NAMES.items()},
+    }
+    labels = []
+    rows = snapshot.iter_rows(start, end, labels, list(members))
+
+    def member_row(member_id, row_codes, row_labels):
+        member_info = members[member_id]
+        codes, label_ids = encode_row(row_codes, row_labels)
+        return {
+            "id": member_id,
+            "name": member_info["name"],
+            "country": member_info["country"],
+            "region": member_info.get("region") or None,
+            "codes": codes,
+            "labels": label_ids,
+        }
 
-        result[member_id] = {"name": member_info["name"], "available": is_available, "reason": reason}
+    if not stream:
+        result = dict(header, members=[member_row(*row) for row in rows])
+        result["labels"] = labels
+        return jsonify(result)
+
+    def generate():
+        yield json.dumps(dict(header, type="header")) + "\n"
+        sent_labels = 0
+        for row in rows:
+            member = member_row(*row)
+            # Send labels before the first row that refers to them
+            if len(labels) > sent_labels:
+                yield json.dumps({"type": "labels", "offset": sent_labels, "labels": labels[sent_labels:]}) + "\n"
+                sent_labels = len(labels)
+            yield json.dumps(dict(member, type="member")) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@app.route("/api/find_window")
+def api_find_window():
+    """Earliest window of consecutive days on which all the given members are available.
+
+    Query parameters: members (comma separated ids, default: everyone), days
+    (window length, required), start and end (search range, YYYY-MM-DD;
+    default: today and one year later) and exclude_weekends=1 to count
+    working days only (weekends inside a window are then skipped, not
+    treated as unavailable).
+    """
+    duration = request.args.get("days", type=int)
+    if not duration or duration < 1:
+        return jsonify({"error": "days must be a positive integer"}), 400
 
+    try:
+        start_arg = request.args.get("start")
+        start = datetime.strptime(start_arg, "%Y-%m-%d").date() if start_arg else datetime.now().date()
+        end_arg = request.args.get("end")
+        end = datetime.strptime(end_arg, "%Y-%m-%d").date() if end_arg else start + timedelta(days=365)
+    except ValueError:
+        return jsonify({"error": "start and end must be YYYY-MM-DD"}), 400
+    if end < start:
+        return jsonify({"error": "end must not be before start"}), 400
+    if (end - start).days + 1 > FIND_WINDOW_MAX_DAYS:
+        return jsonify({"error": f"Search range is limited to {FIND_WINDOW_MAX_DAYS} days"}), 400
+    if years_error(start, end):
+        return jsonify({"error": years_error(start, end)}), 400
+
+    ensure_holiday_years(range(start.year, end.year + 1))
+    members = get_members()
+    member_ids = [m.strip() for m in request.args.get("members", "").split(",") if m.strip()]
+    unknown = [member_id for member_id in member_ids if member_id not in members]
+    if unknown:
+        return jsonify({"error": f"Unknown member ids: {', '.join(unknown)}"}), 400
+    if member_ids:
+        members = {member_id: members[member_id] for member_id in member_ids}
+
+    dates = date_range(start, end)
+    exclude_weekends = request.args.get("exclude_weekends") in ("1", "true")
+    day_indexes = None
+    if exclude_weekends:
+        day_indexes = [i for i in range(len(dates)) if (start + timedelta(days=i)).weekday() < 5]
+
+    # One bit per (working) day, set when everyone so far is available; AND in each member's row
+    candidate_days = len(day_indexes) if exclude_weekends else len(dates)
+    common = (1 << candidate_days) - 1
+    for _, row_codes, _ in iter_availability_rows(members, get_holidays(), get_ooo_index(), start, end, []):
+        common &= availability_bits(row_codes, day_indexes)
+        if not common:
+            break
+
+    first = first_run(common, duration)
+    result = {"members": list(members), "days": duration, "exclude_weekends": exclude_weekends, "found": False}
+    if first is not None:
+        window = [dates[i] for i in (day_indexes or range(len(dates)))[first : first + duration]]
+        result.update(found=True, start=window[0], end=window[-1], dates=window)
     return jsonify(result)
 
 
+def get_coverage_report():
+    """Build the coverage report for the query string; returns (report, error message)"""
+    today = datetime.now().date()
+    quarter_start = datetime(today.year, 3 * ((today.month - 1) // 3) + 1, 1).date()
+    try:
+        start = datetime.strptime(request.args.get("start") or quarter_start.isoformat(), "%Y-%m-%d").date()
+        default_end = datetime(start.year + (start.month + 2) // 12, (start.month + 2) % 12 + 1, 1).date()
+        end_arg = request.args.get("end")
+        end = datetime.strptime(end_arg, "%Y-%m-%d").date() if end_arg else default_end - timedelta(days=1)
+    except ValueError:
+        return None, "start and end must be YYYY-MM-DD"
+    if end < start:
+        return None, "end must not be before start"
+    if (end - start).days + 1 > COVERAGE_MAX_DAYS:
+        return None, f"Date range is limited to {COVERAGE_MAX_DAYS} days"
+    if years_error(start, end):
+        return None, years_error(start, end)
+
+    ensure_holiday_years(range(start.year, end.year + 1))
+    members = get_members()
+    country = request.args.get("country")
+    region = request.args.get("region")
+    if country or region:
+        at_location = get_location_index().member_ids(country, region)
+        members = {member_id: members[member_id] for member_id in at_location if member_id in members}
+
+    # Threshold: an absolute number of members, or a share of the headcount
+    min_available = request.args.get("min_available", type=int)
+    min_ratio = request.args.get("min_ratio", COVERAGE_MIN_RATIO, type=float)
+    if min_available is None:
+        min_available = math.ceil(min_ratio * len(members))
+
+    locations = compute_coverage(members, get_holidays(), get_ooo_index(), start, end)
+    report = coverage_report(locations, start, end, min_available, weekends=request.args.get("weekends") != "0")
+    report["min_ratio"] = None if "min_available" in request.args else min_ratio
+    return report, None
+
+
+@app.route("/api/coverage")
+@conditional("members", "holidays", "ooo", key=lambda: datetime.now().strftime("%Y-%m-%d"))
+def api_coverage():
+    """Available headcount per day, overall and per country/region, and the days below a threshold.
+
+    Query parameters: start, end (YYYY-MM-DD, inclusive; default: the current
+    quarter), country and region filters, min_available (members) or
+    min_ratio (share of the headcount, default 0.5), and weekends=0 to leave
+    Saturdays and Sundays out of below_threshold.
+    """
+    report, error = get_coverage_report()
+    if error:
+        return jsonify({"error": error}), 400
+    return jsonify(report)
+
+
+@app.route("/coverage")
+def coverage_page():
+    """Team coverage over a date range"""
+    report, error = get_coverage_report()
+    if error:
+        flash(error, "error")
+        return redirect(url_for("coverage_page"))
+
+    countries = sorted(get_location_index().countries())
+    return render_template("coverage.html", report=report, countries=countries, args=request.args)
+
+
+def feed_years(members, ooo_data):
+    """The years a feed covers: the current one and those of its members' OOO entries"""
+    years = {datetime.now().year}
+    for member_id in members:
+        for entry in ooo_data.get(member_id, []):
+            years.update(range(int(entry["start_date"][:4]), int(entry["end_date"][:4]) + 1))
+    return sorted(year for year in years if MIN_YEAR <= year <= MAX_YEAR)
+
+
+def ics_feed_response(key, name, members, locations):
+    """Serve a feed from the feed cache, or stream it and cache it for the next poll"""
+    ooo_data = get_ooo()
+    ensure_holiday_years(feed_years(members, ooo_data))
+    holidays_data = get_holidays()
+    versions = month_versions()
+    headers = {"Content-Disposition": f'inline; filename="{key[0]}.ics"'}
+
+    body = feed_cache.get(key, versions)
+    if body is not None:
+        return Response(body, mimetype="text/calendar", headers=headers)
+
+    chunks = iter_feed(name, members, holidays_data, ooo_data, locations)
+    return Response(feed_cache.stream(key, versions, chunks), mimetype="text/calendar", headers=headers)
+
+
+@app.route("/calendar/team.ics")
+@conditional("members", "holidays", "ooo")
+def team_feed():
+    """Subscription feed with every member's OOO and the holidays of every member location"""
+    members = get_members()
+    locations = get_location_index().locations()
+    return ics_feed_response(("team",), "Team availability", members, locations)
+
+
+@app.route("/calendar/member/<member_id>.ics")
+@conditional("members", "holidays", "ooo")
+def member_feed(member_id):
+    """Subscription feed with one member's OOO and the holidays at their location"""
+    member = get_members().get(member_id)
+    if member is None:
+        return jsonify({"error": "Member not found"}), 404
+    location = (member["country"], member.get("region") or "")
+    return ics_feed_response(("member", member_id), member["name"], {member_id: member}, [location])
+
+
+@app.route("/calendar/location/<country>.ics")
+@conditional("members", "holidays", "ooo")
+def location_feed(country):
+    """Subscription feed for a country (or ?region=) with its holidays and its members' OOO"""
+    region = request.args.get("region") or ""
+    members = get_members()
+    members = {member_id: members[member_id] for member_id in get_location_index().member_ids(country, region)}
+    locations = {(country, region)} | {(m["country"], m.get("region") or "") for m in members.values()}
+    name = f"{region}, {country}" if region else country
+    return ics_feed_response(("location", country, region), name, members, locations)
+
+
+@app.route("/api/events")
+def api_events():
+    """Server-Sent Events stream of data changes ("change" events; "reset" when changes were missed).
+
+    Resumes after the Last-Event-ID the browser sends on reconnect. Under a
+    sync worker the response ends right after any pending events and the
+    browser reconnects after SSE_SYNC_RETRY_MS, so it never holds the worker.
+    Only changes to the current team and to the shared holidays are sent.
+    """
+    event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id") or change_journal.position()
+    team_name = current_team().name
+    threaded = request.environ.get("wsgi.multithread", False)
+    hold_seconds = SSE_MAX_SECONDS if threaded else 0
+    retry_ms = int(SSE_POLL_SECONDS * 1000) if threaded else SSE_SYNC_RETRY_MS
+
+    def generate(event_id):
+        yield f"retry: {retry_ms}\nid: {event_id}\n\n"
+        started = last_sent = time.monotonic()
+        while True:
+            events, next_id = change_journal.read_since(event_id)
+            if events:
+                events = [(change_id, change) for change_id, change in events if change.get("team") in (None, team_name)]
+            if events is None:
+                yield f"id: {next_id}\nevent: reset\ndata: {{}}\n\n"
+            else:
+                for change_id, change in events:
+                    yield f"id: {change_id}\nevent: change\ndata: {json.dumps(change)}\n\n"
+            if events != []:
+                last_sent = time.monotonic()
+            event_id = next_id
+
+            now = time.monotonic()
+            if now - started >= hold_seconds:
+                return
+            if now - last_sent >= SSE_KEEPALIVE_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = now
+            time.sleep(SSE_POLL_SECONDS)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(generate(event_id), mimetype="text/event-stream", headers=headers)
+
+
+@app.route("/api/cache_stats")
+def cache_stats():
+    """Hit/miss/reload counters of the in-memory data store, month cache, feed cache and availability snapshot"""
+    return jsonify(
+        {
+            "storage": storage.name,
+            "data_store": data_store.stats(),
+            "month_cache": month_cache.stats(),
+            "feed_cache": feed_cache.stats(),
+            "snapshot": current_team().snapshot.stats(),
+        }
+    )
+
+
+@app.route("/api/jobs/<job_id>")
+def api_job(job_id):
+    """Status, progress and (once finished) result or error of a background job of this team"""
+    job = job_runner.get(job_id)
+    if job is None or job["scope"] != current_team().name:
+        return jsonify({"error": "No such job"}), 404
+    return jsonify(job_response(job))
+
+
+@app.route("/api/roll_history", methods=["POST"])
+def api_roll_history():
+    """Archive this team's history older than keep_months (default: HISTORY_KEEP_MONTHS), as a job"""
+    keep_months = request.values.get("keep_months", HISTORY_KEEP_MONTHS, type=int)
+    if keep_months is None or keep_months < 1:
+        return jsonify({"error": "keep_months must be a positive integer"}), 400
+    before = history_cutoff(keep_months)
+
+    def run(progress):
+        return storage.roll_history(before)
+
+    return submit_job("roll_history", {"before": before}, run)
+
+
+@app.route("/api/teams")
+def api_teams():
+    """Teams served by this deployment and the URL prefix of each"""
+    return jsonify(
+        {
+            "current": current_team().name,
+            "teams": [
+                {"name": name, "prefix": "" if name == DEFAULT_TEAM else f"/t/{name}"} for name in teams.names()
+            ],
+        }
+    )
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Request, storage, holiday generation and cache metrics of all workers (Prometheus text format)"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+def use_team(name):
+    """Make the rest of a CLI command work on the team called name"""
+    team = teams.get(name)
+    if team is None:
+        raise click.BadParameter(f"No such team: {name}", param_hint="--team")
+    g.team = team
+    return team
+
+
+@app.cli.command("create-team")
+@click.argument("name")
+def create_team_command(name):
+    """Create the data shard of a new team, served under /t/<name>/"""
+    try:
+        team = teams.create(name)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="NAME")
+    print(f"Team {team.name} stores its data in {team.data_dir}")
+
+
+@app.cli.command("warm-cache")
+def warm_cache_command():
+    """Build the regions map cache file (run at build time to speed up cold starts)"""
+    regions_map = get_regions_map()
+    print(f"Regions map for {len(regions_map)} countries cached in {regions_map_cache_file()}")
+
+
+@app.cli.command("import-ooo")
+@click.argument("filename", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "file_format", type=click.Choice(["csv", "ics"]), help="Default: from the file name")
+@click.option("--member-id", help="Member for .ics events without an X-MEMBER-ID property")
+@click.option("--dry-run", is_flag=True, help="Validate only, do not import")
+@click.option("--team", default=DEFAULT_TEAM, show_default=True, help="Team to import into")
+def import_ooo_command(filename, file_format, member_id, dry_run, team):
+    """Bulk import OOO entries from a CSV or iCalendar file"""
+    use_team(team)
+    with open(filename, "r", encoding="utf-8-sig", newline="") as f:
+        result = import_ooo(f, file_format or detect_format(filename), os.path.basename(filename), member_id, dry_run)
+
+    for error in result["errors"]:
+        print(f"Row {error['row']}: {error['error']}")
+    verb = "Would import" if dry_run else "Imported"
+    print(f"{verb} {result['imported']} of {result['rows']} rows ({result['rejected']} rejected)")
+
+
+@app.cli.command("roll-history")
+@click.option("--keep-months", default=HISTORY_KEEP_MONTHS, show_default=True, type=click.IntRange(min=1))
+@click.option("--team", help="Only roll this team's history (default: every team)")
+def roll_history_command(keep_months, team):
+    """Move older history into gzip archive segments and compact finished years (run from cron)"""
+    before = history_cutoff(keep_months)
+
+    for name in [team] if team else teams.names():
+        result = use_team(name).storage.roll_history(before)
+        print(f"Team {name}: archived {result['archived']} history entries logged before {before[:10]}")
+        if result["compacted"]:
+            print(f"Compacted {', '.join(result['compacted'])} into yearly segments")
+        for segment in result["segments"]:
+            print(f"  {segment['file']}: {segment['count']} entries, {segment['first']} .. {segment['last']}")
+
+
+@app.cli.command("migrate-sqlite")
+@click.option("--team", default=DEFAULT_TEAM, show_default=True, help="Team whose shard to migrate")
+def migrate_sqlite_command(team):
+    """Import the JSON data files into the SQLite database (SQLITE_FILE, or leave.db in a team's shard)"""
+    team = use_team(team)
+    db_file = SQLITE_FILE if team.name == DEFAULT_TEAM else os.path.join(team.data_dir, "leave.db")
+    source = create_storage("json", team.data_dir)
+    counts = SqliteStorage(db_file).import_from(source)
+    print(f"Imported into {db_file}: " + ", ".join(f"{count} {name}" for name, count in counts.items()))
+    print("Set STORAGE_BACKEND=sqlite to use it.")
+
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,203 @@
+"""
+Availability engine.
+
+Computes a members x days matrix of reason codes for a date range in one
+batched pass instead of looking up the holidays and OOO entries of every cell.
+Holidays are resolved once per distinct (country, region) location and then
+shared by every member at that location; OOO intervals are painted onto each
+member's row afterwards.
+"""
+
+from datetime import timedelta
+
+# Reason codes stored in the matrix
+AVAILABLE = 0
+HOLIDAY = 1
+OOO = 2
+
+REASON_NAMES = {AVAILABLE: None, HOLIDAY: "Holiday", OOO: "OOO"}
+
+# Maps reason code bytes to their ASCII digits for encode_row
+_CODE_DIGITS = bytes.maketrans(bytes(REASON_NAMES), "".join(map(str, REASON_NAMES)).encode("ascii"))
+
+
+class AvailabilityMatrix:
+    """Reason codes and labels for a block of members x days.
+
+    codes[i][d] is the reason code for member_ids[i] on dates[d].
+    label_ids[i][d] indexes into labels (the holiday name or OOO reason),
+    or is -1 when the member is available.
+    """
+
+    def __init__(self, member_ids, dates, codes, label_ids, labels):
+        self.member_ids = member_ids
+        self.dates = dates
+        self.codes = codes
+        self.label_ids = label_ids
+        self.labels = labels
+
+    def cell(self, member_index, day_index):
+        """Return (code, label) for one member and day"""
+        label_id = self.label_ids[member_index][day_index]
+        label = self.labels[label_id] if label_id >= 0 else None
+        return self.codes[member_index][day_index], label
+
+    def reason_text(self, member_index, day_index):
+        """Return the reason string used by the calendar template ("Holiday: ...", "OOO: ...")"""
+        code, label = self.cell(member_index, day_index)
+        if code == HOLIDAY:
+            return f"Holiday: {label}"
+        if code == OOO:
+            return f"OOO: {label}"
+        return None
+
+    def to_calendar_dict(self):
+        """Return {date_str: {member_id: {"available", "reason"}}} as expected by calendar.html"""
+        availability = {}
+        for day_index, date_str in enumerate(self.dates):
+            day = {}
+            for member_index, member_id in enumerate(self.member_ids):
+                day[member_id] = {
+                    "available": self.codes[member_index][day_index] == AVAILABLE,
+                    "reason": self.reason_text(member_index, day_index),
+                }
+            availability[date_str] = day
+        return availability
+
+
+def date_range(start, end):
+    """Return the ISO date strings from start to end inclusive"""
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+
+def _intern(label, labels, label_index):
+    """Return the id of label in the shared lookup table, adding it if needed"""
+    label_id = label_index.get(label)
+    if label_id is None:
+        label_id = len(labels)
+        labels.append(label)
+        label_index[label] = label_id
+    return label_id
+
+
+def _location_row(dates, holidays_data, country, region, labels, label_index):
+    """Build the holiday codes/labels row shared by every member at one location"""
+    national = holidays_data.get("national", {}).get(country, {})
+    regional = {}
+    if region:
+        regional = holidays_data.get("regional", {}).get(country, {}).get(region, {})
+
+    codes = bytearray(len(dates))
+    label_ids = [-1] * len(dates)
+
+    if national or regional:
+        for day_index, date_str in enumerate(dates):
+            # Regional names take precedence over national ones (more specific)
+            name = regional.get(date_str)
+            if name is None:
+                name = national.get(date_str)
+            if name is not None:
+                codes[day_index] = HOLIDAY
+                label_ids[day_index] = _intern(name, labels, label_index)
+
+    return codes, label_ids
+
+
+def iter_availability_rows(members, holidays_data, ooo_index, start, end, labels):
+    """Yield (member_id, codes, label_ids) for each member between start and end (inclusive dates).
+
+    ooo_index is the OOOIndex over the current OOO data. Labels are interned
+    into the labels list as they are first seen, so a consumer that streams
+    rows can send only the labels added since the previous row.
+    """
+    dates = date_range(start, end)
+    start_ordinal = start.toordinal()
+    end_ordinal = end.toordinal()
+
+    label_index = {label: label_id for label_id, label in enumerate(labels)}
+    location_rows = {}
+
+    for member_id, member_info in members.items():
+        location = (member_info["country"], member_info.get("region"))
+        if location not in location_rows:
+            location_rows[location] = _location_row(dates, holidays_data, *location, labels, label_index)
+
+        base_codes, base_labels = location_rows[location]
+        row_codes = bytearray(base_codes)
+        row_labels = list(base_labels)
+
+        # Paint OOO entries from last to first in the member's list so that the first
+        # matching entry wins, as before. Holidays take precedence over OOO.
+        intervals = ooo_index.overlapping(member_id, start_ordinal, end_ordinal)
+        for interval in sorted(intervals, key=lambda i: i.position, reverse=True):
+            first = max(interval.start, start_ordinal)
+            last = min(interval.end, end_ordinal)
+            reason_id = _intern(interval.entry["reason"], labels, label_index)
+            for day_index in range(first - start_ordinal, last - start_ordinal + 1):
+                if row_codes[day_index] != HOLIDAY:
+                    row_codes[day_index] = OOO
+                    row_labels[day_index] = reason_id
+
+        yield member_id, row_codes, row_labels
+
+
+def compute_availability(members, holidays_data, ooo_index, start, end):
+    """Compute the availability matrix for every member between start and end (inclusive dates).
+
+    The views read AvailabilitySnapshot.compute instead; this is the
+    reference it is tested against.
+    """
+    labels = []
+    member_ids = []
+    codes = []
+    label_ids = []
+
+    rows = iter_availability_rows(members, holidays_data, ooo_index, start, end, labels)
+    for member_id, row_codes, row_labels in rows:
+        member_ids.append(member_id)
+        codes.append(row_codes)
+        label_ids.append(row_labels)
+
+    return AvailabilityMatrix(member_ids, date_range(start, end), codes, label_ids, labels)
+
+
+def encode_row(codes, label_ids):
+    """Encode one member's row compactly.
+
+    Returns a string with one reason code digit per day and a sparse
+    {day_index: label_id} map for the days that have a label.
+    """
+    code_digits = codes.translate(_CODE_DIGITS).decode("ascii")
+    sparse_labels = {day_index: label_id for day_index, label_id in enumerate(label_ids) if label_id >= 0}
+    return code_digits, sparse_labels
+
+
+# Maps reason code bytes to "1" (available) or "0" for availability_bits
+_AVAILABLE_DIGITS = bytes.maketrans(
+    bytes(REASON_NAMES), b"".join(b"1" if c == AVAILABLE else b"0" for c in REASON_NAMES)
+)
+
+
+def availability_bits(codes, day_indexes=None):
+    """Pack a row of reason codes into an int with bit d set when the member is available on day d.
+
+    With day_indexes, only those days are packed, in that order (e.g. working days only).
+    """
+    if day_indexes is not None:
+        codes = bytes(codes[i] for i in day_indexes)
+    if not codes:
+        return 0
+    return int(codes.translate(_AVAILABLE_DIGITS)[::-1], 2)
+
+
+def first_run(bits, length):
+    """Return the lowest index at which length consecutive bits are set, or None"""
+    # After the loop, bit i is set only if bits i .. i + length - 1 all are
+    covered = 1
+    while covered < length and bits:
+        shift = min(covered, length - covered)
+        bits &= bits >> shift
+        covered += shift
+    if not bits:
+        return None
+    return (bits & -bits).bit_length() - 1
@@ -0,0 +1,381 @@
+"""
+Shared read-only availability snapshot.
+
+The members, their locations' holidays and their OOO entries are packed
+into one binary file of fixed-width arrays: day ordinals, member and
+location ids, and ids into a table of interned strings (member ids, names,
+places, holiday names, OOO reasons). Whichever worker first needs a
+snapshot newer than the file rebuilds it under a lock and publishes it
+under a new name derived from its data versions, so a file that a worker
+has mapped is never replaced (Windows refuses to replace or delete a mapped
+file); every worker maps the file read-only with mmap and reads the arrays
+in place through memoryviews, so the data is shared through the page cache
+instead of being parsed and held once per worker.
+
+Layout: MAGIC, a little-endian uint32 header length, a JSON header (data
+versions, byte order, resolved holiday years, section offsets) and the
+sections, each aligned to 8 bytes and stored in the byte order of the
+machine that wrote them.
+"""
+
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+
+from availability import HOLIDAY, OOO, AvailabilityMatrix, _intern, date_range
+from datastore import file_lock
+from ooo_index import to_ordinal
+
+MAGIC = b"LVAS"
+FORMAT_VERSION = 2
+_LENGTH = struct.Struct("<I")
+
+
+class _StringTable:
+    """Interns strings while a snapshot is built"""
+
+    def __init__(self):
+        self.ids = {}
+        self.offsets = array("I", [0])
+        self.blob = bytearray()
+
+    def add(self, text):
+        text = "" if text is None else str(text)
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = self.ids[text] = len(self.offsets) - 1
+            self.blob += text.encode("utf-8")
+            self.offsets.append(len(self.blob))
+        return string_id
+
+
+def build_snapshot(members, holidays_data, ooo_data, versions):
+    """Return the contents of a snapshot file for the given data, tagged with its data versions"""
+    strings = _StringTable()
+    sections = {
+        "member_ids": array("I"),
+        "member_names": array("I"),
+        "member_locations": array("I"),
+        "location_countries": array("I"),
+        "location_regions": array("I"),
+        "holiday_offsets": array("I", [0]),
+        "holiday_days": array("i"),
+        "holiday_labels": array("I"),
+        "ooo_offsets": array("I", [0]),
+        "ooo_starts": array("i"),
+        "ooo_ends": array("i"),
+        "ooo_labels": array("I"),
+    }
+
+    national_data = holidays_data.get("national", {})
+    regional_data = holidays_data.get("regional", {})
+    locations = {}
+
+    for member_id, member_info in members.items():
+        location = (member_info["country"], member_info.get("region") or "")
+        if location not in locations:
+            locations[location] = len(locations)
+            country, region = location
+            sections["location_countries"].append(strings.add(country))
+            sections["location_regions"].append(strings.add(region))
+
+            # Regional names take precedence over national ones, as in availability.py
+            days = dict(national_data.get(country, {}))
+            if region:
+                days.update(regional_data.get(country, {}).get(region, {}))
+            for date_str, name in sorted(days.items()):
+                sections["holiday_days"].append(to_ordinal(date_str))
+                sections["holiday_labels"].append(strings.add(name))
+            sections["holiday_offsets"].append(len(sections["holiday_days"]))
+
+        sections["member_ids"].append(strings.add(member_id))
+        sections["member_names"].append(strings.add(member_info["name"]))
+        sections["member_locations"].append(locations[location])
+
+        # Entries in list order; the painting order depends on it
+        for entry in ooo_data.get(member_id, []):
+            sections["ooo_starts"].append(to_ordinal(entry["start_date"]))
+            sections["ooo_ends"].append(to_ordinal(entry["end_date"]))
+            sections["ooo_labels"].append(strings.add(entry["reason"]))
+        sections["ooo_offsets"].append(len(sections["ooo_starts"]))
+
+    sections["string_offsets"] = strings.offsets
+    sections["strings"] = strings.blob
+
+    layout = {}
+    offset = 0
+    for name, values in sections.items():
+        data = values.tobytes() if isinstance(values, array) else bytes(values)
+        typecode = values.typecode if isinstance(values, array) else "B"
+        layout[name] = [offset, len(data), typecode]
+        offset += len(data) + (-len(data)) % 8
+
+    header = {
+        "format": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "versions": versions,
+        "resolved": holidays_data.get("resolved", {}),
+        "sections": layout,
+    }
+    header = json.dumps(header, default=str).encode("utf-8")
+    header += b" " * ((-(len(MAGIC) + _LENGTH.size + len(header))) % 8)
+
+    parts = [MAGIC, _LENGTH.pack(len(header)), header]
+    for name, values in sections.items():
+        data = values.tobytes() if isinstance(values, array) else bytes(values)
+        parts.append(data + b"\0" * ((-len(data)) % 8))
+    return b"".join(parts)
+
+
+def write_snapshot(filename, contents):
+    """Publish contents at filename atomically (readers see the old or the new file, never a mix)"""
+    directory = os.path.dirname(filename) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_filename = tempfile.mkstemp(dir=directory, prefix=os.path.basename(filename) + "-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(contents)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise
+
+
+class AvailabilitySnapshot:
+    """A read-only mapping of a snapshot file"""
+
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self._map)
+        if bytes(view[: len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{filename} is not an availability snapshot")
+        (header_length,) = _LENGTH.unpack_from(view, len(MAGIC))
+        start = len(MAGIC) + _LENGTH.size
+        header = json.loads(bytes(view[start : start + header_length]))
+        if header.get("format") != FORMAT_VERSION or header.get("byteorder") != sys.byteorder:
+            raise ValueError(f"{filename} was written by another format or platform")
+        self.versions = header["versions"]
+        # {country: {region: [years]}}: the holiday units generated when the snapshot was built
+        self.resolved = header["resolved"]
+
+        body = start + header_length
+        # Each section becomes an attribute: a memoryview over the mapping, cast to its item type
+        for name, (offset, length, typecode) in header["sections"].items():
+            section = view[body + offset : body + offset + length]
+            setattr(self, name, section if typecode == "B" else section.cast(typecode))
+
+        self._lock = threading.Lock()
+        self._decoded = {}  # string id -> str, for the strings read so far
+        self._member_index = None
+
+    def string(self, string_id):
+        text = self._decoded.get(string_id)
+        if text is None:
+            offsets = self.string_offsets
+            text = bytes(self.strings[offsets[string_id] : offsets[string_id + 1]]).decode("utf-8")
+            self._decoded[string_id] = text
+        return text
+
+    def member_count(self):
+        return len(self.member_ids)
+
+    def locations(self):
+        """Return the (country, region) of every member location, region "" for national-only members"""
+        return [
+            (self.string(country), self.string(region))
+            for country, region in zip(self.location_countries, self.location_regions)
+        ]
+
+    def members(self):
+        """Return {member_id: {"name", "country", "region"}} in the order of members.json"""
+        members = {}
+        for index in range(self.member_count()):
+            location = self.member_locations[index]
+            members[self.string(self.member_ids[index])] = {
+                "name": self.string(self.member_names[index]),
+                "country": self.string(self.location_countries[location]),
+                "region": self.string(self.location_regions[location]),
+            }
+        return members
+
+    def members_at(self, country=None, region=None):
+        """Return the ids of the members at a country and/or region, grouped by location like LocationIndex"""
+        wanted = {
+            location
+            for location in range(len(self.location_countries))
+            if (not country or self.string(self.location_countries[location]) == country)
+            and (not region or self.string(self.location_regions[location]) == region)
+        }
+        rows = [index for index in range(self.member_count()) if self.member_locations[index] in wanted]
+        rows.sort(key=lambda index: self.member_locations[index])
+        return [self.string(self.member_ids[index]) for index in rows]
+
+    def member_indexes(self, member_ids):
+        """Map member ids to their rows; ids that are not in the snapshot are skipped"""
+        with self._lock:
+            if self._member_index is None:
+                self._member_index = {self.string(string_id): i for i, string_id in enumerate(self.member_ids)}
+        return [self._member_index[member_id] for member_id in member_ids if member_id in self._member_index]
+
+    def _location_row(self, location, start_ordinal, days, labels, label_index):
+        codes = bytearray(days)
+        label_ids = [-1] * days
+        holiday_days = self.holiday_days
+        first = self.holiday_offsets[location]
+        last = self.holiday_offsets[location + 1]
+        position = bisect.bisect_left(holiday_days, start_ordinal, first, last)
+        while position < last and holiday_days[position] < start_ordinal + days:
+            day_index = holiday_days[position] - start_ordinal
+            codes[day_index] = HOLIDAY
+            label_ids[day_index] = _intern(self.string(self.holiday_labels[position]), labels, label_index)
+            position += 1
+        return codes, label_ids
+
+    def iter_rows(self, start, end, labels, member_ids=None):
+        """Yield (member_id, codes, label_ids) like availability.iter_availability_rows.
+
+        member_ids selects and orders the members (default: every member).
+        """
+        start_ordinal = start.toordinal()
+        end_ordinal = end.toordinal()
+        days = end_ordinal - start_ordinal + 1
+        indexes = range(self.member_count()) if member_ids is None else self.member_indexes(member_ids)
+
+        label_index = {label: label_id for label_id, label in enumerate(labels)}
+        location_rows = {}
+        ooo_offsets, ooo_starts, ooo_ends = self.ooo_offsets, self.ooo_starts, self.ooo_ends
+
+        for index in indexes:
+            location = self.member_locations[index]
+            if location not in location_rows:
+                location_rows[location] = self._location_row(location, start_ordinal, days, labels, label_index)
+
+            base_codes, base_labels = location_rows[location]
+            row_codes = bytearray(base_codes)
+            row_labels = list(base_labels)
+
+            # Paint from the member's last entry to the first so that the first one wins; holidays win over OOO
+            for entry in range(ooo_offsets[index + 1] - 1, ooo_offsets[index] - 1, -1):
+                if ooo_starts[entry] > end_ordinal or ooo_ends[entry] < start_ordinal:
+                    continue
+                first = max(ooo_starts[entry], start_ordinal)
+                last = min(ooo_ends[entry], end_ordinal)
+                reason_id = _intern(self.string(self.ooo_labels[entry]), labels, label_index)
+                for day_index in range(first - start_ordinal, last - start_ordinal + 1):
+                    if row_codes[day_index] != HOLIDAY:
+                        row_codes[day_index] = OOO
+                        row_labels[day_index] = reason_id
+
+            yield self.string(self.member_ids[index]), row_codes, row_labels
+
+    def compute(self, start, end, member_ids=None):
+        """Return the AvailabilityMatrix between start and end, like availability.compute_availability"""
+        labels = []
+        matrix_ids, codes, label_ids = [], [], []
+        for member_id, row_codes, row_labels in self.iter_rows(start, end, labels, member_ids):
+            matrix_ids.append(member_id)
+            codes.append(row_codes)
+            label_ids.append(row_labels)
+        return AvailabilityMatrix(matrix_ids, date_range(start, end), codes, label_ids, labels)
+
+
+class SnapshotStore:
+    """The current snapshot of one dataset directory, rebuilt by a single process when the data changes.
+
+    Each snapshot is published as filename.<hash of its versions>; the
+    previous one is kept for workers that have just read the old versions,
+    older ones are deleted (and on Windows, left for a later publish while a
+    worker still maps them).
+    """
+
+    KEEP = 2
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._snapshot = None
+        # hits: mapping still current, reloads: mapped a file published by another worker, misses: rebuilt here
+        self._counters = {"hits": 0, "reloads": 0, "misses": 0}
+
+    def path(self, versions):
+        """The file the snapshot of versions is published as"""
+        digest = hashlib.sha256(json.dumps(versions, sort_keys=True).encode("utf-8")).hexdigest()
+        return f"{self.filename}.{digest[:16]}"
+
+    def _open(self, versions):
+        """Map the published file if it was built from versions, else return None"""
+        try:
+            snapshot = AvailabilitySnapshot(self.path(versions))
+        except (FileNotFoundError, ValueError):
+            return None
+        if snapshot.versions != versions:
+            return None
+        # A replaced mapping is released once no reader holds it any more
+        self._snapshot = snapshot
+        return snapshot
+
+    def _prune(self):
+        """Delete the published files but the KEEP newest"""
+        directory = os.path.dirname(self.filename) or "."
+        pattern = re.compile(re.escape(os.path.basename(self.filename)) + r"\.[0-9a-f]{16}")
+        published = []
+        for name in os.listdir(directory):
+            if pattern.fullmatch(name):
+                try:
+                    published.append((os.stat(os.path.join(directory, name)).st_mtime_ns, name))
+                except FileNotFoundError:
+                    pass
+        for _, name in sorted(published, reverse=True)[self.KEEP :]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+    def get(self, versions, load):
+        """Return a snapshot built from the given data versions.
+
+        versions are read before load() -> (members, holidays, ooo) is called,
+        so the data is never older than the versions it is published under.
+        If the published snapshot is stale, one process rebuilds it while the
+        others wait for it.
+        """
+        versions = json.loads(json.dumps(versions, default=str))
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.versions == versions:
+            self._counters["hits"] += 1
+            return snapshot
+
+        with self._lock:
+            snapshot = self._open(versions)
+            if snapshot is None:
+                os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+                with file_lock(self.filename + ".lock"):
+                    # Another worker may have published it while this one waited
+                    snapshot = self._open(versions)
+                    if snapshot is None:
+                        members, holidays_data, ooo_data = load()
+                        contents = build_snapshot(members, holidays_data, ooo_data, versions)
+                        write_snapshot(self.path(versions), contents)
+                        self._prune()
+                        self._counters["misses"] += 1
+                        return self._open(versions)
+            self._counters["reloads"] += 1
+            return snapshot
+
+    def stats(self):
+        return dict(self._counters)
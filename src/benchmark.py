@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite.
+
+Generates a synthetic dataset per scale (see init_sample_data.py), then times
+the main routes against it with the Flask test client, in a fresh process per
+scale so every run starts cold. Results are written as JSON:
+
+    python benchmark.py --scales small,medium --output benchmark_results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+from init_sample_data import create_sample_data
+
+SCALES = {
+    "small": {"members": 50, "ooo_per_member": 5, "holiday_years": 2, "history": 1_000},
+    "medium": {"members": 500, "ooo_per_member": 10, "holiday_years": 3, "history": 20_000},
+    "large": {"members": 5_000, "ooo_per_member": 10, "holiday_years": 5, "history": 200_000},
+}
+
+# generate_holidays_api replaces the whole holidays dataset, so it gets fewer rounds
+MAX_GENERATE_REPEAT = 3
+
+
+def summarize(durations):
+    """Return count / mean / percentiles in milliseconds"""
+    ms = sorted(d * 1000 for d in durations)
+    return {
+        "count": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 3),
+        "p50_ms": round(ms[len(ms) // 2], 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "min_ms": round(ms[0], 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+def time_calls(call, repeat, before=None):
+    """Time repeat calls of call() (the first one is reported separately as the cold call)"""
+    durations = []
+    for _ in range(repeat + 1):
+        if before:
+            before()
+        started = time.perf_counter()
+        response = call()
+        durations.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.request.path} returned {response.status_code}")
+    return dict(summarize(durations[1:]), first_ms=round(durations[0] * 1000, 3))
+
+
+def wait_for_job(client, response):
+    """Poll the background job that response started until it finishes; return the last status response"""
+    job = response.get_json()
+    while job["status"] in ("queued", "running"):
+        time.sleep(0.01)
+        response = client.get(job["status_url"])
+        job = response.get_json()
+    if job["status"] != "succeeded":
+        raise RuntimeError(f"Job {job['kind']} failed: {job['error']}")
+    return response
+
+
+def run_worker(repeat):
+    """Time the routes against the dataset in DATA_DIR and return the results"""
+    started = time.perf_counter()
+    import app as app_module
+
+    import_ms = round((time.perf_counter() - started) * 1000, 3)
+    client = app_module.app.test_client()
+    today = date.today()
+    member_ids = list(app_module.get_members())
+    month_url = f"/?year={today.year}&month={today.month}"
+
+    results = {"import_app": {"first_ms": import_ms}}
+    results["index"] = time_calls(lambda: client.get(month_url), repeat, before=app_module.month_cache.clear)
+    results["index_cached"] = time_calls(lambda: client.get(month_url), repeat)
+    results["api_availability"] = time_calls(lambda: client.get(f"/api/availability/{today.isoformat()}"), repeat)
+    results["history"] = time_calls(lambda: client.get("/history"), repeat)
+    if member_ids:
+        results["history_filtered"] = time_calls(
+            lambda: client.get(f"/history?operation_type=ADD_OOO&member_id={member_ids[0]}"), repeat
+        )
+
+    # Writes go last so the read timings see the generated dataset
+    calls = iter(range(repeat + 1))
+
+    def add_ooo():
+        i = next(calls)
+        day = date(today.year + 2, 1 + i % 12, 1 + i % 28).isoformat()
+        form = {"member_id": member_ids[i % len(member_ids)], "start_date": day, "end_date": day, "reason": "Benchmark"}
+        return client.post("/add_ooo", data=form)
+
+    if member_ids:
+        results["add_ooo"] = time_calls(add_ooo, repeat)
+        results["generate_holidays_api"] = time_calls(
+            lambda: wait_for_job(client, client.post("/api/generate_holidays")), min(repeat, MAX_GENERATE_REPEAT)
+        )
+
+    results["data_store"] = app_module.data_store.stats()
+    results["month_cache"] = app_module.month_cache.stats()
+    return results
+
+
+def dataset_bytes(data_dir):
+    """Size of each data file in data_dir"""
+    return {
+        name: os.path.getsize(os.path.join(data_dir, name))
+        for name in sorted(os.listdir(data_dir))
+        if os.path.isfile(os.path.join(data_dir, name))
+    }
+
+
+def run_scale(name, params, repeat, storage_backend, seed):
+    """Generate a dataset for one scale and benchmark it in a child process"""
+    with tempfile.TemporaryDirectory(prefix=f"leave-bench-{name}-") as data_dir:
+        started = time.perf_counter()
+        sizes = create_sample_data(data_dir, seed=seed, **params)
+        generate_s = time.perf_counter() - started
+
+        if storage_backend == "sqlite":
+            from storage import SqliteStorage, create_storage
+
+            SqliteStorage(os.path.join(data_dir, "leave.db")).import_from(create_storage("json", data_dir))
+
+        output_file = os.path.join(data_dir, "results.json")
+        env = dict(os.environ, DATA_DIR=data_dir, STORAGE_BACKEND=storage_backend)
+        env.pop("SQLITE_FILE", None)
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", output_file, "--repeat", str(repeat)],
+            env=env,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True,
+        )
+        with open(output_file, "r") as f:
+            results = json.load(f)
+
+        return {
+            "scale": name,
+            "params": params,
+            "dataset": dict(sizes, bytes=dataset_bytes(data_dir), generate_s=round(generate_s, 3)),
+            "results": results,
+        }
+
+
+def print_summary(report):
+    print(f"{'scale':<8} {'operation':<24} {'first ms':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for scale in report["scales"]:
+        for operation, timing in scale["results"].items():
+            if "first_ms" not in timing:
+                continue
+            p50 = f"{timing['p50_ms']:.2f}" if "p50_ms" in timing else "-"
+            p95 = f"{timing['p95_ms']:.2f}" if "p95_ms" in timing else "-"
+            print(f"{scale['scale']:<8} {operation:<24} {timing['first_ms']:>10.2f} {p50:>10} {p95:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app against synthetic datasets")
+    parser.add_argument("--scales", default="small,medium", help=f"comma separated, from: {', '.join(SCALES)}")
+    parser.add_argument("--repeat", type=int, default=20, help="timed calls per operation")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the JSON results")
+    parser.add_argument("--worker", metavar="OUTPUT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        results = run_worker(args.repeat)
+        with open(args.worker, "w") as f:
+            json.dump(results, f)
+        return
+
+    scales = [scale.strip() for scale in args.scales.split(",") if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scales: {', '.join(unknown)}")
+
+    report = {
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "storage": args.storage,
+        "repeat": args.repeat,
+        "scales": [run_scale(scale, SCALES[scale], args.repeat, args.storage, args.seed) for scale in scales],
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print_summary(report)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
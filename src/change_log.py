@@ -0,0 +1,87 @@
+"""
+Change journal for live calendar updates.
+
+Every write that changes what the calendar shows appends one compact JSON
+line (kind, member, date range) to a journal file on local disk. Any worker
+can serve the Server-Sent Events stream by tailing that file from the
+position the client last saw, so a change made through one gunicorn worker
+reaches clients connected to any other.
+
+Event ids are "<inode>-<offset>". When the journal grows past max_bytes it
+is replaced by an empty file; a client resuming from an id into the old
+file gets a "reset" event and reloads instead of missing changes.
+"""
+
+import json
+import os
+import time
+
+from datastore import atomic_write, file_lock
+
+
+class ChangeJournal:
+    """Append-only JSON Lines journal of data changes"""
+
+    def __init__(self, journal_file, max_bytes=1024 * 1024):
+        self.journal_file = journal_file
+        self.max_bytes = max_bytes
+
+    def append(self, event):
+        """Append one change event (a dict), starting a new journal if this one is too large"""
+        event = dict(event, time=time.time())
+        line = (json.dumps(event, default=str) + "\n").encode("utf-8")
+        with file_lock(self.journal_file + ".lock"):
+            try:
+                if os.path.getsize(self.journal_file) > self.max_bytes:
+                    atomic_write(self.journal_file, lambda f: None)
+            except FileNotFoundError:
+                pass
+            fd = os.open(self.journal_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+    def position(self):
+        """Return the event id of the current end of the journal"""
+        try:
+            st = os.stat(self.journal_file)
+        except FileNotFoundError:
+            return "0-0"
+        return f"{st.st_ino}-{st.st_size}"
+
+    def read_since(self, event_id):
+        """Return (events, new event id) for everything appended after event_id.
+
+        events is a list of (event id, event dict). If event_id refers to an
+        older journal, events is None: the caller missed changes and must
+        reload everything.
+        """
+        try:
+            inode, offset = (int(part) for part in event_id.split("-"))
+        except (AttributeError, ValueError):
+            return None, self.position()
+
+        try:
+            f = open(self.journal_file, "rb")
+        except FileNotFoundError:
+            return ([], event_id) if offset == 0 else (None, self.position())
+
+        with f:
+            st = os.fstat(f.fileno())
+            if inode not in (0, st.st_ino) or offset > st.st_size:
+                return None, f"{st.st_ino}-{st.st_size}"
+            if offset == st.st_size:
+                return [], f"{st.st_ino}-{offset}"
+
+            f.seek(offset)
+            events = []
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a write in progress; pick it up next time
+                offset += len(line)
+                try:
+                    events.append((f"{st.st_ino}-{offset}", json.loads(line)))
+                except ValueError:
+                    continue
+            return events, f"{st.st_ino}-{offset}"
@@ -0,0 +1,136 @@
+"""
+Team coverage (headcount) over long date ranges.
+
+Members are grouped by (country, region). For each location the days that
+are holidays are marked once in a mask, and every member's OOO intervals are
+added to a difference array (+1 on the first day, -1 after the last), so a
+single prefix sum gives the number of members out on each day. Nothing is
+evaluated per member per day: the cost is O(days x locations + intervals).
+"""
+
+from datetime import date, timedelta
+from itertools import accumulate
+
+
+class LocationCoverage:
+    """Headcount and daily availability of the members at one (country, region)"""
+
+    __slots__ = ("country", "region", "headcount", "available")
+
+    def __init__(self, country, region, headcount, available):
+        self.country = country
+        self.region = region
+        self.headcount = headcount
+        self.available = available
+
+
+def _holiday_mask(holidays_data, country, region, start, days):
+    """bytearray with 1 on every day from start that is a holiday at the location"""
+    mask = bytearray(days)
+    first = start.isoformat()
+    last = (start + timedelta(days=days - 1)).isoformat()
+    start_ordinal = start.toordinal()
+
+    sources = [holidays_data.get("national", {}).get(country, {})]
+    if region:
+        sources.append(holidays_data.get("regional", {}).get(country, {}).get(region, {}))
+    for source in sources:
+        for date_str in source:
+            # ISO dates compare correctly as strings
+            if first <= date_str <= last:
+                mask[date.fromisoformat(date_str).toordinal() - start_ordinal] = 1
+    return mask
+
+
+def _add_member_intervals(diff, intervals, start_ordinal, end_ordinal):
+    """Add one member's OOO days to diff, counting days covered by overlapping entries once"""
+    run_first = run_last = None
+    for interval in intervals:  # sorted by start
+        first = max(interval.start, start_ordinal)
+        last = min(interval.end, end_ordinal)
+        if run_last is not None and first <= run_last + 1:
+            run_last = max(run_last, last)
+            continue
+        if run_last is not None:
+            diff[run_first - start_ordinal] += 1
+            diff[run_last - start_ordinal + 1] -= 1
+        run_first, run_last = first, last
+    if run_last is not None:
+        diff[run_first - start_ordinal] += 1
+        diff[run_last - start_ordinal + 1] -= 1
+
+
+def compute_coverage(members, holidays_data, ooo_index, start, end):
+    """Return a LocationCoverage per (country, region) for the days from start to end (inclusive)"""
+    days = (end - start).days + 1
+    start_ordinal = start.toordinal()
+    end_ordinal = end.toordinal()
+
+    by_location = {}
+    for member_id, member_info in members.items():
+        by_location.setdefault((member_info["country"], member_info.get("region") or ""), []).append(member_id)
+
+    result = []
+    for (country, region), member_ids in by_location.items():
+        diff = [0] * (days + 1)
+        for member_id in member_ids:
+            intervals = ooo_index.overlapping(member_id, start_ordinal, end_ordinal)
+            _add_member_intervals(diff, intervals, start_ordinal, end_ordinal)
+
+        headcount = len(member_ids)
+        mask = _holiday_mask(holidays_data, country, region, start, days)
+        out = accumulate(diff[:days])
+        available = [0 if holiday else headcount - out_count for holiday, out_count in zip(mask, out)]
+        result.append(LocationCoverage(country, region, headcount, available))
+
+    return result
+
+
+def aggregate(locations, key, days):
+    """Sum location coverage into groups: {key(location): {"headcount", "available"}}"""
+    groups = {}
+    for location in locations:
+        group = groups.setdefault(key(location), {"headcount": 0, "available": [0] * days})
+        group["headcount"] += location.headcount
+        group["available"] = [a + b for a, b in zip(group["available"], location.available)]
+    return groups
+
+
+def coverage_report(locations, start, end, min_available, weekends=True):
+    """Overall, per country and per region daily availability, plus the days below min_available.
+
+    With weekends=False, Saturdays and Sundays are never reported as below the threshold.
+    """
+    days = (end - start).days + 1
+    total = aggregate(locations, lambda location: "total", days)
+    total = total.get("total", {"headcount": 0, "available": [0] * days})
+    countries = aggregate(locations, lambda location: location.country, days)
+    regions = aggregate(
+        [location for location in locations if location.region],
+        lambda location: f"{location.region} ({location.country})",
+        days,
+    )
+
+    below = []
+    for day_index, available in enumerate(total["available"]):
+        day = start + timedelta(days=day_index)
+        if available < min_available and (weekends or day.weekday() < 5):
+            below.append(
+                {
+                    "date": day.isoformat(),
+                    "weekday": day.strftime("%a"),
+                    "available": available,
+                    "ratio": round(available / total["headcount"], 3) if total["headcount"] else 0.0,
+                }
+            )
+
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "days": days,
+        "min_available": min_available,
+        "total": total,
+        "countries": dict(sorted(countries.items())),
+        "regions": dict(sorted(regions.items())),
+        "below_threshold": below,
+    }
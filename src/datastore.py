@@ -0,0 +1,290 @@
+"""
+Process-wide cache for the JSON data files.
+
+Each file is parsed once and kept in memory. Every write goes through an
+inter-process lock, is written to a temporary file and moved into place with
+os.replace (so readers never see a half-written file), and bumps a
+monotonically increasing version number stored next to the file in
+"<file>.version". Before serving a cached copy the store compares that
+version (plus the file's mtime/size, to catch manual edits) with the one it
+parsed, so a write made by another gunicorn worker invalidates the cache
+without every worker having to re-parse the file on every request.
+"""
+
+import copy
+import json
+import os
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(lock_filename):
+    """Hold an exclusive inter-process lock on lock_filename"""
+    with open(lock_filename, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _try_lock(f):
+    """Take an exclusive lock on an open file without waiting; returns False if another holder has it"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+class ProcessLock:
+    """A lock file this process holds for as long as it runs, so other processes can tell it is alive.
+
+    The operating system drops the lock when the process exits, however it
+    exits. Lock files are named by a random id rather than the pid, which is
+    reused (gunicorn workers get the same low pids after a container
+    restart). The lock is taken on first use, i.e. in the worker process
+    after gunicorn forked.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._pid = None
+        self._id = None
+        self._file = None
+
+    def _path(self, process_id):
+        return os.path.join(self.directory, f"{process_id}.lock")
+
+    @property
+    def id(self):
+        """This process's id, whose lock file is held until the process exits"""
+        with self._lock:
+            if self._pid != os.getpid():
+                os.makedirs(self.directory, exist_ok=True)
+                process_id = uuid.uuid4().hex
+                f = open(self._path(process_id), "a+b")
+                if not _try_lock(f):
+                    f.close()
+                    raise OSError(f"Could not lock {self._path(process_id)}")
+                self._pid, self._id, self._file = os.getpid(), process_id, f
+            return self._id
+
+    def is_alive(self, process_id):
+        """Is the process that took process_id (this one included) still running?"""
+        if process_id == self._id and self._pid == os.getpid():
+            return True
+        try:
+            f = open(self._path(process_id), "rb")
+        except OSError:
+            return False
+        with f:
+            # Taking the lock only succeeds once its holder has exited; closing the file releases it again
+            return not _try_lock(f)
+
+    def forget(self, process_id):
+        """Remove the lock file of a process that has exited"""
+        try:
+            os.remove(self._path(process_id))
+        except OSError:
+            pass
+
+
+def atomic_write(filename, write, fsync=True):
+    """Call write(f) on a temporary file in the same directory, then move it over filename.
+
+    Pass fsync=False for files that may be lost in a crash (the rename is
+    still atomic, so readers never see a partial file).
+    """
+    directory = os.path.dirname(filename) or "."
+    fd, tmp_filename = tempfile.mkstemp(dir=directory, prefix=os.path.basename(filename) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            write(f)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise
+
+
+class DataStore:
+    """Cache of parsed JSON files keyed by path"""
+
+    def __init__(self):
+        # Guards the tables below only; reading, parsing and writing a file hold just that file's lock
+        self._lock = threading.RLock()
+        # path -> RLock serializing loads and writes of that file in this process
+        self._file_locks = {}
+        # path -> {"signature": (version, mtime_ns, size), "data": ...}
+        self._entries = {}
+        self._counters = {"hits": 0, "misses": 0, "reloads": 0, "writes": 0}
+        # path -> {"loads", "reads", "bytes_read", "writes", "bytes_written"}
+        self._io = {}
+        # path -> (signature before, signature after) of the last write this process made
+        self._writes = {}
+
+    def _file_lock(self, filename):
+        with self._lock:
+            lock = self._file_locks.get(filename)
+            if lock is None:
+                lock = self._file_locks[filename] = threading.RLock()
+            return lock
+
+    def _io_counters(self, filename):
+        counters = self._io.get(filename)
+        if counters is None:
+            counters = self._io[filename] = {"loads": 0, "reads": 0, "bytes_read": 0, "writes": 0, "bytes_written": 0}
+        return counters
+
+    @staticmethod
+    def _read_version(filename):
+        """Return the data version recorded for filename (0 if it was never written by the store)"""
+        try:
+            with open(filename + ".version", "r") as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _signature(self, filename):
+        """Return (data version, mtime, size) for filename, or None if it is missing"""
+        try:
+            st = os.stat(filename)
+        except FileNotFoundError:
+            return None
+        return (self._read_version(filename), st.st_mtime_ns, st.st_size)
+
+    def load(self, filename, default, for_update=False):
+        """Return the parsed contents of filename.
+
+        The returned object is shared by every caller and must be treated as
+        read-only. Pass for_update=True to get a private copy; to write it
+        back safely, use transaction() instead.
+        """
+        data, _ = self.load_versioned(filename, default)
+        return copy.deepcopy(data) if for_update else data
+
+    def load_versioned(self, filename, default):
+        """Return (contents, version signature) of filename, the signature being that of the contents returned.
+
+        Reading version() separately may see a reload by another thread in
+        between; a cache keyed by this signature never claims newer data than
+        it was built from.
+        """
+        signature = self._signature(filename)
+
+        with self._file_lock(filename):
+            with self._lock:
+                entry = self._entries.get(filename)
+                self._io_counters(filename)["loads"] += 1
+                if entry is not None and entry["signature"] == signature:
+                    self._counters["hits"] += 1
+                else:
+                    self._counters["misses" if entry is None else "reloads"] += 1
+
+            if entry is None or entry["signature"] != signature:
+                if signature is None:
+                    data = default
+                else:
+                    with open(filename, "r") as f:
+                        data = json.load(f)
+                entry = {"signature": signature, "data": data}
+                with self._lock:
+                    self._entries[filename] = entry
+                    if signature is not None:
+                        io = self._io_counters(filename)
+                        io["reads"] += 1
+                        io["bytes_read"] += signature[2]
+
+        return entry["data"], entry["signature"]
+
+    def save(self, filename, data):
+        """Write data to filename, bump its version and make it the cached copy"""
+        with self._file_lock(filename), file_lock(filename + ".lock"):
+            self._save_locked(filename, data)
+
+    def _save_locked(self, filename, data):
+        previous = self._signature(filename)
+        atomic_write(filename, lambda f: json.dump(data, f, indent=2, default=str))
+
+        # The version is published after the data, so a reader that sees the
+        # new version is guaranteed to also see the new contents.
+        version = self._read_version(filename) + 1
+        atomic_write(filename + ".version", lambda f: f.write(str(version)))
+
+        signature = self._signature(filename)
+        with self._lock:
+            self._entries[filename] = {"signature": signature, "data": data}
+            self._writes[filename] = (previous, signature)
+            self._counters["writes"] += 1
+            io = self._io_counters(filename)
+            io["writes"] += 1
+            io["bytes_written"] += signature[2] if signature else 0
+
+    @contextmanager
+    def transaction(self, filename, default):
+        """Read-modify-write filename under the inter-process lock.
+
+        Yields a private copy of the current contents (re-checked under the
+        lock, so no other worker's write is lost) and saves it on exit.
+        """
+        with self._file_lock(filename), file_lock(filename + ".lock"):
+            data = self.load(filename, default, for_update=True)
+            yield data
+            self._save_locked(filename, data)
+
+    def version(self, filename):
+        """Return the version signature of the cached copy of filename (changes on every write or reload)"""
+        with self._lock:
+            entry = self._entries.get(filename)
+            return entry["signature"] if entry is not None else None
+
+    def current_version(self, filename):
+        """Return the on-disk version signature of filename without loading it"""
+        return self._signature(filename)
+
+    def is_own_write(self, before, after):
+        """Did the last write this process made to some file take it from signature before to after?"""
+        with self._lock:
+            return (before, after) in self._writes.values()
+
+    def stats(self):
+        """Return hit/miss/reload/write counters"""
+        with self._lock:
+            return dict(self._counters, files=len(self._entries))
+
+    def io_stats(self):
+        """Return {path: {"loads", "reads", "bytes_read", "writes", "bytes_written"}}"""
+        with self._lock:
+            return {filename: dict(counters) for filename, counters in self._io.items()}
+
+
+# Shared by the whole process
+data_store = DataStore()
@@ -0,0 +1,561 @@
+"""
+Append-only audit trail.
+
+History entries are stored one JSON object per line (JSON Lines). Logging an
+operation appends a single line instead of rewriting the whole file, and
+readers stream the file line by line. An existing history.json array is
+imported into the journal the first time it is used. HistoryIndex keeps a
+time-ordered index of the journal for paginated reads.
+
+The journal is the hot segment. Rolling moves entries older than a cutoff
+into gzip-compressed archive segments (one per month, merged into one per
+year by compaction) listed in a small manifest with each segment's time
+range, record count and operation counts. Only the hot segment is indexed
+in memory; archive segments are opened only when a read reaches back into
+their time range, so memory and latency stay flat as the history grows.
+"""
+
+import bisect
+import gzip
+import json
+import os
+import tempfile
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from datastore import atomic_write, data_store, file_lock
+
+
+class HistoryJournal:
+    """JSON Lines journal of history entries"""
+
+    def __init__(self, journal_file, legacy_file=None, archive=None):
+        self.journal_file = journal_file
+        self.legacy_file = legacy_file
+        self.archive = archive
+        self._lock = threading.Lock()
+        self._migrated = False
+        self.appends = 0
+        self.bytes_written = 0
+
+    def ensure_migrated(self):
+        """Import the legacy history.json array once, if the journal does not exist yet"""
+        if self._migrated:
+            return
+        # The file lock keeps several workers starting at once from migrating twice
+        with self._lock, file_lock(self.journal_file + ".lock"):
+            if self._migrated:
+                return
+            if not os.path.exists(self.journal_file):
+                entries = []
+                if self.legacy_file and os.path.exists(self.legacy_file):
+                    try:
+                        with open(self.legacy_file, "r") as f:
+                            entries = json.load(f)
+                    except json.JSONDecodeError as e:
+                        print(f"Could not migrate {self.legacy_file}: {e}")
+
+                # Write to a temporary file first so a crash never leaves a half-migrated journal
+                tmp_file = self.journal_file + ".tmp"
+                with open(tmp_file, "w") as f:
+                    for entry in entries:
+                        f.write(json.dumps(entry, default=str) + "\n")
+                os.replace(tmp_file, self.journal_file)
+                if entries:
+                    print(f"Migrated {len(entries)} history entries to {self.journal_file}")
+            self._migrated = True
+
+    def append(self, entry):
+        """Append one entry to the journal"""
+        self.ensure_migrated()
+        line = (json.dumps(entry, default=str) + "\n").encode("utf-8")
+        # The lock keeps an append from landing in a journal that is being rolled
+        with file_lock(self.journal_file + ".lock"):
+            # A single O_APPEND write keeps concurrent writers from interleaving lines
+            fd = os.open(self.journal_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+        self.appends += 1
+        self.bytes_written += len(line)
+
+    def __iter__(self):
+        """Stream entries in the order they were written, archived entries first"""
+        self.ensure_migrated()
+        if self.archive is not None:
+            yield from self.archive
+        try:
+            f = open(self.journal_file, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Skip a torn line left behind by an interrupted write
+                    continue
+
+    def roll(self, before):
+        """Move the entries logged before the timestamp before into the archive.
+
+        Returns the number of entries archived. Appends wait while the
+        journal is rewritten without the archived entries.
+        """
+        self.ensure_migrated()
+        with file_lock(self.journal_file + ".lock"):
+            archived = []
+            kept = []
+            try:
+                f = open(self.journal_file, "r", encoding="utf-8")
+            except FileNotFoundError:
+                return 0
+            with f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # drop torn lines for good
+                    if not isinstance(entry, dict):
+                        continue
+                    if entry_timestamp(entry) < before:
+                        archived.append(entry)
+                    else:
+                        kept.append(line if line.endswith("\n") else line + "\n")
+
+            if not archived:
+                return 0
+            # Archive first: a crash in between leaves entries duplicated, never lost
+            self.archive.add(archived)
+            atomic_write(self.journal_file, lambda f: f.writelines(kept))
+            return len(archived)
+
+
+def entry_timestamp(entry):
+    """Return the timestamp of an entry; malformed timestamps sort as the oldest entries"""
+    timestamp = entry.get("timestamp")
+    return timestamp if isinstance(timestamp, str) else ""
+
+
+def timestamp_bound(value, end_of_day=False):
+    """Normalise a YYYY-MM-DD or YYYY-MM-DD HH:MM:SS bound to a comparable timestamp string"""
+    if value and len(value) == 10:
+        return value + (" 23:59:59" if end_of_day else " 00:00:00")
+    return value
+
+
+# Cursor of the first page that lies entirely in the archive
+ARCHIVE_CURSOR = "archive"
+
+
+def _segment_period(timestamp, yearly):
+    """Return the segment an entry belongs in: its month, or its year once that year was compacted"""
+    if not (timestamp[:4].isdigit() and timestamp[4:5] == "-"):
+        return "0000-00"
+    return timestamp[:4] if timestamp[:4] in yearly else timestamp[:7]
+
+
+class HistoryArchive:
+    """gzip-compressed history segments listed in a manifest.
+
+    manifest.json holds one record per segment, oldest first:
+    {"period", "file", "first", "last", "count", "bytes", "operations"}.
+    Entries inside a segment are sorted by timestamp.
+    """
+
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        self.manifest_file = os.path.join(archive_dir, "manifest.json")
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def segments(self):
+        """Return the manifest records (shared, read-only), oldest first"""
+        return data_store.load(self.manifest_file, {"segments": []})["segments"]
+
+    def _read(self, segment):
+        """Stream the entries of one segment in time order"""
+        path = os.path.join(self.archive_dir, segment["file"])
+        try:
+            f = gzip.open(path, "rt", encoding="utf-8")
+            self.bytes_read += os.path.getsize(path)
+        except FileNotFoundError:
+            return  # merged away by a compaction since the manifest was read
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict):
+                    yield entry
+
+    def __iter__(self):
+        for segment in self.segments():
+            yield from self._read(segment)
+
+    def _write(self, period, entries):
+        """Write the segment file for period and return its manifest record"""
+        entries.sort(key=entry_timestamp)
+        filename = f"history-{period}.jsonl.gz"
+        path = os.path.join(self.archive_dir, filename)
+        operations = {}
+        fd, tmp_filename = tempfile.mkstemp(dir=self.archive_dir, prefix=filename + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+                    for entry in entries:
+                        f.write((json.dumps(entry, default=str) + "\n").encode("utf-8"))
+                        operation = entry.get("operation_type")
+                        operations[operation] = operations.get(operation, 0) + 1
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(tmp_filename, path)
+        except BaseException:
+            try:
+                os.remove(tmp_filename)
+            except OSError:
+                pass
+            raise
+
+        size = os.path.getsize(path)
+        self.bytes_written += size
+        return {
+            "period": period,
+            "file": filename,
+            "first": entry_timestamp(entries[0]),
+            "last": entry_timestamp(entries[-1]),
+            "count": len(entries),
+            "bytes": size,
+            "operations": operations,
+        }
+
+    @staticmethod
+    def _save_segments(manifest, by_period):
+        manifest["segments"] = sorted(by_period.values(), key=lambda segment: (segment["first"], segment["period"]))
+
+    def add(self, entries):
+        """Merge entries into the segments of their months (or years, once compacted)"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        with data_store.transaction(self.manifest_file, {"segments": []}) as manifest:
+            by_period = {segment["period"]: segment for segment in manifest["segments"]}
+            yearly = {period for period in by_period if len(period) == 4}
+
+            groups = {}
+            for entry in entries:
+                groups.setdefault(_segment_period(entry_timestamp(entry), yearly), []).append(entry)
+            for period, group in groups.items():
+                if period in by_period:
+                    group = list(self._read(by_period[period])) + group
+                by_period[period] = self._write(period, group)
+
+            self._save_segments(manifest, by_period)
+
+    def compact(self, before_year):
+        """Merge the monthly segments of every year before before_year into one segment per year.
+
+        Returns the compacted years.
+        """
+        if not os.path.exists(self.manifest_file):
+            return []
+        removed = []
+        with data_store.transaction(self.manifest_file, {"segments": []}) as manifest:
+            by_period = {segment["period"]: segment for segment in manifest["segments"]}
+            years = {}
+            for period in by_period:
+                if len(period) == 7 and period[:4] < before_year:
+                    years.setdefault(period[:4], []).append(period)
+
+            for year, months in years.items():
+                entries = []
+                # "2024" sorts before "2024-01": an earlier compaction of the year comes first
+                for period in sorted(months + ([year] if year in by_period else [])):
+                    entries.extend(self._read(by_period[period]))
+                for period in months:
+                    removed.append(by_period.pop(period)["file"])
+                by_period[year] = self._write(year, entries)
+
+            self._save_segments(manifest, by_period)
+
+        # Delete the merged files only once the manifest no longer lists them
+        for filename in removed:
+            try:
+                os.remove(os.path.join(self.archive_dir, filename))
+            except FileNotFoundError:
+                pass
+        return sorted(years)
+
+    def total(self):
+        """Number of archived entries"""
+        return sum(segment["count"] for segment in self.segments())
+
+    def operation_counts(self):
+        """Return {operation_type: count} over the archived entries"""
+        counts = {}
+        for segment in self.segments():
+            for operation, count in segment["operations"].items():
+                counts[operation] = counts.get(operation, 0) + count
+        return counts
+
+    def overlapping(self, operation_type=None, since=None, until=None):
+        """Return the segments that may hold matching entries, newest first"""
+        since = timestamp_bound(since) if since else None
+        until = timestamp_bound(until, end_of_day=True) if until else None
+        return [
+            segment
+            for segment in reversed(self.segments())
+            if (not since or segment["last"] >= since)
+            and (not until or segment["first"] <= until)
+            and (not operation_type or operation_type in segment["operations"])
+        ]
+
+    @staticmethod
+    def is_cursor(cursor):
+        """Does cursor point into the archive ("archive" or "<period>/<index>")?"""
+        return cursor == ARCHIVE_CURSOR or "/" in cursor
+
+    def page(self, limit=50, cursor=None, operation_type=None, member_id=None, since=None, until=None):
+        """Return one page of archived entries, newest first (same contract as HistoryIndex.page).
+
+        Only the segments overlapping the filters are opened, and only the
+        last limit + 1 matches of a segment are held in memory.
+        """
+        segments = self.overlapping(operation_type, since, until)
+        start_period = start_index = None
+        if cursor and cursor != ARCHIVE_CURSOR:
+            start_period, _, index = cursor.partition("/")
+            start_index = int(index)
+            positions = [i for i, segment in enumerate(segments) if segment["period"] == start_period]
+            if not positions:
+                raise ValueError(f"Unknown history segment {start_period}")
+            segments = segments[positions[0] :]
+
+        since = timestamp_bound(since) if since else None
+        until = timestamp_bound(until, end_of_day=True) if until else None
+
+        entries = []
+        next_cursor = None
+        for number, segment in enumerate(segments):
+            needed = limit - len(entries)
+            stop = start_index if segment["period"] == start_period else None
+            matches = deque(maxlen=needed + 1)
+            for index, entry in enumerate(self._read(segment)):
+                if stop is not None and index >= stop:
+                    break
+                timestamp = entry_timestamp(entry)
+                if until and timestamp > until:
+                    break
+                if since and timestamp < since:
+                    continue
+                if operation_type and entry.get("operation_type") != operation_type:
+                    continue
+                if member_id and (entry.get("member_id") is None or str(entry["member_id"]) != member_id):
+                    continue
+                matches.append((index, entry))
+
+            more = len(matches) > needed
+            taken = list(matches)[1:] if more else list(matches)
+            entries.extend(entry for _, entry in reversed(taken))
+            if len(entries) == limit:
+                if more or number + 1 < len(segments):
+                    next_cursor = f"{segment['period']}/{taken[0][0]}"
+                break
+
+        return {"entries": entries, "next_cursor": next_cursor}
+
+
+class HistoryIndex:
+    """Time-ordered index over a HistoryJournal.
+
+    Keeps (timestamp, seq) keys sorted by time, plus per operation type and
+    per member, and the byte offset of every entry in the journal. The index
+    catches up by reading only the bytes appended since the last refresh, so
+    fetching a page costs O(log n + page size) instead of re-reading and
+    re-sorting the whole history. Only the hot journal is indexed; pages that
+    reach past it continue into the journal's archive.
+    """
+
+    def __init__(self, journal):
+        self.journal = journal
+        self._lock = threading.Lock()
+        self.bytes_read = 0
+        self._reset()
+
+    def _reset(self):
+        self._file_id = None
+        self._indexed_bytes = 0
+        self._offsets = []  # seq -> byte offset of the entry
+        self._timestamps = []  # seq -> timestamp string
+        self._operations = []  # seq -> operation type
+        self._members = []  # seq -> member id or None
+        self._keys = []  # sorted (timestamp, seq)
+        self._by_operation = {}
+        self._by_member = {}
+
+    def _add(self, entry, offset):
+        seq = len(self._offsets)
+        timestamp = entry_timestamp(entry)
+        key = (timestamp, seq)
+        member_id = entry.get("member_id")
+        member_id = str(member_id) if member_id is not None else None
+        self._offsets.append(offset)
+        self._timestamps.append(timestamp)
+        self._operations.append(entry.get("operation_type"))
+        self._members.append(member_id)
+
+        # Entries are appended in (almost) chronological order, so insort is usually an append
+        bisect.insort(self._keys, key)
+        bisect.insort(self._by_operation.setdefault(entry.get("operation_type"), []), key)
+        if member_id is not None:
+            bisect.insort(self._by_member.setdefault(member_id, []), key)
+
+    @contextmanager
+    def _opened(self):
+        """Hold the lock and the journal file open (None if there is none), caught up with the index.
+
+        Offsets are only ever read from the file object they were indexed
+        from, so a roll that replaces the journal in between cannot make them
+        point into the new file.
+        """
+        self.journal.ensure_migrated()
+        with self._lock:
+            try:
+                f = open(self.journal.journal_file, "rb")
+            except FileNotFoundError:
+                self._reset()
+                yield None
+                return
+            with f:
+                self._catch_up(f)
+                yield f
+
+    def _catch_up(self, f):
+        st = os.fstat(f.fileno())
+        file_id = (st.st_dev, st.st_ino)
+        if file_id != self._file_id or st.st_size < self._indexed_bytes:
+            # The journal was replaced or truncated; start over
+            self._reset()
+            self._file_id = file_id
+        if st.st_size == self._indexed_bytes:
+            return
+
+        f.seek(self._indexed_bytes)
+        offset = self._indexed_bytes
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # a write in progress; pick it up next time
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                entry = None
+            if isinstance(entry, dict):
+                self._add(entry, offset)
+            offset += len(line)
+        self.bytes_read += offset - self._indexed_bytes
+        self._indexed_bytes = offset
+
+    def refresh(self):
+        """Index any entries appended to the journal since the last call"""
+        with self._opened():
+            pass
+
+    def _read(self, f, seqs):
+        entries = []
+        for seq in seqs:
+            f.seek(self._offsets[seq])
+            entries.append(json.loads(f.readline()))
+        return entries
+
+    def _cursor(self, seq):
+        """Cursor of the hot journal entry seq; it names the journal file, which a roll replaces"""
+        return f"{seq}@{self._file_id[1]:x}"
+
+    def _cursor_seq(self, cursor):
+        """Return the seq a cursor from _cursor points at (ValueError if the journal was rolled since)"""
+        seq, _, journal = cursor.partition("@")
+        if self._file_id is None or journal != f"{self._file_id[1]:x}":
+            raise ValueError("The history was archived since this cursor was issued")
+        return int(seq)
+
+    def total(self):
+        """Number of entries, archived ones included"""
+        self.refresh()
+        archive = self.journal.archive
+        return len(self._offsets) + (archive.total() if archive is not None else 0)
+
+    def operation_counts(self):
+        """Return {operation_type: count}, archived entries included"""
+        self.refresh()
+        archive = self.journal.archive
+        counts = archive.operation_counts() if archive is not None else {}
+        with self._lock:
+            for operation, keys in self._by_operation.items():
+                counts[operation] = counts.get(operation, 0) + len(keys)
+        return counts
+
+    def page(self, limit=50, cursor=None, operation_type=None, member_id=None, since=None, until=None):
+        """Return one page of entries, newest first.
+
+        cursor is the next_cursor value of the previous page. since/until
+        accept YYYY-MM-DD or YYYY-MM-DD HH:MM:SS and are inclusive.
+        Returns {"entries": [...], "next_cursor": str or None}.
+        """
+        if member_id is not None:
+            member_id = str(member_id)
+
+        archive = self.journal.archive
+        if cursor and archive is not None and archive.is_cursor(cursor):
+            return archive.page(limit, cursor, operation_type, member_id, since, until)
+
+        with self._opened() as f:
+            # Walk the most selective sorted key list; any other filter is checked per entry
+            if operation_type and member_id:
+                by_operation = self._by_operation.get(operation_type, [])
+                by_member = self._by_member.get(member_id, [])
+                keys = by_member if len(by_member) <= len(by_operation) else by_operation
+            elif operation_type:
+                keys = self._by_operation.get(operation_type, [])
+            elif member_id:
+                keys = self._by_member.get(member_id, [])
+            else:
+                keys = self._keys
+
+            hi = len(keys)
+            if until:
+                hi = bisect.bisect_right(keys, (timestamp_bound(until, end_of_day=True), len(self._offsets)))
+            if cursor:
+                seq = self._cursor_seq(cursor)
+                if 0 <= seq < len(self._timestamps):
+                    hi = min(hi, bisect.bisect_left(keys, (self._timestamps[seq], seq)))
+            lo = bisect.bisect_left(keys, (timestamp_bound(since), -1)) if since else 0
+
+            selected = []
+            more = False
+            for i in range(hi - 1, lo - 1, -1):
+                seq = keys[i][1]
+                if operation_type and self._operations[seq] != operation_type:
+                    continue
+                if member_id and self._members[seq] != member_id:
+                    continue
+                if len(selected) == limit:
+                    more = True
+                    break
+                selected.append(seq)
+
+            entries = self._read(f, selected)
+            next_cursor = self._cursor(selected[-1]) if more and selected else None
+
+        if not more and archive is not None:
+            # The hot journal is exhausted; older entries are in the archive
+            if len(entries) < limit:
+                older = archive.page(limit - len(entries), None, operation_type, member_id, since, until)
+                entries.extend(older["entries"])
+                next_cursor = older["next_cursor"]
+            elif archive.overlapping(operation_type, since, until):
+                next_cursor = ARCHIVE_CURSOR
+        return {"entries": entries, "next_cursor": next_cursor}
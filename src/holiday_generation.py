@@ -0,0 +1,296 @@
+"""
+Holiday generation.
+
+Generation is split into independent (country, subdivision, year) work units.
+Each unit's result is cached on disk, keyed by the installed holidays library
+version, so regenerating after adding a member only computes the locations
+and years that have not been seen before. Units that are not cached yet run
+on a process pool (falling back to threads where processes are unavailable).
+
+The holidays dataset records which (country, region, year) units it holds
+under "resolved". HolidayHorizon fills in the missing ones the first time a
+year is viewed, so any year can be shown without generating a wide window
+up front.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import holidays
+
+from datastore import atomic_write, file_lock
+
+# Use a pool only when there is enough work to pay for starting it
+MIN_UNITS_FOR_POOL = 4
+
+
+def compute_unit(country_code, subdivision, year):
+    """Return {date_str: name} for one country (or subdivision) and year"""
+    if subdivision is None:
+        country_holidays = holidays.country_holidays(country_code, years=year)
+    elif country_code == "CA":
+        # Canada uses 'prov' parameter
+        country_holidays = holidays.country_holidays(country_code, prov=subdivision, years=year)
+    else:
+        # Most other countries use 'state' parameter (US, AU, DE, etc.)
+        country_holidays = holidays.country_holidays(country_code, state=subdivision, years=year)
+
+    return {date.strftime("%Y-%m-%d"): name for date, name in country_holidays.items()}
+
+
+def _compute_unit_safe(unit):
+    """compute_unit for pool workers: returns (unit, result, error message, seconds taken)"""
+    started = time.perf_counter()
+    try:
+        return unit, compute_unit(*unit), None, time.perf_counter() - started
+    except Exception as e:
+        return unit, None, str(e), time.perf_counter() - started
+
+
+class HolidayUnitCache:
+    """On-disk cache of work unit results for one holidays library version"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = os.path.join(cache_dir, f"holidays-{holidays.__version__}")
+
+    def _path(self, unit):
+        country_code, subdivision, year = unit
+        return os.path.join(self.cache_dir, f"{country_code}_{subdivision or '_'}_{year}.json")
+
+    def get(self, unit):
+        """Return the cached result of a unit, or None"""
+        try:
+            with open(self._path(unit), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, unit, result):
+        """Store the result of a unit"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        atomic_write(self._path(unit), lambda f: json.dump(result, f))
+
+
+def run_units(units, cache, max_workers=None, progress=None):
+    """Resolve every unit from the cache or by computing it.
+
+    Returns ({unit: {date_str: name}}, {unit: error message}, {unit: seconds} for the units computed).
+    progress(done, total), if given, is called as units are resolved.
+    """
+    results = {}
+    errors = {}
+    durations = {}
+    missing = []
+
+    for unit in units:
+        cached = cache.get(unit)
+        if cached is None:
+            missing.append(unit)
+        else:
+            results[unit] = cached
+
+    cached_count = len(results)
+
+    def reported(outcomes):
+        for done, outcome in enumerate(outcomes, cached_count + 1):
+            if progress is not None:
+                progress(done, len(units))
+            yield outcome
+
+    if progress is not None:
+        progress(cached_count, len(units))
+    if len(missing) < MIN_UNITS_FOR_POOL:
+        outcomes = reported(map(_compute_unit_safe, missing))
+    else:
+        max_workers = max_workers or min(len(missing), os.cpu_count() or 1)
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                outcomes = list(reported(executor.map(_compute_unit_safe, missing)))
+        except (OSError, NotImplementedError, RuntimeError) as e:
+            print(f"Process pool unavailable ({e}), generating holidays on threads")
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                outcomes = list(reported(executor.map(_compute_unit_safe, missing)))
+
+    for unit, result, error, seconds in outcomes:
+        durations[unit] = seconds
+        if error is not None:
+            errors[unit] = error
+            continue
+        cache.put(unit, result)
+        results[unit] = result
+
+    return results, errors, durations
+
+
+def generate_holidays(locations, years, cache, max_workers=None, progress=None):
+    """Generate holiday data for the given locations and years.
+
+    locations is a list of (country_name, country_code, region) tuples, with
+    region None or "" for a national-only location, and cache is a
+    HolidayUnitCache. Returns a dict with the "national"/"regional" holiday
+    structure, the holiday count, the number of units computed, the time
+    spent computing them per country code and any per-unit errors.
+    progress(done, total) is called as work units are resolved.
+    """
+    national_units = {}
+    regional_units = {}
+    for country, country_code, region in locations:
+        for year in years:
+            national_units[(country_code, None, year)] = country
+            if region:
+                regional_units[(country_code, region, year)] = (country, region)
+
+    units = list(national_units) + list(regional_units)
+    results, errors, durations = run_units(units, cache, max_workers, progress)
+
+    holidays_data = {"national": {}, "regional": {}}
+    holiday_count = 0
+
+    for unit, country in national_units.items():
+        country_holidays = holidays_data["national"].setdefault(country, {})
+        for date_str, name in results.get(unit, {}).items():
+            country_holidays[date_str] = name
+            holiday_count += 1
+
+    for unit, (country, region) in regional_units.items():
+        national = holidays_data["national"].get(country, {})
+        region_holidays = holidays_data["regional"].setdefault(country, {}).setdefault(region, {})
+        for date_str, name in results.get(unit, {}).items():
+            # Only add if it's not already in national holidays
+            if date_str not in national:
+                region_holidays[date_str] = name
+                holiday_count += 1
+
+    for (country_code, subdivision, year), error in errors.items():
+        location = f"{subdivision}, {country_code}" if subdivision else country_code
+        print(f"Error generating holidays for {location} in {year}: {error}")
+
+    country_durations = {}
+    for (country_code, subdivision, year), seconds in durations.items():
+        country_durations[country_code] = country_durations.get(country_code, 0.0) + seconds
+
+    return {
+        "holidays": holidays_data,
+        "count": holiday_count,
+        "computed_units": len(durations),
+        "durations": country_durations,
+        "errors": errors,
+    }
+
+
+def resolved_units(locations, years, errors=()):
+    """Return the (country, region, year) units generated for locations, national ones with region "".
+
+    Units that failed (keys of the generate_holidays() errors) are left out,
+    so they are tried again the next time they are needed; a regional unit
+    only holds what its national one lacks, so it fails with it.
+    """
+    units = set()
+    for country, country_code, region in locations:
+        for year in years:
+            if (country_code, None, year) in errors:
+                continue
+            units.add((country, "", year))
+            if region and (country_code, region, year) not in errors:
+                units.add((country, region, year))
+    return sorted(units)
+
+
+def add_resolved(holidays_data, units):
+    """Record units in the "resolved" section of a holidays dataset: {country: {region: [years]}}"""
+    resolved = holidays_data.setdefault("resolved", {})
+    for country, region, year in units:
+        years = resolved.setdefault(country, {}).setdefault(region, [])
+        if year not in years:
+            years.append(year)
+            years.sort()
+
+
+class HolidayHorizon:
+    """Generates the holidays of (country, region, year) units the first time they are needed.
+
+    Requests that need the same units at the same time wait for the one
+    computing them, in this process and (through a lock file) in others.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._pending = {}  # (country, region, year) -> threading.Event set once it is resolved
+
+    @staticmethod
+    def missing(holidays_data, locations, years):
+        """Return the (country, region, year) units of locations and years that holidays_data does not hold"""
+        resolved = holidays_data.get("resolved", {})
+        return [
+            (country, region, year)
+            for country, region in locations
+            for year in years
+            if year not in resolved.get(country, {}).get(region, ())
+        ]
+
+    def resolve(self, units, country_codes, load, store, max_workers=None):
+        """Generate the given units unless another request already is.
+
+        load() returns the current holidays dataset and store(holidays, units)
+        persists generated holidays. Returns the generate_holidays() result,
+        or None if there was nothing left to generate.
+        """
+        done = threading.Event()
+        with self._lock:
+            waiting = {self._pending[unit] for unit in units if unit in self._pending}
+            mine = [unit for unit in units if unit not in self._pending]
+            for unit in mine:
+                self._pending[unit] = done
+
+        generated = None
+        try:
+            if mine:
+                os.makedirs(self.cache.cache_dir, exist_ok=True)
+                with file_lock(os.path.join(self.cache.cache_dir, "resolve.lock")):
+                    # Another worker may have stored them while this one waited for the lock
+                    resolved = load().get("resolved", {})
+                    mine = [
+                        (country, region, year)
+                        for country, region, year in mine
+                        if year not in resolved.get(country, {}).get(region, ())
+                    ]
+                    generated = self._generate(mine, country_codes, max_workers)
+                    if generated is not None:
+                        store(generated["holidays"], generated["units"])
+        finally:
+            with self._lock:
+                for unit in [unit for unit, event in self._pending.items() if event is done]:
+                    del self._pending[unit]
+            done.set()
+
+        for event in waiting:
+            event.wait()
+        return generated
+
+    def _generate(self, units, country_codes, max_workers):
+        by_year = {}
+        for country, region, year in units:
+            if country_codes.get(country):
+                by_year.setdefault(year, set()).add((country, country_codes[country], region or None))
+        if not by_year:
+            return None
+
+        combined = {"holidays": {"national": {}, "regional": {}}, "units": [], "count": 0, "durations": {}}
+        combined["errors"] = {}
+        for year, locations in sorted(by_year.items()):
+            generated = generate_holidays(sorted(locations, key=str), [year], self.cache, max_workers)
+            for country, dates in generated["holidays"]["national"].items():
+                combined["holidays"]["national"].setdefault(country, {}).update(dates)
+            for country, regions in generated["holidays"]["regional"].items():
+                for region, dates in regions.items():
+                    combined["holidays"]["regional"].setdefault(country, {}).setdefault(region, {}).update(dates)
+            combined["units"] += resolved_units(locations, [year], generated["errors"])
+            combined["errors"].update(generated["errors"])
+            combined["count"] += generated["count"]
+            for country_code, seconds in generated["durations"].items():
+                combined["durations"][country_code] = combined["durations"].get(country_code, 0.0) + seconds
+        return combined
@@ -0,0 +1,138 @@
+"""
+iCalendar (.ics) subscription feeds.
+
+A feed combines the OOO entries of a set of members with the holidays of
+their locations, as all-day events. Feeds are produced line by line so the
+first bytes go out before the whole calendar is built; a complete feed is
+kept in FeedCache together with the data versions it was built from, so
+the polls calendar clients send every few minutes are answered from memory
+until members, holidays or OOO data change.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+
+PRODUCT_ID = "-//Team Availability//Leave App//EN"
+UID_DOMAIN = "leave-app"
+
+
+def escape_text(text):
+    """Escape a TEXT property value (RFC 5545 section 3.3.11)"""
+    return str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def fold(line):
+    """Fold a content line into 75-octet pieces joined by CRLF + space"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    pieces = []
+    while encoded:
+        limit = 75 if not pieces else 74
+        # Do not split a multi-byte UTF-8 character
+        while limit < len(encoded) and (encoded[limit] & 0xC0) == 0x80:
+            limit -= 1
+        pieces.append(encoded[:limit].decode("utf-8"))
+        encoded = encoded[limit:]
+    return "\r\n ".join(pieces) + "\r\n"
+
+
+def _all_day_event(uid, start_str, end_str, summary, stamp, categories):
+    end = date.fromisoformat(end_str) + timedelta(days=1)  # DTEND is exclusive
+    return [
+        "BEGIN:VEVENT",
+        f"UID:{uid}@{UID_DOMAIN}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART;VALUE=DATE:{start_str.replace('-', '')}",
+        f"DTEND;VALUE=DATE:{end.strftime('%Y%m%d')}",
+        f"SUMMARY:{escape_text(summary)}",
+        f"CATEGORIES:{categories}",
+        "TRANSP:TRANSPARENT",
+        "END:VEVENT",
+    ]
+
+
+def iter_feed(name, members, holidays_data, ooo_data, locations):
+    """Yield the lines of a feed with the OOO entries of members and the holidays of locations.
+
+    locations is an iterable of (country, region) pairs; region may be empty.
+    """
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    yield "BEGIN:VCALENDAR\r\n"
+    yield "VERSION:2.0\r\n"
+    yield f"PRODID:{PRODUCT_ID}\r\n"
+    yield "CALSCALE:GREGORIAN\r\n"
+    yield "METHOD:PUBLISH\r\n"
+    yield fold(f"X-WR-CALNAME:{escape_text(name)}")
+
+    for member_id, member_info in members.items():
+        for entry in ooo_data.get(member_id, []):
+            reason = entry.get("reason") or "OOO"
+            digest = hashlib.sha1(reason.encode("utf-8")).hexdigest()[:8]
+            uid = f"ooo-{member_id}-{entry['start_date']}-{entry['end_date']}-{digest}"
+            summary = f"{member_info['name']}: {reason}"
+            for line in _all_day_event(uid, entry["start_date"], entry["end_date"], summary, stamp, "OOO"):
+                yield fold(line)
+
+    national = holidays_data.get("national", {})
+    regional = holidays_data.get("regional", {})
+    countries_done = set()
+    for country, region in sorted(set(locations)):
+        sources = []
+        if country not in countries_done:
+            countries_done.add(country)
+            sources.append((national.get(country, {}), country, ""))
+        if region:
+            sources.append((regional.get(country, {}).get(region, {}), f"{region}, {country}", region))
+        for dates, place, region_key in sources:
+            for date_str, holiday_name in sorted(dates.items()):
+                uid = f"holiday-{country}-{region_key or 'national'}-{date_str}".replace(" ", "_")
+                summary = f"Holiday: {holiday_name} ({place})"
+                for line in _all_day_event(uid, date_str, date_str, summary, stamp, "Holiday"):
+                    yield fold(line)
+
+    yield "END:VCALENDAR\r\n"
+
+
+class FeedCache:
+    """LRU of complete feed bodies, each valid for the data versions it was built from"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (versions, body)
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key, versions):
+        """Return the cached body for key if it was built from versions, else None"""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None or cached[0] != versions:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return cached[1]
+
+    def put(self, key, versions, body):
+        with self._lock:
+            self._entries[key] = (versions, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def stream(self, key, versions, chunks):
+        """Yield chunks and cache the complete body once they have all been sent"""
+        sent = []
+        for chunk in chunks:
+            sent.append(chunk)
+            yield chunk
+        self.put(key, versions, "".join(sent))
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, size=len(self._entries), max_size=self.max_size)
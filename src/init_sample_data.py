@@ -2,21 +2,55 @@
 """
 Sample data initialization script for Team Availability App
 Run this script to populate the app with sample data for testing
+
+Without options it writes empty data files. With --members it generates a
+synthetic dataset instead, e.g. for benchmarking:
+
+    python init_sample_data.py --members 1000 --ooo-per-member 10 --holiday-years 3 --history 50000
 """
 
+import argparse
 import json
 import os
+import random
+from datetime import date, datetime, timedelta
+
+import holidays
+
+from holiday_generation import HolidayUnitCache, add_resolved, generate_holidays, resolved_units
+
+# Countries configuration
+COUNTRIES = {
+    "countries": {
+        "AU": {"name": "Australia", "code": "AU"},
+        "CN": {"name": "China", "code": "CN"},
+        "US": {"name": "United States", "code": "US"},
+    }
+}
+
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn", "Wei", "Li"]
+LAST_NAMES = ["Smith", "Chen", "Nguyen", "Garcia", "Brown", "Wang", "Patel", "Kim", "Jones", "Zhang", "Lee", "Martin"]
+OOO_REASONS = ["Vacation", "Vacation", "Vacation", "Sick Leave", "Personal", "Training", "Conference"]
+HISTORY_OPERATIONS = ["ADD_OOO", "ADD_OOO", "ADD_OOO", "DELETE_OOO", "CANCEL_VACATION", "ADD_MEMBER", "ADD_HOLIDAY"]
 
+# (month, day) windows most people take leave in, so OOO entries overlap across members
+PEAK_WINDOWS = [((12, 18), 21), ((7, 1), 21), ((4, 1), 14)]
 
-def create_data_files():
+
+def write_json(filename, data):
+    with open(filename, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def create_data_files(data_dir=None, config_dir=None):
     """Create data files with proper structure"""
 
     # Get the directory where this script is located
     script_dir = os.path.dirname(os.path.abspath(__file__))
 
     # Create directories relative to script location
-    data_dir = os.path.join(script_dir, "data")
-    config_dir = os.path.join(script_dir, "config")
+    data_dir = data_dir or os.path.join(script_dir, "data")
+    config_dir = config_dir or os.path.join(script_dir, "config")
 
     os.makedirs(data_dir, exist_ok=True)
     os.makedirs(config_dir, exist_ok=True)
@@ -25,41 +59,160 @@ def create_data_files():
     members = {}
 
     # Holidays data (empty structure)
-    holidays = {"national": {}, "regional": {}}
+    holidays_data = {"national": {}, "regional": {}}
 
     # Out of office data (empty by default)
     ooo = {}
 
-    # History data (empty list)
-    history = []
+    # Save files using absolute paths
+    write_json(os.path.join(data_dir, "members.json"), members)
+    write_json(os.path.join(data_dir, "holidays.json"), holidays_data)
+    write_json(os.path.join(data_dir, "ooo.json"), ooo)
 
-    # Countries configuration
-    countries = {
-        "countries": {
-            "AU": {"name": "Australia", "code": "AU"},
-            "CN": {"name": "China", "code": "CN"},
-            "US": {"name": "United States", "code": "US"},
-        }
-    }
+    # History journal (JSON Lines, empty)
+    with open(os.path.join(data_dir, "history.jsonl"), "w") as f:
+        pass
 
-    # Save files using absolute paths
-    with open(os.path.join(data_dir, "members.json"), "w") as f:
-        json.dump(members, f, indent=2)
+    write_json(os.path.join(config_dir, "countries.json"), COUNTRIES)
 
-    with open(os.path.join(data_dir, "holidays.json"), "w") as f:
-        json.dump(holidays, f, indent=2)
+    print("Data files created successfully!")
 
-    with open(os.path.join(data_dir, "ooo.json"), "w") as f:
-        json.dump(ooo, f, indent=2)
 
-    with open(os.path.join(data_dir, "history.json"), "w") as f:
-        json.dump(history, f, indent=2)
+def sample_years(holiday_years):
+    """The holiday_years years ending with next year (the years the app generates by default)"""
+    last_year = datetime.now().year + (1 if holiday_years > 1 else 0)
+    return list(range(last_year - holiday_years + 1, last_year + 1))
 
-    with open(os.path.join(config_dir, "countries.json"), "w") as f:
-        json.dump(countries, f, indent=2)
 
-    print("Data files created successfully!")
+def sample_members(rng, count):
+    """count members spread over the configured countries and their regions"""
+    countries = list(COUNTRIES["countries"].values())
+    regions = {}
+    for country in countries:
+        try:
+            regions[country["name"]] = sorted(holidays.country_holidays(country["code"]).subdivisions)
+        except Exception:
+            regions[country["name"]] = []
+
+    members = {}
+    for member_id in range(1, count + 1):
+        country = rng.choice(countries)["name"]
+        region = rng.choice(regions[country]) if regions[country] and rng.random() < 0.8 else ""
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {member_id}"
+        members[str(member_id)] = {"name": name, "country": country, "region": region}
+    return members
+
+
+def sample_ooo_entries(rng, count, first_day, last_day):
+    """count non-overlapping OOO entries between first_day and last_day, clustered around peak windows"""
+    span = (last_day - first_day).days
+    entries = []
+    for _ in range(count):
+        if rng.random() < 0.4:
+            (month, day), window = rng.choice(PEAK_WINDOWS)
+            year = rng.randint(first_day.year, last_day.year)
+            start = date(year, month, day) + timedelta(days=rng.randrange(window))
+        else:
+            start = first_day + timedelta(days=rng.randrange(span + 1))
+
+        roll = rng.random()
+        length = 1 if roll < 0.4 else rng.randint(2, 5) if roll < 0.8 else rng.randint(6, 15)
+        entries.append((start, length))
+
+    # Shift entries forward so that one member's entries never overlap
+    result = []
+    next_free = first_day
+    for start, length in sorted(entries):
+        start = max(start, next_free)
+        end = start + timedelta(days=length - 1)
+        if end > last_day:
+            break
+        result.append(
+            {"start_date": start.isoformat(), "end_date": end.isoformat(), "reason": rng.choice(OOO_REASONS)}
+        )
+        next_free = end + timedelta(days=2)
+    return result
+
+
+def write_history(filename, rng, count, members, first_day):
+    """Write count history entries with increasing timestamps from first_day up to now"""
+    member_ids = list(members)
+    start = datetime.combine(first_day, datetime.min.time())
+    step = (datetime.now() - start) / max(count, 1)
+    with open(filename, "w") as f:
+        for i in range(count):
+            operation_type = rng.choice(HISTORY_OPERATIONS)
+            member_id = rng.choice(member_ids) if member_ids and operation_type != "ADD_HOLIDAY" else None
+            member_name = members[member_id]["name"] if member_id else "System"
+            entry = {
+                "timestamp": (start + step * i).strftime("%Y-%m-%d %H:%M:%S"),
+                "operation_type": operation_type,
+                "member_id": member_id,
+                "member_name": member_name,
+                "details": f"Synthetic {operation_type.lower().replace('_', ' ')} #{i}",
+            }
+            f.write(json.dumps(entry) + "\n")
+
+
+def create_sample_data(data_dir, members=100, ooo_per_member=5, holiday_years=2, history=1000, seed=0):
+    """Generate a synthetic dataset in data_dir and return its sizes"""
+    rng = random.Random(seed)
+    os.makedirs(data_dir, exist_ok=True)
+
+    years = sample_years(holiday_years)
+    first_day = date(years[0], 1, 1)
+    last_day = date(years[-1], 12, 31)
+
+    members_data = sample_members(rng, members)
+
+    ooo = {}
+    for member_id in members_data:
+        entries = sample_ooo_entries(rng, ooo_per_member, first_day, last_day)
+        if entries:
+            ooo[member_id] = entries
+
+    # Holidays for every location in use, generated the same way as /api/generate_holidays
+    country_codes = {country["name"]: country["code"] for country in COUNTRIES["countries"].values()}
+    locations = {(m["country"], country_codes[m["country"]], m["region"] or None) for m in members_data.values()}
+    locations = sorted(locations, key=str)
+    generated = generate_holidays(locations, years, HolidayUnitCache(os.path.join(data_dir, "cache")))
+    # Record the seeded years as resolved, so the app does not generate them again on first view
+    add_resolved(generated["holidays"], resolved_units(locations, years, generated["errors"]))
+
+    write_json(os.path.join(data_dir, "members.json"), members_data)
+    write_json(os.path.join(data_dir, "holidays.json"), generated["holidays"])
+    write_json(os.path.join(data_dir, "ooo.json"), ooo)
+    write_history(os.path.join(data_dir, "history.jsonl"), rng, history, members_data, first_day)
+
+    return {
+        "members": len(members_data),
+        "ooo_entries": sum(len(entries) for entries in ooo.values()),
+        "holidays": generated["count"],
+        "years": years,
+        "history": history,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the app's data files, optionally with synthetic data")
+    parser.add_argument("--data-dir", help="directory to write to (default: src/data)")
+    parser.add_argument("--members", type=int, help="generate this many members (default: write empty files)")
+    parser.add_argument("--ooo-per-member", type=int, default=5, help="OOO entries per member")
+    parser.add_argument("--holiday-years", type=int, default=2, help="years of holidays, ending next year")
+    parser.add_argument("--history", type=int, default=1000, help="number of history entries")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    if args.members is None:
+        create_data_files(args.data_dir)
+        return
+
+    data_dir = args.data_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    sizes = create_sample_data(
+        data_dir, args.members, args.ooo_per_member, args.holiday_years, args.history, args.seed
+    )
+    print(f"Sample data created in {data_dir}: {json.dumps(sizes)}")
 
 
 if __name__ == "__main__":
-    create_data_files()
+    main()
@@ -0,0 +1,172 @@
+"""
+Background jobs for long operations.
+
+Holiday generation, bulk OOO imports and history compaction run on a small
+thread pool in the worker that accepted them, so the request returns a job
+id at once instead of holding a gunicorn worker for the whole run. Jobs are
+recorded in a table on local disk (a JSON file written through the data
+store), so any worker can answer /api/jobs/<id> for progress and results.
+
+Submitting a job that is identical to one still queued or running (same
+kind, team and parameters) returns the existing job instead of starting a
+second one. A job whose worker exited before it finished, or that has not
+sent a heartbeat for heartbeat_timeout seconds, is reported as failed the
+next time it is looked at, so it can be submitted again. Workers are told
+apart by a lock file each holds while it runs (see datastore.ProcessLock),
+not by pid, which the operating system reuses.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from datastore import ProcessLock, data_store
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class JobRunner:
+    """Thread pool plus the persisted job table"""
+
+    def __init__(
+        self,
+        jobs_file,
+        max_workers=2,
+        keep=200,
+        progress_interval=0.5,
+        heartbeat_interval=10.0,
+        heartbeat_timeout=120.0,
+    ):
+        self.jobs_file = jobs_file
+        self.max_workers = max_workers
+        self.keep = keep  # finished jobs kept in the table
+        self.progress_interval = progress_interval  # seconds between progress writes
+        self.heartbeat_interval = heartbeat_interval  # seconds between heartbeats of a running job
+        self.heartbeat_timeout = heartbeat_timeout  # a running job without a heartbeat for this long is failed
+        self.process_lock = ProcessLock(os.path.splitext(jobs_file)[0] + "-workers")
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _pool(self):
+        # Created on first use, i.e. in the worker process after gunicorn forked
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+            return self._executor
+
+    @staticmethod
+    def job_key(kind, scope, params):
+        """Fingerprint of a job's kind, scope and parameters, used to de-duplicate submissions"""
+        text = json.dumps([kind, scope, params], sort_keys=True, default=str)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _interrupted(self, job):
+        """Return why an active job will never finish (its worker exited or it stopped sending heartbeats), or None"""
+        if job["status"] not in ACTIVE_STATUSES:
+            return None
+        if job.get("owner") is None or not self.process_lock.is_alive(job["owner"]):
+            return "Interrupted: the worker running the job exited"
+        if job["status"] == RUNNING and time.time() - (job["heartbeat"] or 0) > self.heartbeat_timeout:
+            return f"Interrupted: no heartbeat for {self.heartbeat_timeout:g} seconds"
+        return None
+
+    def _prune(self, table):
+        """Fail interrupted jobs and drop the oldest finished ones beyond keep"""
+        for job in table.values():
+            error = self._interrupted(job)
+            if error:
+                job.update(status=FAILED, error=error, finished=_now())
+        finished = [job_id for job_id, job in table.items() if job["status"] not in ACTIVE_STATUSES]
+        for job_id in finished[: max(0, len(finished) - self.keep)]:
+            del table[job_id]
+
+    def submit(self, kind, params, run, scope=None):
+        """Queue run(progress) unless an identical job is active; returns (job, True if it was queued now).
+
+        run is called on a pool thread with progress(done, total=None,
+        message=None) and returns the job's JSON-serializable result.
+        """
+        key = self.job_key(kind, scope, params)
+        with data_store.transaction(self.jobs_file, {}) as table:
+            self._prune(table)
+            for job in table.values():
+                if job["key"] == key and job["status"] in ACTIVE_STATUSES:
+                    return dict(job), False
+            job = {
+                "id": uuid.uuid4().hex,
+                "kind": kind,
+                "scope": scope,
+                "params": params,
+                "key": key,
+                "status": QUEUED,
+                "progress": None,
+                "result": None,
+                "error": None,
+                "pid": os.getpid(),
+                "owner": self.process_lock.id,
+                "heartbeat": None,
+                "created": _now(),
+                "started": None,
+                "finished": None,
+            }
+            table[job["id"]] = job
+
+        self._pool().submit(self._run, job["id"], run)
+        return dict(job), True
+
+    def _update(self, job_id, **fields):
+        with data_store.transaction(self.jobs_file, {}) as table:
+            if job_id in table:
+                table[job_id].update(fields)
+
+    def _heartbeat(self, job_id, stop):
+        while not stop.wait(self.heartbeat_interval):
+            self._update(job_id, heartbeat=time.time())
+
+    def _run(self, job_id, run):
+        self._update(job_id, status=RUNNING, started=_now(), heartbeat=time.time())
+        stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job_id, stop), name="job-heartbeat", daemon=True).start()
+        last_write = 0.0
+
+        def progress(done, total=None, message=None):
+            nonlocal last_write
+            now = time.monotonic()
+            if now - last_write >= self.progress_interval or (total is not None and done >= total):
+                last_write = now
+                progress_fields = {"done": done, "total": total, "message": message}
+                self._update(job_id, progress=progress_fields, heartbeat=time.time())
+
+        try:
+            result = run(progress)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self._update(job_id, status=FAILED, error=str(e) or type(e).__name__, finished=_now())
+        else:
+            self._update(job_id, status=SUCCEEDED, result=result, finished=_now())
+        finally:
+            stop.set()
+
+    def get(self, job_id):
+        """Return a copy of a job, or None if there is no such job"""
+        job = data_store.load(self.jobs_file, {}).get(job_id)
+        if job is None:
+            return None
+        job = dict(job)
+        error = self._interrupted(job)
+        if error:
+            job.update(status=FAILED, error=error)
+        return job
@@ -0,0 +1,93 @@
+"""
+Secondary index from (country, region) to member ids.
+
+Answers "which locations are in use", "who is at this location" and
+"how many members per location" without scanning every member. Like the
+OOO index it is updated incrementally by the routes that add or delete
+members and only rebuilt when members.json changes behind our back.
+"""
+
+import threading
+
+
+class LocationIndex:
+    """Member ids grouped by (country, region); region is "" for national-only members"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._members = {}  # (country, region) -> {member_id: None}, in insertion order
+        self._locations = {}  # member_id -> (country, region)
+        self._version = None
+
+    @staticmethod
+    def location_of(member_info):
+        return (member_info["country"], member_info.get("region") or "")
+
+    def ensure(self, members, version):
+        """Rebuild from members unless the index already reflects this data version"""
+        with self._lock:
+            if version is None or version != self._version:
+                self._members = {}
+                self._locations = {}
+                for member_id, member_info in members.items():
+                    self._add(member_id, member_info)
+                self._version = version
+            return self
+
+    @property
+    def version(self):
+        """Data version the index currently reflects (None if it must be rebuilt)"""
+        return self._version
+
+    def mark_synced(self, version):
+        """Record that incremental updates have brought the index up to version (None forces a rebuild)"""
+        with self._lock:
+            self._version = version
+
+    def _add(self, member_id, member_info):
+        location = self.location_of(member_info)
+        self._locations[member_id] = location
+        self._members.setdefault(location, {})[member_id] = None
+
+    def add(self, member_id, member_info):
+        """Index a member that was added (or moved)"""
+        with self._lock:
+            self._remove(member_id)
+            self._add(member_id, member_info)
+
+    def _remove(self, member_id):
+        location = self._locations.pop(member_id, None)
+        if location is None:
+            return
+        members = self._members[location]
+        members.pop(member_id, None)
+        if not members:
+            del self._members[location]
+
+    def remove(self, member_id):
+        """Drop a deleted member"""
+        with self._lock:
+            self._remove(member_id)
+
+    def locations(self):
+        """Return {(country, region): member count} for every location in use"""
+        with self._lock:
+            return {location: len(members) for location, members in self._members.items()}
+
+    def countries(self):
+        """Return {country: member count}"""
+        counts = {}
+        for (country, _), count in self.locations().items():
+            counts[country] = counts.get(country, 0) + count
+        return counts
+
+    def member_ids(self, country=None, region=None):
+        """Return the ids of the members at a country and/or region (grouped by location)"""
+        with self._lock:
+            return [
+                member_id
+                for (member_country, member_region), members in self._members.items()
+                if (not country or member_country == country) and (not region or member_region == region)
+                for member_id in members
+            ]
+
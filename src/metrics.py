@@ -0,0 +1,185 @@
+"""
+Request and storage metrics in Prometheus text format.
+
+Each process records counters and histograms in memory (a dict update under
+a lock, so recording is cheap) and periodically writes a snapshot of them to
+its own file in a shared directory. /metrics reads the snapshots of the
+processes still running and sums their counters and histograms, so the
+numbers cover all gunicorn workers rather than whichever one happened to
+serve the scrape. Gauges are not summed: each worker's value is reported
+with a pid label. A process holds a lock file next to its snapshot for as
+long as it runs (see datastore.ProcessLock); the snapshots of processes
+that exited, e.g. workers recycled by max_requests, are deleted at the next
+render, and the totals drop back as for a counter reset.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+
+from datastore import ProcessLock, atomic_write
+
+# Latency buckets in seconds (+Inf is implied)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# How often a process writes its snapshot (at most), in seconds
+FLUSH_INTERVAL = 1.0
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Counters, gauges and histograms for one process, aggregated across processes on render"""
+
+    def __init__(self, directory, buckets=DEFAULT_BUCKETS):
+        self.directory = directory
+        self.buckets = tuple(buckets)
+        self.process_lock = ProcessLock(directory)
+        self._lock = threading.Lock()
+        self._help = {}  # name -> (type, help)
+        self._values = {}  # (name, labels) -> number
+        self._histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self._collectors = []
+        self._last_flush = 0.0
+        atexit.register(self.flush, force=True)
+
+    def describe(self, name, metric_type, help_text):
+        """Declare a metric's type ("counter", "gauge" or "histogram") and help text"""
+        self._help[name] = (metric_type, help_text)
+
+    def add_collector(self, collect):
+        """Register collect() -> [(name, {labels}, value)], called when the snapshot is written.
+
+        Use it for numbers another component already keeps (cache hit
+        counters, sizes) instead of recording them on every change.
+        """
+        self._collectors.append(collect)
+
+    def inc(self, name, labels=None, value=1):
+        """Add value to a counter"""
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        """Record one observation in a histogram"""
+        key = (name, tuple(sorted((labels or {}).items())))
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += value
+
+    def _snapshot(self):
+        with self._lock:
+            values = [[name, list(labels), value] for (name, labels), value in self._values.items()]
+            histograms = [[name, list(labels), list(counts)] for (name, labels), counts in self._histograms.items()]
+        for collect in self._collectors:
+            try:
+                for name, labels, value in collect():
+                    values.append([name, sorted(labels.items()), value])
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        return {"pid": os.getpid(), "buckets": list(self.buckets), "values": values, "histograms": histograms}
+
+    @property
+    def snapshot_file(self):
+        return os.path.join(self.directory, f"{self.process_lock.id}.json")
+
+    def flush(self, force=False):
+        """Write this process's snapshot, unless one was written less than FLUSH_INTERVAL ago"""
+        now = time.monotonic()
+        if not force and now - self._last_flush < FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        try:
+            snapshot = self._snapshot()
+            os.makedirs(self.directory, exist_ok=True)
+            # A snapshot is rewritten every FLUSH_INTERVAL and worthless after a crash: no fsync
+            atomic_write(self.snapshot_file, lambda f: json.dump(snapshot, f), fsync=False)
+        except OSError as e:
+            print(f"Could not write metrics snapshot: {e}")
+
+    def _merged(self):
+        """Sum the snapshots of the running processes, deleting those of processes that exited"""
+        values = {}
+        histograms = {}
+        try:
+            filenames = [name for name in os.listdir(self.directory) if name.endswith(".json")]
+        except FileNotFoundError:
+            filenames = []
+
+        for filename in filenames:
+            process_id = filename[: -len(".json")]
+            if not self.process_lock.is_alive(process_id):
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+                self.process_lock.forget(process_id)
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), "r") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if tuple(snapshot.get("buckets", ())) != self.buckets:
+                continue  # written with different buckets; cannot be summed
+            for name, labels, value in snapshot["values"]:
+                key = (name, tuple(map(tuple, labels)))
+                if self._help.get(name, ("untyped",))[0] == "gauge":
+                    key = (name, key[1] + (("pid", str(snapshot.get("pid", "")),),))
+                values[key] = values.get(key, 0) + value
+            for name, labels, counts in snapshot["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, [0] * len(counts))
+                histograms[key] = [a + b for a, b in zip(merged, counts)]
+
+        return values, histograms
+
+    def render(self):
+        """Return the metrics of all processes in Prometheus text exposition format"""
+        self.flush(force=True)
+        values, histograms = self._merged()
+
+        by_name = {}
+        for (name, labels), value in values.items():
+            by_name.setdefault(name, []).append((labels, value))
+        for (name, labels), counts in histograms.items():
+            by_name.setdefault(name, []).append((labels, counts))
+
+        lines = []
+        for name in sorted(by_name):
+            metric_type, help_text = self._help.get(name, ("untyped", ""))
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in sorted(by_name[name], key=lambda item: item[0]):
+                if metric_type != "histogram":
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), value[:-1]):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _format_value(float(bound))
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(float(value[-1]))}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+        return "\n".join(lines) + "\n"
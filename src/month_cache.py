@@ -0,0 +1,116 @@
+"""
+Cache of rendered calendar months.
+
+Keeps the computed availability dict (and, when it could be cached, the
+rendered HTML) of recently viewed months in a bounded LRU. Every entry
+records the versions of the members / holidays / ooo datasets it was built
+from and is only served while they are still current.
+
+When a route in this process writes a dataset it reports which months the
+write touched (note_write). Entries for other months are carried forward to
+the new version instead of being thrown away, so adding an OOO entry in
+March leaves a cached January untouched. A write made by another worker
+shows up as a version that is not exactly one step ahead, and every entry
+built on the older version is dropped.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date
+
+
+def months_between(start_str, end_str):
+    """Return the (year, month) pairs covered by an inclusive YYYY-MM-DD range"""
+    start = date.fromisoformat(start_str)
+    end = date.fromisoformat(end_str)
+    months = set()
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.add((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def changed_holiday_months(before, after):
+    """Return the (year, month) pairs whose holidays differ between two holidays datasets"""
+
+    def flatten(holidays_data):
+        cells = set()
+        for country, country_holidays in holidays_data.get("national", {}).items():
+            cells.update((country, None, date_str, name) for date_str, name in country_holidays.items())
+        for country, regions in holidays_data.get("regional", {}).items():
+            for region, region_holidays in regions.items():
+                cells.update((country, region, date_str, name) for date_str, name in region_holidays.items())
+        return cells
+
+    changed = flatten(before) ^ flatten(after)
+    return {(int(cell[2][:4]), int(cell[2][5:7])) for cell in changed}
+
+
+class MonthCache:
+    """LRU of {(year, month): entry} validated against dataset versions"""
+
+    def __init__(self, max_size, is_next_version):
+        self.max_size = max_size
+        self.is_next_version = is_next_version
+        self._lock = threading.Lock()
+        # (year, month) -> {"versions": {dataset: version}, "availability": ..., "html": ...}
+        self._entries = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, year, month, versions):
+        """Return the entry for a month if it was built from versions, else None"""
+        with self._lock:
+            entry = self._entries.get((year, month))
+            if entry is not None and entry["versions"] != versions:
+                del self._entries[(year, month)]
+                self._counters["invalidations"] += 1
+                entry = None
+
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+
+            self._entries.move_to_end((year, month))
+            self._counters["hits"] += 1
+            return entry
+
+    def put(self, year, month, versions, availability, html=None):
+        """Store a month built from versions, evicting the least recently used months if full"""
+        with self._lock:
+            self._entries[(year, month)] = {"versions": dict(versions), "availability": availability, "html": html}
+            self._entries.move_to_end((year, month))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def note_write(self, dataset, version, months=None):
+        """Record a write to dataset made by this process, now at version.
+
+        Entries for the given months (every month if months is None) are
+        dropped; the others are moved to the new version if it is exactly one
+        write ahead of the one they were built from.
+        """
+        with self._lock:
+            for key in list(self._entries):
+                entry = self._entries[key]
+                if (months is None or key not in months) and self.is_next_version(
+                    entry["versions"].get(dataset), version
+                ):
+                    entry["versions"][dataset] = version
+                else:
+                    del self._entries[key]
+                    self._counters["invalidations"] += 1
+
+    def clear(self):
+        """Drop every cached month"""
+        with self._lock:
+            self._counters["invalidations"] += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        """Return size, hit rate and eviction counters"""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            hit_rate = self._counters["hits"] / lookups if lookups else 0.0
+            return dict(self._counters, size=len(self._entries), max_size=self.max_size, hit_rate=round(hit_rate, 3))
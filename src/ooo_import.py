@@ -0,0 +1,175 @@
+"""
+Bulk import of out of office entries from CSV or iCalendar files.
+
+Files are read line by line, so an export with tens of thousands of entries
+never has to be held in memory as text. Every row is validated on its own:
+a bad row is reported with its row (or event) number and skipped, and the
+rest of the batch is still imported.
+
+CSV files need a header with member_id, start_date and end_date columns
+(reason is optional). In .ics files each VEVENT becomes one entry: SUMMARY
+is the reason, DTSTART/DTEND the dates (DTEND is exclusive, as in the
+iCalendar spec) and the member is taken from an X-MEMBER-ID property, or
+from the default member id given for the whole file.
+"""
+
+import csv
+from datetime import date, datetime, timedelta
+
+DEFAULT_REASON = "Vacation"
+CSV_REQUIRED_COLUMNS = ("member_id", "start_date", "end_date")
+
+
+class ImportResult:
+    """Entries that passed validation and per-row errors"""
+
+    def __init__(self):
+        self.entries = []  # (member_id, entry)
+        self.errors = []  # {"row": n, "error": message}
+        self.rows = 0
+
+    def to_dict(self, max_errors):
+        return {
+            "rows": self.rows,
+            "imported": len(self.entries),
+            "rejected": len(self.errors),
+            "errors": self.errors[:max_errors],
+        }
+
+
+def detect_format(filename):
+    """Return "ics" or "csv" from a file name"""
+    return "ics" if filename.lower().endswith((".ics", ".ical", ".ifb", ".icalendar")) else "csv"
+
+
+def iter_csv_rows(lines):
+    """Yield (row number, {"member_id", "start_date", "end_date", "reason"} or error message)"""
+    reader = csv.DictReader(lines)
+    columns = [(name or "").strip().lower() for name in reader.fieldnames or []]
+    missing = [name for name in CSV_REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        yield 1, f"Missing CSV columns: {', '.join(missing)}"
+        return
+    reader.fieldnames = columns
+
+    for row in reader:
+        # Row numbers count the header as row 1, like a spreadsheet
+        yield reader.line_num, {name: (row.get(name) or "").strip() for name in CSV_REQUIRED_COLUMNS + ("reason",)}
+
+
+def _unfold(lines):
+    """Join iCalendar continuation lines (starting with a space or tab) onto the previous line"""
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _ics_date(value, params):
+    """Parse a DTSTART/DTEND value; returns (date, is_midnight)"""
+    value = value.strip()
+    if "VALUE=DATE" in params.upper() or len(value) == 8:
+        return datetime.strptime(value[:8], "%Y%m%d").date(), True
+    moment = datetime.strptime(value.rstrip("Z")[:15], "%Y%m%dT%H%M%S")
+    return moment.date(), moment.time() == datetime.min.time()
+
+
+def _ics_unescape(text):
+    return text.replace("\\n", " ").replace("\\N", " ").replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+
+
+def iter_ics_rows(lines, default_member_id=None):
+    """Yield (event number, record or error message) for every VEVENT"""
+    event = None
+    number = 0
+    for line in _unfold(lines):
+        name, _, value = line.partition(":")
+        name, _, params = name.partition(";")
+        name = name.upper()
+
+        if name == "BEGIN" and value.strip().upper() == "VEVENT":
+            number += 1
+            event = {}
+        elif name == "END" and value.strip().upper() == "VEVENT" and event is not None:
+            yield number, _ics_record(event, default_member_id)
+            event = None
+        elif event is not None and name in ("DTSTART", "DTEND", "SUMMARY", "X-MEMBER-ID"):
+            event[name] = (value, params)
+
+
+def _ics_record(event, default_member_id):
+    if "DTSTART" not in event:
+        return "Event has no DTSTART"
+    try:
+        start, _ = _ics_date(*event["DTSTART"])
+        end = start
+        if "DTEND" in event:
+            end, midnight = _ics_date(*event["DTEND"])
+            # DTEND is exclusive: an all-day event ending on the 5th ends on the 4th
+            if midnight and end > start:
+                end -= timedelta(days=1)
+    except ValueError:
+        return "Invalid DTSTART/DTEND"
+
+    member_id = event.get("X-MEMBER-ID", ("", ""))[0].strip() or default_member_id or ""
+    return {
+        "member_id": member_id,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "reason": _ics_unescape(event.get("SUMMARY", ("", ""))[0]).strip(),
+    }
+
+
+def validate(rows, members, existing_ooo):
+    """Check every row and collect the entries to import.
+
+    Rejects unknown members, invalid or reversed dates, and entries that
+    already exist (in the data or earlier in the same file).
+    """
+    result = ImportResult()
+    seen = {
+        (member_id, e["start_date"], e["end_date"], e["reason"])
+        for member_id, entries in existing_ooo.items()
+        for e in entries
+    }
+
+    for row_number, record in rows:
+        result.rows += 1
+        if isinstance(record, str):
+            result.errors.append({"row": row_number, "error": record})
+            continue
+
+        member_id = record["member_id"]
+        if not member_id:
+            result.errors.append({"row": row_number, "error": "Missing member_id"})
+            continue
+        if member_id not in members:
+            result.errors.append({"row": row_number, "error": f"Unknown member_id {member_id}"})
+            continue
+        try:
+            start = date.fromisoformat(record["start_date"])
+            end = date.fromisoformat(record["end_date"] or record["start_date"])
+        except ValueError:
+            result.errors.append({"row": row_number, "error": "Dates must be YYYY-MM-DD"})
+            continue
+        if end < start:
+            result.errors.append({"row": row_number, "error": "end_date is before start_date"})
+            continue
+
+        reason = record["reason"] or DEFAULT_REASON
+        entry = {"start_date": start.isoformat(), "end_date": end.isoformat(), "reason": reason}
+        key = (member_id, entry["start_date"], entry["end_date"], entry["reason"])
+        if key in seen:
+            result.errors.append({"row": row_number, "error": "Duplicate entry"})
+            continue
+        seen.add(key)
+        result.entries.append((member_id, entry))
+
+    return result
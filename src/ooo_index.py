@@ -0,0 +1,173 @@
+"""
+Interval index over out of office entries.
+
+Each member's entries are kept as pre-parsed (start, end) day ordinals sorted
+by start date, so "is X out on D", "which entry covers D" and "which entries
+overlap [a, b]" are answered with a binary search instead of a strptime scan
+over the whole list. The index is updated incrementally by the routes that
+add or remove entries and is only rebuilt when ooo.json changes on disk.
+"""
+
+import bisect
+import threading
+from datetime import date
+
+
+def to_ordinal(date_str):
+    """Convert a YYYY-MM-DD string to a day ordinal"""
+    return date.fromisoformat(date_str).toordinal()
+
+
+def parse_ordinal(date_str):
+    """Return the day ordinal of a YYYY-MM-DD string from user input, or None if it is not a valid date"""
+    try:
+        ordinal = to_ordinal(date_str)
+    except (TypeError, ValueError):
+        return None
+    # fromisoformat also accepts other ISO forms (20260105, 2026-W02-1); only store the canonical one
+    return ordinal if date.fromordinal(ordinal).isoformat() == date_str else None
+
+
+class OOOInterval:
+    """One OOO entry with its parsed day range and its position in the member's list"""
+
+    __slots__ = ("start", "end", "position", "entry")
+
+    def __init__(self, start, end, position, entry):
+        self.start = start
+        self.end = end
+        self.position = position
+        self.entry = entry
+
+    @property
+    def duration(self):
+        return self.end - self.start + 1
+
+
+class MemberIntervals:
+    """Sorted intervals for a single member"""
+
+    def __init__(self):
+        self.starts = []
+        self.intervals = []
+        # Longest interval seen; bounds how far back a covering interval can start
+        self.max_length = 0
+
+    def load(self, intervals):
+        """Replace the contents with intervals (in any order)"""
+        self.intervals = sorted(intervals, key=lambda i: (i.start, i.position))
+        self.starts = [i.start for i in self.intervals]
+        self.max_length = max((i.duration for i in self.intervals), default=0)
+
+    def insert(self, interval):
+        """Insert an interval whose position is after every existing one"""
+        index = bisect.bisect_right(self.starts, interval.start)
+        self.starts.insert(index, interval.start)
+        self.intervals.insert(index, interval)
+        self.max_length = max(self.max_length, interval.duration)
+
+    def overlapping(self, first, last):
+        """Return intervals overlapping [first, last], sorted by start"""
+        lo = bisect.bisect_left(self.starts, first - self.max_length + 1)
+        hi = bisect.bisect_right(self.starts, last)
+        return [i for i in self.intervals[lo:hi] if i.end >= first]
+
+    def covering(self, day):
+        """Return the interval covering day that comes first in the member's list, or None"""
+        candidates = self.overlapping(day, day)
+        if not candidates:
+            return None
+        return min(candidates, key=lambda i: i.position)
+
+    def remove_position(self, position):
+        """Remove the interval at a list position and shift the positions after it"""
+        for index, interval in enumerate(self.intervals):
+            if interval.position == position:
+                del self.intervals[index]
+                del self.starts[index]
+                break
+        for interval in self.intervals:
+            if interval.position > position:
+                interval.position -= 1
+
+
+class OOOIndex:
+    """Per-member interval index over the contents of ooo.json"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._members = {}
+        self._version = None
+
+    def ensure(self, ooo_data, version):
+        """Rebuild from ooo_data unless the index already reflects this data version"""
+        with self._lock:
+            if version is None or version != self._version:
+                self._members = {}
+                for member_id, entries in ooo_data.items():
+                    member = MemberIntervals()
+                    member.load(
+                        OOOInterval(to_ordinal(e["start_date"]), to_ordinal(e["end_date"]), position, e)
+                        for position, e in enumerate(entries)
+                    )
+                    if member.intervals:
+                        self._members[member_id] = member
+                self._version = version
+            return self
+
+    @property
+    def version(self):
+        """Data version the index currently reflects (None if it must be rebuilt)"""
+        return self._version
+
+    def mark_synced(self, version):
+        """Record that incremental updates have brought the index up to version (None forces a rebuild)"""
+        with self._lock:
+            self._version = version
+
+    def add(self, member_id, entry):
+        """Index an entry that was appended to the member's list"""
+        with self._lock:
+            member = self._members.setdefault(member_id, MemberIntervals())
+            interval = OOOInterval(
+                to_ordinal(entry["start_date"]), to_ordinal(entry["end_date"]), len(member.intervals), entry
+            )
+            member.insert(interval)
+            return interval
+
+    def remove(self, member_id, position):
+        """Drop the entry at position in the member's list"""
+        with self._lock:
+            member = self._members.get(member_id)
+            if member is None:
+                return
+            member.remove_position(position)
+            if not member.intervals:
+                del self._members[member_id]
+
+    def remove_member(self, member_id):
+        """Drop every entry of a member"""
+        with self._lock:
+            self._members.pop(member_id, None)
+
+    def is_out(self, member_id, day):
+        """Is the member out of office on the given day ordinal?"""
+        return self.covering(member_id, day) is not None
+
+    def covering(self, member_id, day):
+        """Return the interval covering the given day ordinal, or None"""
+        with self._lock:
+            member = self._members.get(member_id)
+            return member.covering(day) if member else None
+
+    def overlapping(self, member_id, first, last):
+        """Return the member's intervals overlapping [first, last] (day ordinals), sorted by start"""
+        with self._lock:
+            member = self._members.get(member_id)
+            return member.overlapping(first, last) if member else []
+
+    def find_exact(self, member_id, first, last):
+        """Return the first interval that spans exactly [first, last], or None"""
+        matches = [i for i in self.overlapping(member_id, first, first) if i.start == first and i.end == last]
+        return min(matches, key=lambda i: i.position) if matches else None
+
@@ -0,0 +1,750 @@
+"""
+Storage backends.
+
+The app talks to its data through one of these classes instead of loading
+and rewriting whole JSON files from the routes:
+
+- JsonStorage keeps the original members.json / holidays.json / ooo.json
+  files plus the history.jsonl journal and its gzip archive segments.
+- SqliteStorage keeps the same datasets in an SQLite database (WAL mode)
+  with indexed tables, and performs single-row writes.
+
+Both expose the same methods. Reads of a whole dataset (get_members(),
+get_holidays(), get_ooo()) return a shared, read-only structure in the
+original JSON shape, cached until the dataset's version changes.
+
+TeamStorage gives a team its own members, OOO and history shard while the
+holidays come from the storage shared by every team.
+"""
+
+import os
+import sqlite3
+import threading
+
+from datastore import data_store
+from holiday_generation import add_resolved
+from history_log import HistoryArchive, HistoryIndex, HistoryJournal, timestamp_bound
+
+DATASETS = ("members", "holidays", "ooo", "history")
+
+
+class JsonStorage:
+    """Datasets stored as JSON files in data_dir"""
+
+    name = "json"
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.files = {
+            "members": os.path.join(data_dir, "members.json"),
+            "holidays": os.path.join(data_dir, "holidays.json"),
+            "ooo": os.path.join(data_dir, "ooo.json"),
+        }
+        self.history_journal = HistoryJournal(
+            os.path.join(data_dir, "history.jsonl"),
+            legacy_file=os.path.join(data_dir, "history.json"),
+            archive=HistoryArchive(os.path.join(data_dir, "history-archive")),
+        )
+        self.history_index = HistoryIndex(self.history_journal)
+
+    def version(self, dataset):
+        """Return the version of a dataset: (write counter, mtime, size) of its file"""
+        if dataset == "history":
+            return (self.history_index.total(), 0, 0)
+        return data_store.version(self.files[dataset])
+
+    def current_version(self, dataset):
+        """Return the on-disk version of a dataset without loading it"""
+        if dataset == "history":
+            return self.version(dataset)
+        return data_store.current_version(self.files[dataset])
+
+    def last_modified(self, datasets):
+        """Return the latest modification time (epoch seconds) of the given datasets, or None"""
+        mtimes = []
+        for dataset in datasets:
+            filename = self.files.get(dataset, self.history_journal.journal_file)
+            try:
+                mtimes.append(os.stat(filename).st_mtime)
+            except FileNotFoundError:
+                pass
+        return max(mtimes, default=None)
+
+    @staticmethod
+    def is_next_version(before, after):
+        """Is after the version produced by exactly one write on top of before?
+
+        The whole signature is compared: an edit made outside the store keeps
+        the version number but changes the mtime or size, so the next write
+        does not look like a single step from before.
+        """
+        return before is not None and after is not None and data_store.is_own_write(before, after)
+
+    def io_stats(self):
+        """Return {dataset: {"file", "loads", "reads", "bytes_read", "writes", "bytes_written"}} for this process"""
+        store_stats = data_store.io_stats()
+        unused = dict.fromkeys(("loads", "reads", "bytes_read", "writes", "bytes_written"), 0)
+        stats = {}
+        for dataset, filename in self.files.items():
+            counters = store_stats.get(filename, unused)
+            stats[dataset] = dict(counters, file=os.path.basename(filename))
+        stats["history"] = {
+            "file": os.path.basename(self.history_journal.journal_file),
+            "bytes_read": self.history_index.bytes_read + self.history_journal.archive.bytes_read,
+            "writes": self.history_journal.appends,
+            "bytes_written": self.history_journal.bytes_written + self.history_journal.archive.bytes_written,
+        }
+        return stats
+
+    def _load(self, dataset):
+        return data_store.load(self.files[dataset], {})
+
+    def get_versioned(self, dataset):
+        """Return (data, version) of members, holidays or ooo, the version being that of the data returned"""
+        return data_store.load_versioned(self.files[dataset], {})
+
+    def _update(self, dataset):
+        """Read-modify-write a dataset under the inter-process file lock"""
+        return data_store.transaction(self.files[dataset], {})
+
+    # Members
+
+    def get_members(self):
+        """Get all team members (shared, read-only)"""
+        return self._load("members")
+
+    def put_member(self, member_id, member_info):
+        """Add or update one team member"""
+        with self._update("members") as members:
+            members[member_id] = member_info
+
+    def delete_member(self, member_id):
+        """Delete a member and their OOO entries"""
+        with self._update("members") as members:
+            members.pop(member_id, None)
+
+        if member_id in self._load("ooo"):
+            with self._update("ooo") as ooo:
+                ooo.pop(member_id, None)
+
+    # Holidays
+
+    def get_holidays(self):
+        """Get all holidays (shared, read-only)"""
+        return self._load("holidays")
+
+    def put_holiday(self, country, region, date_str, name):
+        """Add or update one holiday"""
+        with self._update("holidays") as holidays_data:
+            # Manually added holidays are also recorded under "custom" so regeneration keeps them
+            for section in (holidays_data, holidays_data.setdefault("custom", {})):
+                if region:
+                    section.setdefault("regional", {}).setdefault(country, {}).setdefault(region, {})[date_str] = name
+                else:
+                    section.setdefault("national", {}).setdefault(country, {})[date_str] = name
+
+    def replace_generated_holidays(self, generated, units):
+        """Replace the generated holidays of the given (country, region, year) units.
+
+        Holidays are shared by every team, so only those units change:
+        manually added holidays, other locations and other years are kept.
+        """
+        with self._update("holidays") as holidays_data:
+            custom = holidays_data.get("custom", {})
+            for country, region, year in units:
+                dates = _location_dates(holidays_data, country, region, create=True)
+                custom_dates = _location_dates(custom, country, region)
+                prefix = f"{year}-"
+                for date_str in [d for d in dates if d.startswith(prefix) and d not in custom_dates]:
+                    del dates[date_str]
+                for date_str, name in _location_dates(generated, country, region).items():
+                    if date_str.startswith(prefix) and date_str not in custom_dates:
+                        dates[date_str] = name
+            add_resolved(holidays_data, units)
+
+    def add_generated_holidays(self, generated, units):
+        """Add the holidays generated for newly resolved (country, region, year) units, keeping all others"""
+        with self._update("holidays") as holidays_data:
+            custom = holidays_data.get("custom", {})
+            for country, dates in generated.get("national", {}).items():
+                national = holidays_data.setdefault("national", {}).setdefault(country, {})
+                national.update(dates)
+                national.update(custom.get("national", {}).get(country, {}))
+            for country, regions in generated.get("regional", {}).items():
+                for region, dates in regions.items():
+                    regional = holidays_data.setdefault("regional", {}).setdefault(country, {}).setdefault(region, {})
+                    regional.update(dates)
+                    regional.update(custom.get("regional", {}).get(country, {}).get(region, {}))
+            add_resolved(holidays_data, units)
+
+    # Out of office
+
+    def get_ooo(self):
+        """Get all out of office entries (shared, read-only)"""
+        return self._load("ooo")
+
+    def add_ooo(self, member_id, entry):
+        """Append an out of office entry for a member"""
+        with self._update("ooo") as ooo:
+            ooo.setdefault(member_id, []).append(entry)
+
+    def add_ooo_many(self, entries):
+        """Append many (member_id, entry) pairs in a single write"""
+        with self._update("ooo") as ooo:
+            for member_id, entry in entries:
+                ooo.setdefault(member_id, []).append(entry)
+
+    def remove_ooo(self, member_id, position, expected):
+        """Remove the entry at position in the member's list and return it.
+
+        If another worker changed the list in the meantime, the first entry
+        equal to expected is removed instead; returns None if there is none.
+        """
+        with self._update("ooo") as ooo:
+            entries = ooo.get(member_id, [])
+            if not (position < len(entries) and entries[position] == expected):
+                position = entries.index(expected) if expected in entries else None
+            if position is None:
+                return None
+            entry = entries.pop(position)
+            # Remove member entirely if no more OOO entries
+            if not entries:
+                del ooo[member_id]
+        return entry
+
+    # History
+
+    def append_history(self, entry):
+        """Append one history entry"""
+        self.history_journal.append(entry)
+
+    def iter_history(self):
+        """Stream history entries in the order they were logged"""
+        return iter(self.history_journal)
+
+    def history_page(self, **filters):
+        """Return one page of history entries, newest first (see HistoryIndex.page)"""
+        return self.history_index.page(**filters)
+
+    def history_total(self):
+        """Number of history entries"""
+        return self.history_index.total()
+
+    def history_operation_counts(self):
+        """Return {operation_type: count} over the whole history"""
+        return self.history_index.operation_counts()
+
+    def roll_history(self, before):
+        """Archive the history entries logged before the timestamp before, then compact the archive.
+
+        Whole years before the cutoff's year are merged into one segment each.
+        Returns {"archived": n, "compacted": [years], "segments": [manifest records]}.
+        """
+        archived = self.history_journal.roll(before)
+        compacted = self.history_journal.archive.compact(before[:4])
+        return {"archived": archived, "compacted": compacted, "segments": self.history_journal.archive.segments()}
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    country TEXT NOT NULL,
+    region TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_members_location ON members (country, region);
+
+CREATE TABLE IF NOT EXISTS ooo (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    member_id TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    reason TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ooo_member_dates ON ooo (member_id, start_date, end_date);
+
+CREATE TABLE IF NOT EXISTS holidays (
+    country TEXT NOT NULL,
+    region TEXT NOT NULL DEFAULT '',
+    date TEXT NOT NULL,
+    name TEXT NOT NULL,
+    custom INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (country, region, date)
+);
+
+-- (country, region, year) units whose generated holidays are in the holidays table
+CREATE TABLE IF NOT EXISTS holiday_years (
+    country TEXT NOT NULL,
+    region TEXT NOT NULL DEFAULT '',
+    year INTEGER NOT NULL,
+    PRIMARY KEY (country, region, year)
+);
+
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    operation_type TEXT,
+    member_id TEXT,
+    member_name TEXT,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_history_operation ON history (operation_type, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_history_member ON history (member_id, timestamp, id);
+
+CREATE TABLE IF NOT EXISTS data_versions (
+    dataset TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+
+class SqliteStorage:
+    """Datasets stored in an SQLite database"""
+
+    name = "sqlite"
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._local = threading.local()
+        self._cache_lock = threading.Lock()
+        self._cache = {}  # dataset -> (version, data)
+        self._io = {dataset: {"loads": 0, "reads": 0, "writes": 0} for dataset in DATASETS}
+
+        conn = self._conn()
+        with conn:
+            conn.executescript(SCHEMA)
+            # Databases created before manual holidays were tracked
+            if "custom" not in [row["name"] for row in conn.execute("PRAGMA table_info(holidays)")]:
+                conn.execute("ALTER TABLE holidays ADD COLUMN custom INTEGER NOT NULL DEFAULT 0")
+            conn.executemany(
+                "INSERT OR IGNORE INTO data_versions (dataset, version) VALUES (?, 0)", [(d,) for d in DATASETS]
+            )
+
+    def _conn(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, conn, *datasets):
+        with self._cache_lock:
+            for dataset in datasets:
+                self._io[dataset]["writes"] += 1
+        conn.executemany("UPDATE data_versions SET version = version + 1 WHERE dataset = ?", [(d,) for d in datasets])
+
+    def version(self, dataset):
+        """Return the current version counter of a dataset"""
+        row = self._conn().execute("SELECT version FROM data_versions WHERE dataset = ?", (dataset,)).fetchone()
+        return row[0] if row else 0
+
+    def current_version(self, dataset):
+        """Return the current version counter of a dataset (never cached)"""
+        return self.version(dataset)
+
+    def last_modified(self, datasets):
+        """Return the modification time (epoch seconds) of the database, or None.
+
+        Versions are tracked per dataset but timestamps are not, so this is the
+        time of the last write to any dataset.
+        """
+        mtimes = []
+        for filename in (self.db_file, self.db_file + "-wal"):
+            try:
+                mtimes.append(os.stat(filename).st_mtime)
+            except FileNotFoundError:
+                pass
+        return max(mtimes, default=None)
+
+    @staticmethod
+    def is_next_version(before, after):
+        """Is after the version produced by exactly one write on top of before?"""
+        return before is not None and after == before + 1
+
+    def get_versioned(self, dataset):
+        """Return (data, version) of members, holidays or ooo, rebuilding the data only when its version changed.
+
+        The version is read before the data, so it is never newer than the data returned.
+        """
+        version = self.version(dataset)
+        with self._cache_lock:
+            self._io[dataset]["loads"] += 1
+            cached = self._cache.get(dataset)
+            if cached is not None and cached[0] == version:
+                return cached[1], version
+        data = getattr(self, f"_build_{dataset}")(self._conn())
+        with self._cache_lock:
+            self._io[dataset]["reads"] += 1
+            self._cache[dataset] = (version, data)
+        return data, version
+
+    def io_stats(self):
+        """Return {dataset: {"file", "loads", "reads", "writes"}} for this process (no byte counts)"""
+        with self._cache_lock:
+            return {dataset: dict(counters, file=os.path.basename(self.db_file)) for dataset, counters in self._io.items()}
+
+    # Members
+
+    def get_members(self):
+        """Get all team members (shared, read-only)"""
+        return self.get_versioned("members")[0]
+
+    @staticmethod
+    def _build_members(conn):
+        rows = conn.execute("SELECT id, name, country, region FROM members ORDER BY rowid")
+        return {row["id"]: {"name": row["name"], "country": row["country"], "region": row["region"]} for row in rows}
+
+    def put_member(self, member_id, member_info):
+        """Add or update one team member"""
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO members (id, name, country, region) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET name = excluded.name, country = excluded.country, region = excluded.region",
+                (member_id, member_info["name"], member_info["country"], member_info.get("region") or ""),
+            )
+            self._bump(conn, "members")
+
+    def delete_member(self, member_id):
+        """Delete a member and their OOO entries"""
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM members WHERE id = ?", (member_id,))
+            deleted_ooo = conn.execute("DELETE FROM ooo WHERE member_id = ?", (member_id,)).rowcount
+            self._bump(conn, "members")
+            if deleted_ooo:
+                self._bump(conn, "ooo")
+
+    # Holidays
+
+    def get_holidays(self):
+        """Get all holidays (shared, read-only)"""
+        return self.get_versioned("holidays")[0]
+
+    @staticmethod
+    def _build_holidays(conn):
+        holidays_data = {"national": {}, "regional": {}}
+        for row in conn.execute("SELECT country, region, date, name FROM holidays ORDER BY rowid"):
+            if row["region"]:
+                regional = holidays_data["regional"].setdefault(row["country"], {})
+                regional.setdefault(row["region"], {})[row["date"]] = row["name"]
+            else:
+                holidays_data["national"].setdefault(row["country"], {})[row["date"]] = row["name"]
+        add_resolved(holidays_data, conn.execute("SELECT country, region, year FROM holiday_years"))
+        return holidays_data
+
+    def put_holiday(self, country, region, date_str, name):
+        """Add or update one holiday"""
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO holidays (country, region, date, name, custom) VALUES (?, ?, ?, ?, 1) "
+                "ON CONFLICT(country, region, date) DO UPDATE SET name = excluded.name, custom = 1",
+                (country, region or "", date_str, name),
+            )
+            self._bump(conn, "holidays")
+
+    def replace_generated_holidays(self, generated, units):
+        """Replace the generated holidays of the given (country, region, year) units (see JsonStorage)"""
+        units = list(units)
+        unit_set = {(country, region or "", year) for country, region, year in units}
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "DELETE FROM holidays WHERE custom = 0 AND country = ? AND region = ? AND date BETWEEN ? AND ?",
+                [(country, region or "", f"{year}-01-01", f"{year}-12-31") for country, region, year in units],
+            )
+            # A manually added holiday on the same date wins over the generated one
+            conn.executemany(
+                "INSERT OR IGNORE INTO holidays (country, region, date, name) VALUES (?, ?, ?, ?)",
+                [row for row in _holiday_rows(generated) if (row[0], row[1], int(row[2][:4])) in unit_set],
+            )
+            conn.executemany("INSERT OR IGNORE INTO holiday_years (country, region, year) VALUES (?, ?, ?)", units)
+            self._bump(conn, "holidays")
+
+    def add_generated_holidays(self, generated, units):
+        """Add the holidays generated for newly resolved (country, region, year) units, keeping all others"""
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT INTO holidays (country, region, date, name) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(country, region, date) DO UPDATE SET name = excluded.name WHERE custom = 0",
+                _holiday_rows(generated),
+            )
+            conn.executemany("INSERT OR IGNORE INTO holiday_years (country, region, year) VALUES (?, ?, ?)", units)
+            self._bump(conn, "holidays")
+
+    # Out of office
+
+    def get_ooo(self):
+        """Get all out of office entries (shared, read-only)"""
+        return self.get_versioned("ooo")[0]
+
+    @staticmethod
+    def _build_ooo(conn):
+        ooo = {}
+        for row in conn.execute("SELECT member_id, start_date, end_date, reason FROM ooo ORDER BY id"):
+            ooo.setdefault(row["member_id"], []).append(
+                {"start_date": row["start_date"], "end_date": row["end_date"], "reason": row["reason"]}
+            )
+        return ooo
+
+    def add_ooo(self, member_id, entry):
+        """Append an out of office entry for a member"""
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO ooo (member_id, start_date, end_date, reason) VALUES (?, ?, ?, ?)",
+                (member_id, entry["start_date"], entry["end_date"], entry["reason"]),
+            )
+            self._bump(conn, "ooo")
+
+    def add_ooo_many(self, entries):
+        """Append many (member_id, entry) pairs in a single transaction"""
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT INTO ooo (member_id, start_date, end_date, reason) VALUES (?, ?, ?, ?)",
+                [(member_id, e["start_date"], e["end_date"], e["reason"]) for member_id, e in entries],
+            )
+            self._bump(conn, "ooo")
+
+    def remove_ooo(self, member_id, position, expected):
+        """Remove the entry at position in the member's list and return it.
+
+        If the list changed in the meantime, the first entry equal to expected
+        is removed instead; returns None if there is none.
+        """
+        conn = self._conn()
+        with conn:
+            row = conn.execute(
+                "SELECT id, start_date, end_date, reason FROM ooo WHERE member_id = ? ORDER BY id LIMIT 1 OFFSET ?",
+                (member_id, position),
+            ).fetchone()
+            if row is None or (row["start_date"], row["end_date"], row["reason"]) != (
+                expected["start_date"],
+                expected["end_date"],
+                expected["reason"],
+            ):
+                row = conn.execute(
+                    "SELECT id, start_date, end_date, reason FROM ooo "
+                    "WHERE member_id = ? AND start_date = ? AND end_date = ? AND reason = ? ORDER BY id LIMIT 1",
+                    (member_id, expected["start_date"], expected["end_date"], expected["reason"]),
+                ).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM ooo WHERE id = ?", (row["id"],))
+            self._bump(conn, "ooo")
+        return {"start_date": row["start_date"], "end_date": row["end_date"], "reason": row["reason"]}
+
+    # History
+
+    def append_history(self, entry):
+        """Append one history entry"""
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO history (timestamp, operation_type, member_id, member_name, details) VALUES (?, ?, ?, ?, ?)",
+                _history_row(entry),
+            )
+            self._bump(conn, "history")
+
+    def iter_history(self):
+        """Stream history entries in the order they were logged"""
+        rows = self._conn().execute(
+            "SELECT timestamp, operation_type, member_id, member_name, details FROM history ORDER BY id"
+        )
+        for row in rows:
+            yield dict(row)
+
+    def history_page(self, limit=50, cursor=None, operation_type=None, member_id=None, since=None, until=None):
+        """Return one page of entries, newest first (same contract as HistoryIndex.page)"""
+        conditions = []
+        params = []
+        if operation_type:
+            conditions.append("operation_type = ?")
+            params.append(operation_type)
+        if member_id:
+            conditions.append("member_id = ?")
+            params.append(str(member_id))
+        if since:
+            conditions.append("timestamp >= ?")
+            params.append(timestamp_bound(since))
+        if until:
+            conditions.append("timestamp <= ?")
+            params.append(timestamp_bound(until, end_of_day=True))
+        if cursor:
+            cursor_id = int(cursor)
+            conditions.append("(timestamp, id) < (SELECT timestamp, id FROM history WHERE id = ?)")
+            params.append(cursor_id)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._conn().execute(
+            "SELECT id, timestamp, operation_type, member_id, member_name, details FROM history "
+            f"{where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+            params + [limit + 1],
+        ).fetchall()
+
+        more = len(rows) > limit
+        rows = rows[:limit]
+        entries = [{key: row[key] for key in row.keys() if key != "id"} for row in rows]
+        next_cursor = str(rows[-1]["id"]) if more and rows else None
+        return {"entries": entries, "next_cursor": next_cursor}
+
+    def history_total(self):
+        """Number of history entries"""
+        return self._conn().execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def history_operation_counts(self):
+        """Return {operation_type: count} over the whole history"""
+        rows = self._conn().execute("SELECT operation_type, COUNT(*) FROM history GROUP BY operation_type")
+        return {row[0]: row[1] for row in rows}
+
+    def roll_history(self, before):
+        """History rows are already indexed by timestamp in the database; there is nothing to roll"""
+        return {"archived": 0, "compacted": [], "segments": []}
+
+    # Migration
+
+    def import_from(self, source):
+        """Replace the database contents with everything in another storage backend"""
+        conn = self._conn()
+        with conn:
+            for table in ("members", "ooo", "holidays", "holiday_years", "history"):
+                conn.execute(f"DELETE FROM {table}")
+
+            conn.executemany(
+                "INSERT INTO members (id, name, country, region) VALUES (?, ?, ?, ?)",
+                [
+                    (member_id, info["name"], info["country"], info.get("region") or "")
+                    for member_id, info in source.get_members().items()
+                ],
+            )
+            conn.executemany(
+                "INSERT INTO ooo (member_id, start_date, end_date, reason) VALUES (?, ?, ?, ?)",
+                [
+                    (member_id, entry["start_date"], entry["end_date"], entry.get("reason", ""))
+                    for member_id, entries in source.get_ooo().items()
+                    for entry in entries
+                ],
+            )
+            holidays_data = source.get_holidays()
+            conn.executemany(
+                "INSERT OR REPLACE INTO holidays (country, region, date, name) VALUES (?, ?, ?, ?)",
+                _holiday_rows(holidays_data),
+            )
+            conn.executemany(
+                "UPDATE holidays SET custom = 1 WHERE country = ? AND region = ? AND date = ?",
+                [row[:3] for row in _holiday_rows(holidays_data.get("custom", {}))],
+            )
+            conn.executemany(
+                "INSERT INTO holiday_years (country, region, year) VALUES (?, ?, ?)",
+                [
+                    (country, region, year)
+                    for country, regions in holidays_data.get("resolved", {}).items()
+                    for region, years in regions.items()
+                    for year in years
+                ],
+            )
+            conn.executemany(
+                "INSERT INTO history (timestamp, operation_type, member_id, member_name, details) VALUES (?, ?, ?, ?, ?)",
+                (_history_row(entry) for entry in source.iter_history()),
+            )
+            self._bump(conn, *DATASETS)
+
+        return {
+            "members": len(self.get_members()),
+            "ooo": sum(len(entries) for entries in self.get_ooo().values()),
+            "holidays": conn.execute("SELECT COUNT(*) FROM holidays").fetchone()[0],
+            "history": self.history_total(),
+        }
+
+
+def _location_dates(holidays_data, country, region, create=False):
+    """Return the {date: name} holidays of one location in a holidays structure ({} if it has none)"""
+    if region:
+        path = ("regional", country, region)
+    else:
+        path = ("national", country)
+    section = holidays_data
+    for key in path:
+        if create:
+            section = section.setdefault(key, {})
+        else:
+            section = section.get(key, {})
+    return section
+
+
+def _holiday_rows(holidays_data):
+    """Flatten the holidays JSON structure into (country, region, date, name) rows"""
+    for country, country_holidays in holidays_data.get("national", {}).items():
+        for date_str, name in country_holidays.items():
+            yield (country, "", date_str, name)
+    for country, regions in holidays_data.get("regional", {}).items():
+        for region, region_holidays in regions.items():
+            for date_str, name in region_holidays.items():
+                yield (country, region, date_str, name)
+
+
+def _history_row(entry):
+    member_id = entry.get("member_id")
+    return (
+        entry.get("timestamp") or "",
+        entry.get("operation_type"),
+        str(member_id) if member_id is not None else None,
+        entry.get("member_name"),
+        entry.get("details"),
+    )
+
+
+class TeamStorage:
+    """One team's shard for members, OOO and history, with the holidays of a shared storage"""
+
+    HOLIDAY_METHODS = ("get_holidays", "put_holiday", "replace_generated_holidays", "add_generated_holidays")
+
+    def __init__(self, shard, shared):
+        self.shard = shard
+        self.shared = shared
+        self.name = shard.name
+        self.is_next_version = shard.is_next_version
+
+    def _storage_for(self, dataset):
+        return self.shared if dataset == "holidays" else self.shard
+
+    def __getattr__(self, name):
+        if name in self.HOLIDAY_METHODS:
+            return getattr(self.shared, name)
+        return getattr(self.shard, name)
+
+    def version(self, dataset):
+        return self._storage_for(dataset).version(dataset)
+
+    def get_versioned(self, dataset):
+        return self._storage_for(dataset).get_versioned(dataset)
+
+    def current_version(self, dataset):
+        return self._storage_for(dataset).current_version(dataset)
+
+    def last_modified(self, datasets):
+        mtimes = [self._storage_for(dataset).last_modified([dataset]) for dataset in datasets]
+        return max((mtime for mtime in mtimes if mtime is not None), default=None)
+
+    def io_stats(self):
+        """I/O counters of the shard; the shared holidays are counted by the storage that owns them"""
+        stats = self.shard.io_stats()
+        stats.pop("holidays", None)
+        return stats
+
+
+def create_storage(backend, data_dir, db_file=None):
+    """Create the storage backend selected by name ("json" or "sqlite")"""
+    if backend == "json":
+        return JsonStorage(data_dir)
+    if backend == "sqlite":
+        return SqliteStorage(db_file or os.path.join(data_dir, "leave.db"))
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,106 @@
+"""
+Teams sharing one deployment.
+
+Each team's members, OOO entries and history live in their own shard,
+DATA_DIR/teams/<team>/, with their own in-memory indexes and caches, so a
+write by one team never rewrites or invalidates another team's data and
+the cost of a request depends only on the size of its team. Holidays are
+shared by every team: they depend only on (country, region).
+
+Team pages and APIs are the normal routes under /t/<team>/.
+TeamPrefixMiddleware moves that prefix from PATH_INFO to SCRIPT_NAME, so
+views, redirects and url_for() work unchanged and stay inside the team.
+Requests without the prefix belong to the default team, whose data stays
+directly in DATA_DIR.
+"""
+
+import os
+import re
+import threading
+
+DEFAULT_TEAM = "default"
+TEAM_NAME_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+# WSGI environ key holding the team a request belongs to
+TEAM_ENVIRON_KEY = "leave_app.team"
+
+
+class TeamPrefixMiddleware:
+    """Route /t/<team>/<path> to /<path> with the team recorded in the environ"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        team = DEFAULT_TEAM
+        if path.startswith("/t/"):
+            team, _, rest = path[3:].partition("/")
+            environ["SCRIPT_NAME"] = environ.get("SCRIPT_NAME", "") + "/t/" + team
+            environ["PATH_INFO"] = "/" + rest
+        environ[TEAM_ENVIRON_KEY] = team
+        return self.wsgi_app(environ, start_response)
+
+
+class Team:
+    """A team's storage and the in-memory structures built from its data"""
+
+    def __init__(self, name, data_dir, storage, ooo_index, location_index, month_cache, feed_cache, snapshot):
+        self.name = name
+        self.data_dir = data_dir
+        self.storage = storage
+        self.ooo_index = ooo_index
+        self.location_index = location_index
+        self.month_cache = month_cache
+        self.feed_cache = feed_cache
+        self.snapshot = snapshot
+
+
+class TeamRegistry:
+    """The default team plus every team with a directory under data_dir/teams, loaded on first use"""
+
+    def __init__(self, data_dir, default_team, factory):
+        self.teams_dir = os.path.join(data_dir, "teams")
+        self.factory = factory  # factory(name, team_dir) -> Team
+        self._lock = threading.Lock()
+        self._teams = {DEFAULT_TEAM: default_team}
+
+    def team_dir(self, name):
+        return os.path.join(self.teams_dir, name)
+
+    def get(self, name):
+        """Return the team called name, or None if there is no such team"""
+        team = self._teams.get(name)
+        if team is not None:
+            return team
+        if not TEAM_NAME_PATTERN.match(name) or not os.path.isdir(self.team_dir(name)):
+            return None
+        with self._lock:
+            if name not in self._teams:
+                self._teams[name] = self.factory(name, self.team_dir(name))
+            return self._teams[name]
+
+    def create(self, name):
+        """Create the shard of a new team (a no-op if it exists) and return the team"""
+        if name == DEFAULT_TEAM or not TEAM_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid team name: {name!r} (use lowercase letters, digits, '-' and '_')")
+        os.makedirs(self.team_dir(name), exist_ok=True)
+        return self.get(name)
+
+    def names(self):
+        """Return the names of every team, the default team first"""
+        try:
+            entries = os.listdir(self.teams_dir)
+        except FileNotFoundError:
+            entries = []
+        names = sorted(
+            name
+            for name in entries
+            if name != DEFAULT_TEAM and TEAM_NAME_PATTERN.match(name) and os.path.isdir(self.team_dir(name))
+        )
+        return [DEFAULT_TEAM] + names
+
+    def loaded(self):
+        """Return the teams this process has loaded"""
+        with self._lock:
+            return list(self._teams.values())
@@ -0,0 +1,83 @@
+import importlib
+import itertools
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+_team_numbers = itertools.count(1)
+
+
+@pytest.fixture(scope="session", params=["json", "sqlite"])
+def app_module(request, tmp_path_factory):
+    """The app with its data in a temporary directory, once per storage backend"""
+    os.environ["DATA_DIR"] = str(tmp_path_factory.mktemp("data"))
+    os.environ["METRICS_DIR"] = str(tmp_path_factory.mktemp("metrics"))
+    os.environ["STORAGE_BACKEND"] = request.param
+    os.environ.pop("SQLITE_FILE", None)
+    import app
+
+    # The module reads its settings when it runs, so the next backend runs it again
+    if app.STORAGE_BACKEND != request.param:
+        app = importlib.reload(app)
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def team(app_module):
+    """URL prefix of a new, empty team, so every test starts without members or OOO entries"""
+    name = f"test-{next(_team_numbers)}"
+    app_module.teams.create(name)
+    return f"/t/{name}"
+
+
+@pytest.fixture
+def loads(app_module, team):
+    """loads() counts the dataset loads of the test's team and of the shared holidays so far"""
+    storages = [app_module.teams.get(team[len("/t/") :]).storage, app_module.shared_storage]
+
+    def count():
+        stats = storages[0].io_stats()
+        stats["holidays"] = storages[1].io_stats()["holidays"]
+        return sum(counters.get("loads", 0) for counters in stats.values())
+
+    return count
+
+
+@pytest.fixture
+def add_member(client, team):
+    """add_member(name, country, region) adds a member to the test's team and returns its id"""
+    member_ids = itertools.count(1)
+
+    def add(name, country="Nowhere", region=""):
+        response = client.post(f"{team}/add_member", data={"name": name, "country": country, "region": region})
+        assert response.status_code in (200, 302)
+        return str(next(member_ids))
+
+    return add
+
+
+@pytest.fixture
+def wait_for_job(client):
+    """wait_for_job(response) polls the job a 202 response started until it ends and returns it"""
+
+    def wait(response, timeout=30):
+        assert response.status_code == 202, response.get_data(as_text=True)
+        status_url = response.get_json()["status_url"]
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = client.get(status_url).get_json()
+            if job["status"] in ("succeeded", "failed"):
+                return job
+            time.sleep(0.02)
+        raise AssertionError(f"{status_url} did not finish")
+
+    return wait
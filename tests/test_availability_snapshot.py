@@ -0,0 +1,223 @@
+import json
+import os
+import random
+import struct
+from datetime import date, timedelta
+
+import pytest
+
+from availability import compute_availability
+from availability_snapshot import MAGIC, AvailabilitySnapshot, SnapshotStore, build_snapshot, write_snapshot
+from ooo_index import OOOIndex
+
+LOCATIONS = [("Utopia", ""), ("Utopia", "North"), ("Utopia", "South"), ("Erewhon", ""), ("Erewhon", "East")]
+REASONS = ["Vacation", "Sick Leave", "Training", "Ünïcödé"]
+FIRST_DAY = date(2025, 11, 1)
+
+
+def day(offset):
+    return (FIRST_DAY + timedelta(days=offset)).isoformat()
+
+
+class Model:
+    """Random members, holidays and OOO entries, edited step by step"""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.members = {}
+        self.holidays = {"national": {}, "regional": {}}
+        self.ooo = {}
+        self.version = 0
+        for _ in range(12):
+            self.add_member()
+        for _ in range(15):
+            self.add_holiday()
+        for _ in range(30):
+            self.add_ooo()
+
+    def add_member(self):
+        member_id = str(len(self.members) + 1)
+        country, region = self.rng.choice(LOCATIONS)
+        self.members[member_id] = {"name": f"Member {member_id}", "country": country, "region": region}
+
+    def add_holiday(self):
+        country, region = self.rng.choice(LOCATIONS)
+        # Some regional holidays fall on national ones, whose names they replace
+        date_str = day(self.rng.randrange(90))
+        if region:
+            self.holidays["regional"].setdefault(country, {}).setdefault(region, {})[date_str] = f"{region} day"
+        else:
+            self.holidays["national"].setdefault(country, {})[date_str] = f"{country} day {date_str[-2:]}"
+
+    def add_ooo(self):
+        member_id = self.rng.choice(list(self.members))
+        start = self.rng.randrange(-10, 90)
+        end = start + self.rng.randrange(15)
+        entry = {"start_date": day(start), "end_date": day(end), "reason": self.rng.choice(REASONS)}
+        entries = self.ooo.setdefault(member_id, [])
+        entries.insert(self.rng.randrange(len(entries) + 1), entry)
+
+    def remove_ooo(self):
+        member_id = self.rng.choice(list(self.ooo))
+        entries = self.ooo[member_id]
+        entries.pop(self.rng.randrange(len(entries)))
+        if not entries:
+            del self.ooo[member_id]
+
+    def edit(self):
+        edits = [self.add_member, self.add_holiday, self.add_ooo] + ([self.remove_ooo] if self.ooo else [])
+        self.rng.choice(edits)()
+        self.version += 1
+
+    def load(self):
+        return self.members, self.holidays, self.ooo
+
+
+def oracle(model, start, end, member_ids=None):
+    members = model.members if member_ids is None else {m: model.members[m] for m in member_ids}
+    # The matrix engine keys national-only locations by region None
+    members = {m: dict(info, region=info["region"] or None) for m, info in members.items()}
+    ooo_index = OOOIndex().ensure(model.ooo, model.version)
+    return compute_availability(members, model.holidays, ooo_index, start, end).to_calendar_dict()
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_snapshot_matches_the_matrix_engine(tmp_path, seed):
+    model = Model(seed)
+    store = SnapshotStore(str(tmp_path / "snapshot.bin"))
+    ranges = [
+        (FIRST_DAY, FIRST_DAY + timedelta(days=89)),
+        (date(2025, 10, 20), date(2025, 11, 3)),
+        (date(2026, 1, 1), date(2026, 1, 1)),
+    ]
+
+    for _ in range(25):
+        model.edit()
+        snapshot = store.get({"version": model.version}, model.load)
+        assert snapshot.members() == model.members
+        for start, end in ranges:
+            assert snapshot.compute(start, end).to_calendar_dict() == oracle(model, start, end)
+
+        # A selection of members, in the requested order, with unknown ids skipped
+        member_ids = model.rng.sample(list(model.members), 5)
+        start, end = ranges[0]
+        matrix = snapshot.compute(start, end, member_ids + ["missing"])
+        assert matrix.member_ids == member_ids
+        assert matrix.to_calendar_dict() == oracle(model, start, end, member_ids)
+
+    assert store.stats()["misses"] == 25
+
+
+def test_snapshot_members_at_groups_by_location(tmp_path):
+    model = Model(7)
+    filename = str(tmp_path / "snapshot.bin")
+    write_snapshot(filename, build_snapshot(*model.load(), {"version": 0}))
+    snapshot = AvailabilitySnapshot(filename)
+
+    for country, region in [("Utopia", None), (None, "North"), ("Erewhon", "East"), ("Nowhere", None)]:
+        expected = [
+            member_id
+            for member_id, info in model.members.items()
+            if (not country or info["country"] == country) and (not region or info["region"] == region)
+        ]
+        assert sorted(snapshot.members_at(country, region)) == sorted(expected)
+    assert snapshot.members_at() and len(snapshot.members_at()) == len(model.members)
+
+
+def test_snapshot_file_layout(tmp_path):
+    model = Model(3)
+    contents = build_snapshot(*model.load(), {"members": 4, "ooo": [2, 1]})
+
+    assert contents[:4] == MAGIC
+    (header_length,) = struct.unpack_from("<I", contents, 4)
+    body = 8 + header_length
+    assert body % 8 == 0
+    header = json.loads(contents[8:body])
+    assert header["versions"] == {"members": 4, "ooo": [2, 1]}
+
+    sections = header["sections"]
+    end = 0
+    for name, (offset, length, typecode) in sections.items():
+        # Sections are packed in order, each starting on an 8 byte boundary
+        assert offset % 8 == 0 and offset >= end
+        end = offset + length
+    assert len(contents) == body + end + (-end) % 8
+
+    filename = str(tmp_path / "snapshot.bin")
+    write_snapshot(filename, contents)
+    snapshot = AvailabilitySnapshot(filename)
+    assert snapshot.member_count() == len(model.members)
+    assert len(snapshot.ooo_offsets) == len(model.members) + 1
+    assert snapshot.ooo_offsets[-1] == sum(len(entries) for entries in model.ooo.values())
+    assert list(snapshot.holiday_offsets) == sorted(snapshot.holiday_offsets)
+    assert {snapshot.string(i) for i in range(len(snapshot.string_offsets) - 1)} >= set(model.members)
+
+    with open(filename, "r+b") as f:
+        f.write(b"JUNK")
+    with pytest.raises(ValueError):
+        AvailabilitySnapshot(filename)
+
+
+def test_snapshot_is_rebuilt_only_when_the_data_changes(tmp_path):
+    model = Model(1)
+    filename = str(tmp_path / "snapshot.bin")
+    loads = []
+
+    def load():
+        loads.append(model.version)
+        return model.load()
+
+    first = SnapshotStore(filename)
+    snapshot = first.get({"version": 0}, load)
+    assert first.get({"version": 0}, load) is snapshot
+    assert loads == [0]
+    assert first.stats() == {"hits": 1, "reloads": 0, "misses": 1}
+
+    # Another worker maps the published file instead of building its own
+    second = SnapshotStore(filename)
+    assert second.get({"version": 0}, load).compute(FIRST_DAY, FIRST_DAY).to_calendar_dict() == oracle(
+        model, FIRST_DAY, FIRST_DAY
+    )
+    assert loads == [0]
+    assert second.stats() == {"hits": 0, "reloads": 1, "misses": 0}
+
+    model.edit()
+    second.get({"version": 1}, load)
+    assert loads == [0, 1]
+    # The first worker's mapping is stale; it picks up the file the second one published
+    assert first.get({"version": 1}, load).versions == {"version": 1}
+    assert loads == [0, 1]
+    assert first.stats() == {"hits": 1, "reloads": 1, "misses": 1}
+
+    # A damaged file is rebuilt
+    with open(first.path({"version": 1}), "r+b") as f:
+        f.write(b"JUNK")
+    assert SnapshotStore(filename).get({"version": 1}, load).versions == {"version": 1}
+    assert loads == [0, 1, 1]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_snapshots_are_published_under_new_names_and_old_ones_pruned(tmp_path):
+    model = Model(2)
+    store = SnapshotStore(str(tmp_path / "snapshot.bin"))
+    mapped = store.get({"version": 0}, model.load)
+
+    for version in range(1, 5):
+        model.edit()
+        store.get({"version": version}, model.load)
+    published = sorted(name for name in os.listdir(tmp_path) if not name.endswith(".lock"))
+    assert published == sorted(os.path.basename(store.path({"version": v})) for v in (3, 4))
+    # A mapping of a pruned file stays readable
+    assert mapped.versions == {"version": 0} and mapped.member_count() == 12
+
+
+def test_snapshot_header_holds_resolved_years_and_locations(tmp_path):
+    model = Model(5)
+    model.holidays["resolved"] = {"Utopia": {"": [2025, 2026], "North": [2025]}}
+    filename = str(tmp_path / "snapshot.bin")
+    write_snapshot(filename, build_snapshot(*model.load(), {"version": 0}))
+    snapshot = AvailabilitySnapshot(filename)
+
+    assert snapshot.resolved == model.holidays["resolved"]
+    expected = {(info["country"], info["region"]) for info in model.members.values()}
+    assert len(snapshot.locations()) == len(expected) and set(snapshot.locations()) == expected
@@ -0,0 +1,62 @@
+import pytest
+
+
+@pytest.fixture
+def reader(app_module):
+    """A second client, without the flash messages the writes of client leave in its session"""
+    return app_module.app.test_client()
+
+
+def test_unchanged_data_is_answered_with_304(reader, team, add_member):
+    add_member("Ada", "Australia", "Victoria")
+    url = f"{team}/api/member_locations"
+    response = reader.get(url)
+    etag = response.headers["ETag"]
+    assert response.status_code == 200 and response.headers["Cache-Control"] == "no-cache"
+
+    cached = reader.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.get_data() == b""
+    assert cached.headers["ETag"] == etag
+
+    # A write to a dataset the route depends on changes the tag
+    add_member("Bo", "China")
+    changed = reader.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert "China" in changed.get_data(as_text=True)
+
+
+def test_tags_differ_by_url_and_team(app_module, reader, team, add_member):
+    add_member("Ada")
+    app_module.teams.create(team[len("/t/") :] + "-other")
+    tags = {
+        reader.get(url).headers["ETag"]
+        for url in (f"{team}/api/availability/2026-03-02", f"{team}/api/availability/2026-03-03")
+    }
+    tags.add(reader.get(f"{team}-other/api/availability/2026-03-02").headers["ETag"])
+    assert len(tags) == 3
+
+
+def test_if_modified_since_applies_only_without_if_none_match(reader, team, add_member):
+    add_member("Ada")
+    url = f"{team}/api/member_locations"
+    last_modified = reader.get(url).headers["Last-Modified"]
+
+    assert reader.get(url, headers={"If-Modified-Since": last_modified}).status_code == 304
+    headers = {"If-Modified-Since": last_modified, "If-None-Match": '"stale"'}
+    assert reader.get(url, headers=headers).status_code == 200
+
+
+def test_pending_flash_messages_are_rendered_instead_of_304(client, reader, team, add_member):
+    add_member("Ada")
+    url = f"{team}/?year=2026&month=3"
+    etag = reader.get(url).headers["ETag"]
+
+    # client's session still holds the message of its add_member
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200 and "ETag" not in response.headers
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_errors_are_not_tagged(reader, team):
+    response = reader.get(f"{team}/api/availability/2026-13-01")
+    assert response.status_code == 400 and "ETag" not in response.headers
@@ -0,0 +1,99 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from coverage import compute_coverage, coverage_report
+from ooo_index import OOOIndex
+
+LOCATIONS = [("Utopia", ""), ("Utopia", "North"), ("Erewhon", "")]
+START = date(2026, 1, 1)
+
+
+def random_team(seed):
+    rng = random.Random(seed)
+    members = {}
+    for member_id in map(str, range(1, 15)):
+        country, region = rng.choice(LOCATIONS)
+        members[member_id] = {"name": f"Member {member_id}", "country": country, "region": region}
+
+    holidays_data = {"national": {}, "regional": {}}
+    for _ in range(10):
+        country, region = rng.choice(LOCATIONS)
+        day = (START + timedelta(days=rng.randrange(-5, 70))).isoformat()
+        if region:
+            holidays_data["regional"].setdefault(country, {}).setdefault(region, {})[day] = "Holiday"
+        else:
+            holidays_data["national"].setdefault(country, {})[day] = "Holiday"
+
+    # Entries overlap each other and the edges of the range
+    ooo = {}
+    for _ in range(40):
+        first = START + timedelta(days=rng.randrange(-10, 65))
+        entry = {"start_date": first.isoformat(), "end_date": (first + timedelta(days=rng.randrange(12))).isoformat()}
+        ooo.setdefault(rng.choice(list(members)), []).append(dict(entry, reason="Vacation"))
+    return members, holidays_data, ooo
+
+
+def brute_force(members, holidays_data, ooo, start, end):
+    """{(country, region): [available members per day]}, checking every member on every day"""
+    counts = {}
+    for member_id, info in members.items():
+        country, region = info["country"], info["region"]
+        location_days = dict(holidays_data["national"].get(country, {}))
+        if region:
+            location_days.update(holidays_data["regional"].get(country, {}).get(region, {}))
+        row = counts.setdefault((country, region), [0] * ((end - start).days + 1))
+        for day_index in range(len(row)):
+            day = (start + timedelta(days=day_index)).isoformat()
+            out = any(entry["start_date"] <= day <= entry["end_date"] for entry in ooo.get(member_id, []))
+            # A holiday takes the whole location out, whoever is away
+            if day not in location_days and not out:
+                row[day_index] += 1
+    return counts
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_coverage_matches_a_day_by_day_count(seed):
+    members, holidays_data, ooo = random_team(seed)
+    start, end = START, START + timedelta(days=59)
+    locations = compute_coverage(members, holidays_data, OOOIndex().ensure(ooo, 1), start, end)
+
+    expected = brute_force(members, holidays_data, ooo, start, end)
+    assert {(location.country, location.region): location.available for location in locations} == expected
+    headcounts = {(location.country, location.region): location.headcount for location in locations}
+    assert sum(headcounts.values()) == len(members)
+
+
+def test_coverage_report_totals_and_threshold():
+    members = {
+        "1": {"name": "A", "country": "Utopia", "region": "North"},
+        "2": {"name": "B", "country": "Utopia", "region": ""},
+        "3": {"name": "C", "country": "Erewhon", "region": ""},
+    }
+    holidays_data = {"national": {"Erewhon": {"2026-01-02": "Holiday"}}, "regional": {}}
+    ooo = {"1": [{"start_date": "2026-01-01", "end_date": "2026-01-03", "reason": "Vacation"}]}
+    start, end = date(2026, 1, 1), date(2026, 1, 4)  # Thursday to Sunday
+    locations = compute_coverage(members, holidays_data, OOOIndex().ensure(ooo, 1), start, end)
+
+    report = coverage_report(locations, start, end, min_available=2)
+    assert report["total"] == {"headcount": 3, "available": [2, 1, 2, 3]}
+    assert report["countries"]["Utopia"]["available"] == [1, 1, 1, 2]
+    assert report["regions"] == {"North (Utopia)": {"headcount": 1, "available": [0, 0, 0, 1]}}
+    assert [day["date"] for day in report["below_threshold"]] == ["2026-01-02"]
+    assert report["below_threshold"][0]["ratio"] == 0.333
+
+    report = coverage_report(locations, start, end, min_available=3, weekends=False)
+    assert [day["date"] for day in report["below_threshold"]] == ["2026-01-01", "2026-01-02"]
+
+
+def test_coverage_api_counts_and_filters(client, team, add_member):
+    first = add_member("Ada", "China")
+    add_member("Bo", "China")
+    form = {"member_id": first, "start_date": "2026-03-02", "end_date": "2026-03-03", "reason": "Vacation"}
+    assert client.post(f"{team}/add_ooo", data=form).status_code == 200
+
+    report = client.get(f"{team}/api/coverage?start=2026-03-02&end=2026-03-04&country=China&min_available=2").get_json()
+    assert report["total"] == {"headcount": 2, "available": [1, 1, 2]}
+    assert [day["date"] for day in report["below_threshold"]] == ["2026-03-02", "2026-03-03"]
+    assert client.get(f"{team}/api/coverage?start=2026-03-04&end=2026-03-02").status_code == 400
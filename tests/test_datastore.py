@@ -0,0 +1,74 @@
+import threading
+
+from datastore import DataStore
+
+
+def test_a_write_in_progress_does_not_block_reads_of_other_files(tmp_path):
+    store = DataStore()
+    first, second = str(tmp_path / "first.json"), str(tmp_path / "second.json")
+    store.save(second, {"b": 1})
+
+    in_transaction = threading.Event()
+    release = threading.Event()
+
+    def write_first():
+        with store.transaction(first, {}) as data:
+            data["a"] = 1
+            in_transaction.set()
+            release.wait(5)
+
+    writer = threading.Thread(target=write_first)
+    writer.start()
+    try:
+        assert in_transaction.wait(5)
+        loaded = []
+        reader = threading.Thread(target=lambda: loaded.append(store.load(second, {})))
+        reader.start()
+        reader.join(1)
+        assert loaded == [{"b": 1}]
+    finally:
+        release.set()
+        writer.join()
+    assert store.load(first, {}) == {"a": 1}
+
+
+def test_own_writes_are_single_steps_but_outside_edits_are_not(tmp_path):
+    store = DataStore()
+    filename = str(tmp_path / "data.json")
+    store.save(filename, {"a": 1})
+    before = store.version(filename)
+    store.save(filename, {"a": 2})
+    assert store.is_own_write(before, store.version(filename))
+
+    with open(filename, "w") as f:
+        f.write('{"a": 3, "edited": true}')
+    edited = store.current_version(filename)
+    store.save(filename, {"a": 4})
+    assert not store.is_own_write(before, store.version(filename))
+    assert store.is_own_write(edited, store.version(filename))
+
+
+def test_load_versioned_never_claims_newer_data_than_it_returns(tmp_path, monkeypatch):
+    store = DataStore()
+    filename = str(tmp_path / "data.json")
+    store.save(filename, {"a": 1})
+    other = DataStore()
+
+    # Another writer replaces the file right after this reader took its signature
+    signature = DataStore._signature
+    edits = []
+
+    def signature_then_write(self, name):
+        result = signature(self, name)
+        if self is store and not edits:
+            edits.append(other.save(filename, {"a": 2}))
+        return result
+
+    monkeypatch.setattr(DataStore, "_signature", signature_then_write)
+    data, version = store.load_versioned(filename, {})
+    assert version != other.version(filename)
+
+    # The next load sees the new signature, so a cache keyed by version is rebuilt
+    data, version = store.load_versioned(filename, {})
+    assert data == {"a": 2}
+    assert version == other.version(filename) == store.version(filename)
@@ -0,0 +1,74 @@
+import json
+import os
+
+from change_log import ChangeJournal
+
+
+def test_journal_ids_resume_after_the_last_event_seen(tmp_path):
+    journal = ChangeJournal(str(tmp_path / "changes.jsonl"))
+    assert journal.position() == "0-0"
+    assert journal.read_since("0-0") == ([], "0-0")
+
+    journal.append({"kind": "ooo_added", "member_id": "1"})
+    journal.append({"kind": "ooo_removed", "member_id": "1"})
+    events, next_id = journal.read_since("0-0")
+    assert [event["kind"] for _, event in events] == ["ooo_added", "ooo_removed"]
+    assert events[-1][0] == next_id == journal.position()
+
+    events, _ = journal.read_since(events[0][0])
+    assert [event["kind"] for _, event in events] == ["ooo_removed"]
+
+    # A line still being written is left for the next read
+    with open(journal.journal_file, "ab") as f:
+        f.write(b'{"kind": "memb')
+    assert journal.read_since(next_id) == ([], next_id)
+
+
+def test_ids_from_a_replaced_journal_ask_for_a_reset(tmp_path):
+    journal = ChangeJournal(str(tmp_path / "changes.jsonl"), max_bytes=150)
+    for member_id in range(3):
+        journal.append({"kind": "member_added", "member_id": str(member_id)})
+    old_id = journal.position()
+    old_inode = os.stat(journal.journal_file).st_ino
+
+    journal.append({"kind": "member_added", "member_id": "3"})
+    assert os.stat(journal.journal_file).st_ino != old_inode
+    assert journal.read_since(old_id) == (None, journal.position())
+    assert journal.read_since("garbage") == (None, journal.position())
+
+
+def read_events(client, url, last_event_id=None):
+    """Return [(id, event, data)] of one response of the SSE route (the test client is not threaded)"""
+    headers = {"Last-Event-ID": last_event_id} if last_event_id else {}
+    response = client.get(url, headers=headers)
+    assert response.mimetype == "text/event-stream" and response.headers["Cache-Control"] == "no-cache"
+    events = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "id" in fields:
+            events.append((fields["id"], fields.get("event"), json.loads(fields.get("data", "null"))))
+    return events
+
+
+def test_events_resume_from_last_event_id_and_skip_other_teams(app_module, client, team, add_member):
+    app_module.teams.create(team[len("/t/") :] + "-other")
+    [(start_id, _, _)] = read_events(client, f"{team}/api/events")
+
+    member_id = add_member("Ada")
+    form = {"member_id": member_id, "start_date": "2026-03-02", "end_date": "2026-03-03", "reason": "Vacation"}
+    assert client.post(f"{team}/add_ooo", data=form).status_code == 200
+    other = {"name": "Bo", "country": "Nowhere", "region": ""}
+    assert client.post(f"{team}-other/add_member", data=other).status_code in (200, 302)
+
+    events = read_events(client, f"{team}/api/events", start_id)
+    changes = [(event_id, data) for event_id, event, data in events if event == "change"]
+    assert [data["kind"] for _, data in changes] == ["member_added", "ooo_added"]
+    assert {data["team"] for _, data in changes} == {team[len("/t/") :]}
+    assert changes[1][1]["start"] == "2026-03-02" and changes[1][1]["end"] == "2026-03-03"
+
+    # Resuming from the last id sent repeats nothing; the other team sees its own change
+    assert [event for _, event, _ in read_events(client, f"{team}/api/events", changes[-1][0])] == [None]
+    other_events = read_events(client, f"{team}-other/api/events", start_id)
+    assert [data["kind"] for _, event, data in other_events if event == "change"] == ["member_added"]
+
+    assert [event for _, event, _ in read_events(client, f"{team}/api/events", "1-999999999")] == [None, "reset"]
@@ -0,0 +1,96 @@
+import random
+
+from availability import AVAILABLE, HOLIDAY, OOO, availability_bits, first_run
+
+
+def scan_first_run(bits, length, width):
+    """Lowest index of length consecutive set bits among the low width bits, by brute force"""
+    for start in range(width - length + 1):
+        if all(bits >> i & 1 for i in range(start, start + length)):
+            return start
+    return None
+
+
+def test_first_run_matches_a_linear_scan():
+    rng = random.Random(3)
+    for _ in range(500):
+        width = rng.randrange(1, 80)
+        density = rng.random()
+        bits = sum(1 << i for i in range(width) if rng.random() < density)
+        length = rng.randrange(1, width + 2)
+        assert first_run(bits, length) == scan_first_run(bits, length, width), (bin(bits), length)
+
+
+def test_first_run_at_the_edges():
+    assert first_run(0b111, 3) == 0
+    assert first_run(0b1110, 3) == 1
+    assert first_run(0b1110, 4) is None
+    assert first_run(0, 1) is None
+    assert first_run(1 << 99, 1) == 99
+
+
+def test_availability_bits():
+    codes = bytes([AVAILABLE, HOLIDAY, AVAILABLE, OOO, AVAILABLE])
+    assert availability_bits(codes) == 0b10101
+    assert availability_bits(codes, [0, 2, 4]) == 0b111
+    assert availability_bits(codes, [1, 3]) == 0
+    assert availability_bits(b"") == 0
+
+
+def find_window(client, team, **params):
+    response = client.get(f"{team}/api/find_window", query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def add_ooo(client, team, member_id, start, end):
+    form = {"member_id": member_id, "start_date": start, "end_date": end, "reason": "Vacation"}
+    assert client.post(f"{team}/add_ooo", data=form).status_code == 200
+
+
+def test_window_at_the_start_of_the_range(client, team, add_member):
+    add_member("Ada")
+    result = find_window(client, team, days=3, start="2026-03-02", end="2026-03-15")
+    assert result["found"]
+    assert result["dates"] == ["2026-03-02", "2026-03-03", "2026-03-04"]
+
+
+def test_window_at_the_end_of_the_range_for_everyone(client, team, add_member):
+    ada, bob = add_member("Ada"), add_member("Bob")
+    add_ooo(client, team, ada, "2026-03-02", "2026-03-08")
+    add_ooo(client, team, bob, "2026-03-09", "2026-03-12")
+    result = find_window(client, team, days=3, start="2026-03-02", end="2026-03-15")
+    assert (result["start"], result["end"]) == ("2026-03-13", "2026-03-15")
+
+    # Only Ada: her window starts right after her OOO
+    result = find_window(client, team, members=ada, days=3, start="2026-03-02", end="2026-03-15")
+    assert (result["start"], result["end"]) == ("2026-03-09", "2026-03-11")
+
+
+def test_no_window(client, team, add_member):
+    ada = add_member("Ada")
+    add_ooo(client, team, ada, "2026-03-02", "2026-03-12")
+    result = find_window(client, team, days=4, start="2026-03-02", end="2026-03-15")
+    assert result["found"] is False
+    assert "start" not in result
+
+
+def test_exclude_weekends_skips_weekend_days_inside_the_window(client, team, add_member):
+    ada = add_member("Ada")
+    add_ooo(client, team, ada, "2026-03-02", "2026-03-05")  # Monday to Thursday
+    result = find_window(client, team, days=3, start="2026-03-02", end="2026-03-15", exclude_weekends=1)
+    assert result["dates"] == ["2026-03-06", "2026-03-09", "2026-03-10"]
+
+    # A window ending on the last working day of the range
+    add_ooo(client, team, ada, "2026-03-06", "2026-03-10")
+    result = find_window(client, team, days=3, start="2026-03-02", end="2026-03-13", exclude_weekends=1)
+    assert result["dates"] == ["2026-03-11", "2026-03-12", "2026-03-13"]
+    result = find_window(client, team, days=4, start="2026-03-02", end="2026-03-13", exclude_weekends=1)
+    assert result["found"] is False
+
+
+def test_find_window_rejects_bad_parameters(client, team, add_member):
+    add_member("Ada")
+    assert client.get(f"{team}/api/find_window?days=0").status_code == 400
+    assert client.get(f"{team}/api/find_window?days=2&members=999").status_code == 400
+    assert client.get(f"{team}/api/find_window?days=2&start=2026-03-05&end=2026-03-01").status_code == 400
@@ -0,0 +1,145 @@
+import os
+import random
+
+import pytest
+
+from history_log import ARCHIVE_CURSOR, HistoryArchive, HistoryIndex, HistoryJournal
+
+OPERATIONS = ["ADD_OOO", "DELETE_OOO", "ADD_MEMBER"]
+
+
+@pytest.fixture
+def journal(tmp_path):
+    archive = HistoryArchive(str(tmp_path / "history-archive"))
+    journal = HistoryJournal(str(tmp_path / "history.jsonl"), archive=archive)
+    rng = random.Random(5)
+    # One entry a day from 2024-01-01, in time order, with unique timestamps
+    for day in range(900):
+        year, rest = 2024 + day // 300, day % 300
+        timestamp = f"{year}-{1 + rest // 25:02d}-{1 + rest % 25:02d} 12:{day % 60:02d}:00"
+        journal.append(
+            {
+                "timestamp": timestamp,
+                "operation_type": rng.choice(OPERATIONS),
+                "member_id": str(rng.randrange(1, 4)),
+                "details": f"entry {day}",
+            }
+        )
+    return journal
+
+
+def all_pages(index, limit, **filters):
+    """Follow next_cursor from the first page to the last and return every entry"""
+    entries = []
+    cursor = None
+    for _ in range(1000):
+        page = index.page(limit, cursor, **filters)
+        entries.extend(page["entries"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return entries
+    raise AssertionError("pagination did not end")
+
+
+def expected(journal, operation_type=None, member_id=None, since=None, until=None):
+    entries = list(journal)
+    if operation_type:
+        entries = [e for e in entries if e["operation_type"] == operation_type]
+    if member_id:
+        entries = [e for e in entries if e["member_id"] == member_id]
+    if since:
+        entries = [e for e in entries if e["timestamp"] >= since + " 00:00:00"]
+    if until:
+        entries = [e for e in entries if e["timestamp"] <= until + " 23:59:59"]
+    return sorted(entries, key=lambda e: e["timestamp"], reverse=True)
+
+
+FILTERS = [
+    {},
+    {"operation_type": "ADD_OOO"},
+    {"member_id": "2"},
+    {"operation_type": "DELETE_OOO", "member_id": "1"},
+    {"since": "2024-06-01", "until": "2025-03-10"},
+    {"since": "2026-01-01"},
+    {"until": "2024-02-01"},
+]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_pages_cross_from_the_hot_journal_into_the_archive(journal, filters):
+    index = HistoryIndex(journal)
+    before = all_pages(index, 37, **filters)
+    assert before == expected(journal, **filters)
+
+    assert journal.roll("2025-06-01 00:00:00") > 0
+    journal.archive.compact("2025")
+    for limit in (1, 37, 100, 1000):
+        assert all_pages(index, limit, **filters) == before
+
+
+def test_archive_manifest(journal):
+    index = HistoryIndex(journal)
+    total = index.total()
+    counts = index.operation_counts()
+    archived = journal.roll("2025-06-01 00:00:00")
+
+    segments = journal.archive.segments()
+    assert sum(segment["count"] for segment in segments) == archived
+    assert [segment["first"] for segment in segments] == sorted(segment["first"] for segment in segments)
+    for segment in segments:
+        assert os.path.exists(os.path.join(journal.archive.archive_dir, segment["file"]))
+        assert segment["first"] <= segment["last"] < "2025-06-01"
+        assert sum(segment["operations"].values()) == segment["count"]
+    assert index.total() == total
+    assert index.operation_counts() == counts
+
+    # Compaction merges the months of finished years into one segment per year
+    assert journal.archive.compact("2025") == ["2024"]
+    periods = [segment["period"] for segment in journal.archive.segments()]
+    assert periods[0] == "2024" and all(period.startswith("2025-") for period in periods[1:])
+    assert index.total() == total
+    assert index.operation_counts() == counts
+    assert all_pages(index, 250) == expected(journal)
+
+
+def test_archive_cursor_after_a_full_hot_page(journal):
+    journal.roll("2026-01-01 00:00:00")
+    index = HistoryIndex(journal)
+    hot = expected(journal, since="2026-01-01")
+    page = index.page(len(hot))
+    assert page["entries"] == hot
+    assert page["next_cursor"] == ARCHIVE_CURSOR
+    assert index.page(5, ARCHIVE_CURSOR)["entries"] == expected(journal, until="2025-12-31")[:5]
+
+
+def test_hot_cursors_are_rejected_after_a_roll(journal):
+    index = HistoryIndex(journal)
+    cursor = index.page(10)["next_cursor"]
+    assert index.page(10, cursor)["entries"]
+
+    journal.roll("2025-06-01 00:00:00")
+    with pytest.raises(ValueError):
+        index.page(10, cursor)
+    with pytest.raises(ValueError):
+        index.page(10, "12")
+
+
+def test_a_roll_between_indexing_and_reading_does_not_mix_files(journal, monkeypatch):
+    index = HistoryIndex(journal)
+    index.refresh()
+    journal.append({"timestamp": "2027-01-01 00:00:00", "operation_type": "ADD_OOO", "details": "new"})
+    first_page = expected(journal)[:20]
+
+    # Another worker rolls the journal right after this one indexed it
+    catch_up = HistoryIndex._catch_up
+    rolled = []
+
+    def catch_up_then_roll(self, f):
+        catch_up(self, f)
+        if not rolled:
+            rolled.append(journal.roll("2026-06-01 00:00:00"))
+
+    monkeypatch.setattr(HistoryIndex, "_catch_up", catch_up_then_roll)
+    assert index.page(20)["entries"] == first_page
+    assert rolled[0] > 0
+    assert index.page(20)["entries"] == first_page
@@ -0,0 +1,99 @@
+import json
+from datetime import datetime
+
+from holiday_generation import HolidayHorizon, HolidayUnitCache
+from init_sample_data import create_sample_data
+
+COUNTRY_CODES = {"United States": "US", "Atlantis": "XX"}
+
+
+def resolve(tmp_path, units):
+    stored = {}
+
+    def store(holidays_data, resolved):
+        stored.update(holidays=holidays_data, units=resolved)
+
+    horizon = HolidayHorizon(HolidayUnitCache(str(tmp_path / "cache")))
+    generated = horizon.resolve(units, COUNTRY_CODES, lambda: {}, store, max_workers=1)
+    return generated, stored
+
+
+def test_failed_units_stay_unresolved(tmp_path):
+    units = [("United States", "", 2025), ("United States", "Nowhere", 2025), ("Atlantis", "", 2025)]
+    generated, stored = resolve(tmp_path, units)
+
+    # The unknown subdivision and country fail; the national US holidays are still stored
+    assert stored["units"] == [("United States", "", 2025)]
+    assert len(generated["errors"]) == 2
+    assert "2025-07-04" in stored["holidays"]["national"]["United States"]
+    locations = [(country, region) for country, region, _ in units]
+    resolved = {"resolved": {"United States": {"": [2025]}}}
+    missing = HolidayHorizon.missing(resolved, locations, [2025])
+    assert missing == [("United States", "Nowhere", 2025), ("Atlantis", "", 2025)]
+
+
+def test_index_rejects_invalid_months(client, team):
+    for query in ("year=10000", "year=0", "year=1900", "year=2101", "month=13", "month=0", "year=2026&month=-1"):
+        assert client.get(f"{team}/?{query}").status_code == 400
+    assert client.get(f"{team}/?year=2100&month=12").status_code == 200
+
+
+def test_any_supported_year_is_resolved_when_first_needed(app_module, client, team, add_member):
+    add_member("Ada", "United States")
+
+    assert client.get(f"{team}/?year=2090&month=1").status_code == 200
+    assert client.get(f"{team}/api/coverage?start=1950-12-01&end=1951-01-31").status_code == 200
+    assert client.get(f"{team}/api/find_window?days=3&start=2080-01-01&end=2080-03-01").status_code == 200
+    assert client.get(f"{team}/api/availability/2070-07-04").get_json()["1"]["reason"] == "Holiday"
+
+    resolved = app_module.shared_storage.get_holidays()["resolved"]["United States"][""]
+    assert {1950, 1951, 2070, 2080, 2090} <= set(resolved)
+    assert "2090-07-04" in app_module.shared_storage.get_holidays()["national"]["United States"]
+
+
+def test_years_outside_the_supported_range_are_rejected(client, team, add_member):
+    add_member("Ada", "United States")
+    for url in (
+        "/api/availability/1900-12-31",
+        "/api/availability?start=2100-12-01&end=2101-01-31",
+        "/api/coverage?start=1900-12-01&end=1901-01-31",
+        "/api/find_window?days=1&start=2101-01-01&end=2101-02-01",
+    ):
+        response = client.get(f"{team}{url}")
+        assert response.status_code == 400, url
+        assert "between 1901 and 2100" in response.get_json()["error"]
+
+
+def test_feeds_resolve_only_the_years_they_cover(app_module, client, team, add_member):
+    current = datetime.now().year
+    add_member("Ada", "Australia")
+    form = {"member_id": "1", "start_date": f"{current + 7}-02-01", "end_date": f"{current + 7}-02-03"}
+    assert client.post(f"{team}/add_ooo", data=form).status_code == 200
+
+    body = client.get(f"{team}/calendar/team.ics").get_data(as_text=True)
+    resolved = set(app_module.shared_storage.get_holidays()["resolved"]["Australia"][""])
+    assert {current, current + 7} <= resolved
+    assert not {current + 5, current + 6, current + 8} & resolved
+    assert f"DTSTART;VALUE=DATE:{current + 7}0126" in body  # Australia Day
+
+
+def test_sample_data_records_resolved_years(tmp_path):
+    sizes = create_sample_data(str(tmp_path), members=20, ooo_per_member=1, holiday_years=2, history=10)
+    with open(tmp_path / "members.json") as f:
+        members = json.load(f)
+    with open(tmp_path / "holidays.json") as f:
+        holidays_data = json.load(f)
+
+    locations = {(m["country"], m["region"] or "") for m in members.values()}
+    assert HolidayHorizon.missing(holidays_data, sorted(locations), sizes["years"]) == []
+
+
+def test_views_of_resolved_years_load_no_data(client, team, add_member, loads):
+    add_member("Ada", "United States")
+    assert client.get(f"{team}/?year=2026&month=1").status_code == 200
+
+    # Another month of the year is not cached, but the snapshot knows its holidays are resolved
+    before = loads()
+    assert client.get(f"{team}/?year=2026&month=2").status_code == 200
+    assert client.get(f"{team}/api/availability/2026-03-02").status_code == 200
+    assert loads() == before
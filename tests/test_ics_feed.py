@@ -0,0 +1,75 @@
+from ics_feed import FeedCache, escape_text, fold, iter_feed
+
+
+def unfold(text):
+    return text.replace("\r\n ", "")
+
+
+def test_long_lines_are_folded_without_splitting_characters():
+    line = "SUMMARY:" + "Ünïcödé holiday " * 10
+    folded = fold(line)
+    assert folded.endswith("\r\n") and unfold(folded) == line + "\r\n"
+    assert all(len(piece.encode("utf-8")) <= 75 for piece in folded[:-2].split("\r\n"))
+    assert fold("SUMMARY:short") == "SUMMARY:short\r\n"
+    assert escape_text("a,b;c\\d\ne") == "a\\,b\\;c\\\\d\\ne"
+
+
+def test_feed_lists_ooo_entries_and_each_location_holiday_once():
+    members = {"1": {"name": "Ada", "country": "Utopia", "region": "North"}}
+    holidays_data = {
+        "national": {"Utopia": {"2026-01-01": "New Year"}},
+        "regional": {"Utopia": {"North": {"2026-02-02": "Northern Day"}, "South": {"2026-03-03": "Southern Day"}}},
+    }
+    ooo_data = {"1": [{"start_date": "2026-01-05", "end_date": "2026-01-09", "reason": "Ski, Alps"}]}
+    locations = [("Utopia", "North"), ("Utopia", "South"), ("Utopia", "North")]
+    feed = unfold("".join(iter_feed("Team", members, holidays_data, ooo_data, locations)))
+    lines = feed.split("\r\n")
+
+    assert lines[0] == "BEGIN:VCALENDAR" and lines[-2:] == ["END:VCALENDAR", ""]
+    assert feed.count("BEGIN:VEVENT") == 4
+    assert lines.count("SUMMARY:Holiday: New Year (Utopia)") == 1
+    assert "SUMMARY:Holiday: Southern Day (South\\, Utopia)" in lines
+    # DTEND is exclusive
+    start = lines.index("SUMMARY:Ada: Ski\\, Alps")
+    assert lines[start - 2 : start] == ["DTSTART;VALUE=DATE:20260105", "DTEND;VALUE=DATE:20260110"]
+    assert "UID:holiday-Utopia-national-2026-01-01@leave-app" in lines
+
+
+def test_feed_cache_keeps_complete_bodies_per_version():
+    cache = FeedCache(2)
+    stream = cache.stream("a", {"ooo": 1}, iter(["BEGIN", "END"]))
+    next(stream)
+    # A feed that was not sent completely is not cached
+    assert cache.get("a", {"ooo": 1}) is None
+    assert list(stream) == ["END"]
+    assert cache.get("a", {"ooo": 1}) == "BEGINEND"
+    assert cache.get("a", {"ooo": 2}) is None
+
+    cache.put("b", {}, "b")
+    cache.put("c", {}, "c")
+    assert cache.get("a", {"ooo": 1}) is None
+    assert cache.stats() == {"hits": 1, "misses": 3, "evictions": 1, "size": 2, "max_size": 2}
+
+
+def test_feeds_are_served_from_the_cache_until_the_data_changes(app_module, client, team, add_member):
+    member_id = add_member("Ada", "Australia")
+    add_member("Bo", "China")
+    feed_cache = app_module.teams.get(team[len("/t/") :]).feed_cache
+    form = {"member_id": member_id, "start_date": "2026-03-02", "end_date": "2026-03-03", "reason": "Dentist"}
+    assert client.post(f"{team}/add_ooo", data=form).status_code == 200
+
+    response = client.get(f"{team}/calendar/member/{member_id}.ics")
+    assert response.mimetype == "text/calendar"
+    body = unfold(response.get_data(as_text=True))
+    assert "SUMMARY:Ada: Dentist" in body and "(Australia)" in body and "(China)" not in body
+    assert client.get(f"{team}/calendar/member/{member_id}.ics").get_data(as_text=True) == response.get_data(
+        as_text=True
+    )
+    assert feed_cache.stats()["hits"] == 1
+
+    form = dict(form, start_date="2026-04-06", end_date="2026-04-06", reason="Training")
+    assert client.post(f"{team}/add_ooo", data=form).status_code == 200
+    body = unfold(client.get(f"{team}/calendar/team.ics").get_data(as_text=True))
+    assert "SUMMARY:Ada: Training" in body and "(China)" in body
+    assert unfold(client.get(f"{team}/calendar/location/China.ics").get_data(as_text=True)).count("Ada:") == 0
+    assert client.get(f"{team}/calendar/member/99.ics").status_code == 404
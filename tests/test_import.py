@@ -0,0 +1,106 @@
+import io
+
+from ooo_import import iter_csv_rows, iter_ics_rows, validate
+
+MEMBERS = {"1": {"name": "Ada"}, "2": {"name": "Bo"}}
+
+CSV = """member_id,start_date,end_date,reason
+1,2026-03-02,2026-03-04,Vacation
+2,2026-03-05,,
+9,2026-03-02,2026-03-02,Unknown member
+1,2026-02-30,2026-03-01,Bad date
+1,2026-03-10,2026-03-09,Reversed
+,2026-03-10,2026-03-10,No member
+1,2026-03-02,2026-03-04,Vacation
+2,2026-01-05,2026-01-06,Training
+"""
+
+ICS = """BEGIN:VCALENDAR
+BEGIN:VEVENT
+SUMMARY:Conference\\, Berlin
+DTSTART;VALUE=DATE:20260302
+DTEND;VALUE=DATE:20260305
+END:VEVENT
+BEGIN:VEVENT
+X-MEMBER-ID:2
+SUMMARY:Long
+  weekend
+DTSTART:20260306T090000Z
+DTEND:20260306T170000Z
+END:VEVENT
+BEGIN:VEVENT
+SUMMARY:No start
+END:VEVENT
+BEGIN:VEVENT
+DTSTART:2026-03-09
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+def test_csv_rows_are_validated_one_by_one():
+    existing = {"2": [{"start_date": "2026-01-05", "end_date": "2026-01-06", "reason": "Training"}]}
+    result = validate(iter_csv_rows(io.StringIO(CSV)), MEMBERS, existing)
+
+    assert result.entries == [
+        ("1", {"start_date": "2026-03-02", "end_date": "2026-03-04", "reason": "Vacation"}),
+        ("2", {"start_date": "2026-03-05", "end_date": "2026-03-05", "reason": "Vacation"}),
+    ]
+    # Row numbers count the header as row 1
+    assert result.errors == [
+        {"row": 4, "error": "Unknown member_id 9"},
+        {"row": 5, "error": "Dates must be YYYY-MM-DD"},
+        {"row": 6, "error": "end_date is before start_date"},
+        {"row": 7, "error": "Missing member_id"},
+        {"row": 8, "error": "Duplicate entry"},
+        {"row": 9, "error": "Duplicate entry"},
+    ]
+    assert result.to_dict(max_errors=2) == {"rows": 8, "imported": 2, "rejected": 6, "errors": result.errors[:2]}
+
+
+def test_csv_without_the_required_columns_is_rejected():
+    result = validate(iter_csv_rows(io.StringIO("member,start\n1,2026-03-02\n")), MEMBERS, {})
+    assert result.entries == []
+    assert result.errors == [{"row": 1, "error": "Missing CSV columns: member_id, start_date, end_date"}]
+
+
+def test_ics_events_become_entries():
+    result = validate(iter_ics_rows(io.StringIO(ICS), default_member_id="1"), MEMBERS, {})
+
+    assert result.entries == [
+        # DTEND is exclusive for all-day events, not for timed ones
+        ("1", {"start_date": "2026-03-02", "end_date": "2026-03-04", "reason": "Conference, Berlin"}),
+        ("2", {"start_date": "2026-03-06", "end_date": "2026-03-06", "reason": "Long weekend"}),
+    ]
+    assert result.errors == [{"row": 3, "error": "Event has no DTSTART"}, {"row": 4, "error": "Invalid DTSTART/DTEND"}]
+
+
+def upload(client, team, text, filename, **params):
+    data = dict(params, file=(io.BytesIO(text.encode("utf-8")), filename))
+    return client.post(f"{team}/api/import_ooo", data=data, content_type="multipart/form-data")
+
+
+def test_import_job_adds_the_valid_rows(app_module, client, team, add_member, wait_for_job):
+    add_member("Ada")
+    add_member("Bo")
+    storage = app_module.teams.get(team[len("/t/") :]).storage
+
+    job = wait_for_job(upload(client, team, CSV, "ooo.csv", dry_run="1"))
+    assert job["result"]["dry_run"] and job["result"]["imported"] == 3
+    assert storage.get_ooo() == {}
+
+    job = wait_for_job(upload(client, team, CSV, "ooo.csv"))
+    assert job["status"] == "succeeded"
+    assert (job["result"]["rows"], job["result"]["imported"], job["result"]["rejected"]) == (8, 3, 5)
+    assert [entry["start_date"] for entry in storage.get_ooo()["2"]] == ["2026-03-05", "2026-01-05"]
+
+    # The format follows the file name; events without X-MEMBER-ID go to member_id
+    job = wait_for_job(upload(client, team, ICS, "calendar.ics", member_id="1"))
+    assert job["result"]["imported"] == 2 and job["result"]["rejected"] == 2
+    assert [len(storage.get_ooo()[member_id]) for member_id in ("1", "2")] == [2, 3]
+    assert "Long weekend" in client.get(f"{team}/?year=2026&month=3").get_data(as_text=True)
+
+
+def test_import_rejects_requests_without_a_file_or_with_an_unknown_format(client, team):
+    assert client.post(f"{team}/api/import_ooo").status_code == 400
+    assert upload(client, team, CSV, "ooo.csv", format="xlsx").status_code == 400
@@ -0,0 +1,107 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from jobs import FAILED, RUNNING, SUCCEEDED, JobRunner
+
+
+def wait_for(runner, job_id, statuses=(SUCCEEDED, FAILED), timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = runner.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+@pytest.fixture
+def runner(tmp_path):
+    return JobRunner(str(tmp_path / "jobs.json"), max_workers=2, progress_interval=0)
+
+
+def test_identical_active_jobs_are_deduplicated(runner):
+    release = threading.Event()
+
+    def run(progress):
+        progress(1, 2)
+        release.wait(5)
+        return {"done": True}
+
+    first, created = runner.submit("generate", {"years": [2026]}, run, scope="a")
+    assert created
+    again, created_again = runner.submit("generate", {"years": [2026]}, run, scope="a")
+    assert not created_again and again["id"] == first["id"]
+
+    # Another scope or other parameters are different jobs
+    other, created_other = runner.submit("generate", {"years": [2026]}, lambda progress: None, scope="b")
+    assert created_other and other["id"] != first["id"]
+
+    release.set()
+    assert wait_for(runner, first["id"])["result"] == {"done": True}
+    # Once finished, the same job can be submitted again
+    rerun, created = runner.submit("generate", {"years": [2026]}, lambda progress: 1, scope="a")
+    assert created and rerun["id"] != first["id"]
+    assert wait_for(runner, rerun["id"])["status"] == SUCCEEDED
+
+
+def test_failures_are_reported(runner):
+    def run(progress):
+        raise ValueError("no such country")
+
+    job, _ = runner.submit("generate", {}, run)
+    job = wait_for(runner, job["id"])
+    assert job["status"] == FAILED and job["error"] == "no such country"
+
+
+def submit_and_exit(jobs_file, queue):
+    # The worker takes the job and exits before it ends, as a killed gunicorn worker would
+    runner = JobRunner(jobs_file, max_workers=1)
+    job, _ = runner.submit("generate", {"years": [2026]}, lambda progress: time.sleep(60), scope="a")
+    deadline = time.monotonic() + 10
+    while runner.get(job["id"])["status"] != RUNNING and time.monotonic() < deadline:
+        time.sleep(0.01)
+    queue.put(job["id"])
+    time.sleep(0.2)  # let the heartbeat thread start
+    os._exit(0)
+
+
+def test_jobs_of_exited_workers_fail_and_can_be_resubmitted(runner):
+    queue = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=submit_and_exit, args=(runner.jobs_file, queue))
+    worker.start()
+    job_id = queue.get(timeout=10)
+    worker.join(10)
+
+    job = runner.get(job_id)
+    assert job["status"] == FAILED and "exited" in job["error"]
+    again, created = runner.submit("generate", {"years": [2026]}, lambda progress: 1, scope="a")
+    assert created and again["id"] != job_id
+    with open(runner.jobs_file) as f:
+        assert json.load(f)[job_id]["status"] == FAILED
+
+
+def test_running_jobs_without_a_heartbeat_fail(tmp_path):
+    runner = JobRunner(str(tmp_path / "jobs.json"), heartbeat_interval=60, heartbeat_timeout=0.2)
+    release = threading.Event()
+    job, _ = runner.submit("import", {}, lambda progress: release.wait(5))
+    try:
+        wait_for(runner, job["id"], statuses=(RUNNING,))
+        time.sleep(0.3)
+        job = runner.get(job["id"])
+        assert job["status"] == FAILED and "heartbeat" in job["error"]
+        assert runner.submit("import", {}, lambda progress: None)[1]
+    finally:
+        release.set()
+
+
+def test_heartbeats_keep_long_jobs_alive(tmp_path):
+    runner = JobRunner(str(tmp_path / "jobs.json"), heartbeat_interval=0.05, heartbeat_timeout=0.3)
+    job, _ = runner.submit("import", {}, lambda progress: time.sleep(0.8) or "ok")
+    time.sleep(0.5)
+    assert runner.get(job["id"])["status"] == RUNNING
+    assert wait_for(runner, job["id"])["result"] == "ok"
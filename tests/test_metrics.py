@@ -0,0 +1,67 @@
+import json
+import multiprocessing
+import os
+
+from metrics import Metrics
+
+
+def record_in_another_process(directory, queue):
+    metrics = Metrics(directory)
+    metrics.describe("jobs_total", "counter", "Jobs")
+    metrics.describe("queue_size", "gauge", "Queue size")
+    metrics.inc("jobs_total", value=5)
+    metrics.add_collector(lambda: [("queue_size", {}, 7)])
+    metrics.flush(force=True)
+    queue.put(metrics.snapshot_file)
+
+
+def describe(metrics):
+    metrics.describe("jobs_total", "counter", "Jobs")
+    metrics.describe("queue_size", "gauge", "Queue size")
+    return metrics
+
+
+def test_snapshots_of_exited_processes_are_dropped(tmp_path):
+    directory = str(tmp_path)
+    metrics = describe(Metrics(directory))
+    metrics.inc("jobs_total", value=2)
+    metrics.add_collector(lambda: [("queue_size", {}, 3)])
+
+    # A worker that exited left its snapshot behind, as did one from before locks were used
+    queue = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=record_in_another_process, args=(directory, queue))
+    worker.start()
+    worker_file = queue.get(timeout=10)
+    worker.join()
+    with open(os.path.join(directory, "123-1700000000000.json"), "w") as f:
+        json.dump({"buckets": list(metrics.buckets), "values": [["jobs_total", [], 100]], "histograms": []}, f)
+
+    text = metrics.render()
+    assert "jobs_total 2\n" in text
+    assert f'queue_size{{pid="{os.getpid()}"}} 3\n' in text
+    assert not os.path.exists(worker_file)
+    assert sorted(os.listdir(directory)) == sorted(
+        [os.path.basename(metrics.snapshot_file), os.path.basename(metrics.snapshot_file)[:-5] + ".lock"]
+    )
+
+
+def test_counters_of_running_processes_are_summed_and_gauges_kept_apart(tmp_path):
+    directory = str(tmp_path)
+    first = describe(Metrics(directory))
+    first.inc("jobs_total", value=2)
+    first.add_collector(lambda: [("queue_size", {}, 3)])
+    first.flush(force=True)
+
+    # Another worker, with its own lock held for as long as it runs
+    second = describe(Metrics(directory))
+    second.inc("jobs_total", value=5)
+    second.add_collector(lambda: [("queue_size", {}, 7)])
+    second_id = second.process_lock.id
+    with open(os.path.join(directory, f"{second_id}.json"), "w") as f:
+        snapshot = second._snapshot()
+        json.dump(dict(snapshot, pid=4242), f)
+
+    text = first.render()
+    assert "jobs_total 7\n" in text
+    assert f'queue_size{{pid="{os.getpid()}"}} 3\n' in text
+    assert 'queue_size{pid="4242"} 7\n' in text
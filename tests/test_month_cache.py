@@ -0,0 +1,79 @@
+from month_cache import MonthCache, changed_holiday_months, months_between
+
+
+def next_version(before, after):
+    return before is not None and after == before + 1
+
+
+def test_writes_carry_untouched_months_forward():
+    cache = MonthCache(3, next_version)
+    versions = {"members": 1, "holidays": 1, "ooo": 1}
+    cache.put(2026, 1, versions, {"jan": True}, "<jan>")
+    cache.put(2026, 3, versions, {"mar": True}, "<mar>")
+
+    # An OOO entry in March drops March only; January moves to the new version
+    cache.note_write("ooo", 2, months_between("2026-03-30", "2026-04-02"))
+    newer = dict(versions, ooo=2)
+    assert cache.get(2026, 1, newer)["html"] == "<jan>"
+    assert cache.get(2026, 3, newer) is None
+
+    # A version that is not one step ahead was written by another worker: everything goes
+    cache.note_write("ooo", 4, {(2026, 3)})
+    assert cache.get(2026, 1, dict(versions, ooo=4)) is None
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_entries_of_other_versions_are_not_served_and_the_oldest_are_evicted():
+    cache = MonthCache(2, next_version)
+    versions = {"members": 1}
+    for month in (1, 2, 3):
+        cache.put(2026, month, versions, {}, f"<{month}>")
+    assert cache.get(2026, 1, versions) is None
+    assert cache.get(2026, 3, {"members": 2}) is None
+    assert cache.get(2026, 2, versions)["html"] == "<2>"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_changed_holiday_months():
+    before = {"national": {"A": {"2026-01-01": "New Year", "2026-05-01": "Labour Day"}}, "regional": {}}
+    after = {"national": {"A": {"2026-01-01": "New Year", "2026-05-01": "May Day"}}, "regional": {"A": {"R": {"2026-08-15": "Fair"}}}}
+    assert changed_holiday_months(before, after) == {(2026, 5), (2026, 8)}
+
+
+def test_a_cached_month_is_served_without_loading_data(client, team, add_member, loads):
+    add_member("Ada")
+    url = f"{team}/?year=2026&month=1"
+    assert client.get(url).status_code == 200
+
+    before = loads()
+    response = client.get(url)
+    assert response.status_code == 200
+    assert loads() == before
+
+
+def test_an_ooo_entry_only_re_renders_its_month(app_module, client, team, add_member):
+    add_member("Ada")
+    month_cache = app_module.teams.get(team[len("/t/") :]).month_cache
+    # The first write creates the file, which has no version to carry the cache forward from
+    seed = {"member_id": "1", "start_date": "2026-06-01", "end_date": "2026-06-02", "reason": "Seed"}
+    assert client.post(f"{team}/add_ooo", data=seed).status_code == 200
+    for month in (1, 3):
+        client.get(f"{team}/?year=2026&month={month}")
+
+    form = {"member_id": "1", "start_date": "2026-03-10", "end_date": "2026-03-11", "reason": "Dentist"}
+    assert client.post(f"{team}/add_ooo", data=form).status_code == 200
+    hits = month_cache.stats()["hits"]
+    assert client.get(f"{team}/?year=2026&month=1").status_code == 200
+    assert month_cache.stats()["hits"] == hits + 1
+    assert "Dentist" in client.get(f"{team}/?year=2026&month=3").get_data(as_text=True)
+
+
+def test_a_page_that_resolved_holidays_is_not_tagged_with_older_versions(client, team, add_member):
+    add_member("Ada", "United States")
+    url = f"{team}/?year=2045&month=7"
+    first = client.get(url)
+    assert first.status_code == 200 and first.headers.get("ETag") is None
+
+    second = client.get(url)
+    assert second.headers.get("ETag")
+    assert client.get(url, headers={"If-None-Match": second.headers["ETag"]}).status_code == 304
@@ -0,0 +1,159 @@
+import random
+from datetime import date
+
+from ooo_index import OOOIndex, parse_ordinal, to_ordinal
+
+DAY = to_ordinal("2026-01-01")
+
+
+def entry(start, end, reason="Vacation"):
+    return {"start_date": start, "end_date": end, "reason": reason}
+
+
+def random_entry(rng):
+    start = DAY + rng.randrange(60)
+    end = start + rng.randrange(10)
+    return {"start": start, "end": end, "reason": f"r{rng.randrange(1000)}"}
+
+
+def as_entry(e):
+    return entry(date.fromordinal(e["start"]).isoformat(), date.fromordinal(e["end"]).isoformat(), e["reason"])
+
+
+def scan_covering(entries, day):
+    """The first entry in list order that covers day, as (position, entry)"""
+    for position, e in enumerate(entries):
+        if e["start"] <= day <= e["end"]:
+            return position, e
+    return None
+
+
+def scan_overlapping(entries, first, last):
+    return sorted(position for position, e in enumerate(entries) if e["start"] <= last and e["end"] >= first)
+
+
+def scan_find_exact(entries, first, last):
+    for position, e in enumerate(entries):
+        if e["start"] == first and e["end"] == last:
+            return position
+    return None
+
+
+def check(index, model):
+    for member_id, entries in model.items():
+        for day in range(DAY - 2, DAY + 75):
+            interval = index.covering(member_id, day)
+            expected = scan_covering(entries, day)
+            if expected is None:
+                assert interval is None
+            else:
+                assert (interval.position, interval.entry["reason"]) == (expected[0], expected[1]["reason"])
+            assert index.is_out(member_id, day) == (expected is not None)
+
+        for first in range(DAY - 2, DAY + 75, 7):
+            last = first + 9
+            intervals = index.overlapping(member_id, first, last)
+            assert sorted(i.position for i in intervals) == scan_overlapping(entries, first, last)
+            assert [i.start for i in intervals] == sorted(i.start for i in intervals)
+
+        for e in entries:
+            interval = index.find_exact(member_id, e["start"], e["end"])
+            assert interval.position == scan_find_exact(entries, e["start"], e["end"])
+        assert index.find_exact(member_id, DAY + 100, DAY + 101) is None
+
+        # Every interval knows its current position in the member's list
+        for interval in index.overlapping(member_id, DAY - 100, DAY + 100):
+            assert entries[interval.position]["reason"] == interval.entry["reason"]
+
+
+def test_incremental_updates_match_a_linear_scan():
+    rng = random.Random(7)
+    index = OOOIndex().ensure({}, None)
+    model = {"1": [], "2": []}
+
+    for step in range(300):
+        member_id = rng.choice(["1", "2"])
+        entries = model[member_id]
+        if entries and rng.random() < 0.4:
+            position = rng.randrange(len(entries))
+            del entries[position]
+            index.remove(member_id, position)
+        else:
+            e = random_entry(rng)
+            entries.append(e)
+            index.add(member_id, as_entry(e))
+        if step % 25 == 0:
+            check(index, model)
+    check(index, model)
+
+    # A full rebuild gives the same answers as the incremental updates
+    rebuilt = OOOIndex().ensure({m: [as_entry(e) for e in entries] for m, entries in model.items()}, 1)
+    check(rebuilt, model)
+
+
+def test_remove_shifts_later_positions():
+    entries = [
+        entry("2026-01-10", "2026-01-12", "a"),
+        entry("2026-01-01", "2026-01-03", "b"),
+        entry("2026-01-20", "2026-01-20", "c"),
+    ]
+    index = OOOIndex().ensure({"1": entries}, 1)
+    index.remove("1", 0)
+    assert index.covering("1", to_ordinal("2026-01-11")) is None
+    assert index.covering("1", to_ordinal("2026-01-02")).position == 0
+    assert index.covering("1", to_ordinal("2026-01-20")).position == 1
+
+    interval = index.add("1", entry("2026-01-02", "2026-01-02", "d"))
+    assert interval.position == 2
+    # The earlier entry still wins on the day both cover
+    assert index.covering("1", to_ordinal("2026-01-02")).entry["reason"] == "b"
+
+
+def test_covering_prefers_the_first_entry_in_list_order():
+    entries = [entry("2026-01-05", "2026-01-30", "long"), entry("2026-01-10", "2026-01-10", "short")]
+    index = OOOIndex().ensure({"1": entries}, 1)
+    assert index.covering("1", to_ordinal("2026-01-10")).entry["reason"] == "long"
+    assert index.covering("1", to_ordinal("2026-01-31")) is None
+    assert index.covering("unknown", to_ordinal("2026-01-10")) is None
+
+
+def test_overlapping_finds_long_intervals_that_start_early():
+    index = OOOIndex().ensure({"1": [entry("2025-12-01", "2026-02-28"), entry("2026-01-15", "2026-01-16")]}, 1)
+    found = index.overlapping("1", to_ordinal("2026-02-01"), to_ordinal("2026-02-02"))
+    assert [i.position for i in found] == [0]
+
+
+def test_find_exact_returns_the_first_duplicate():
+    entries = [entry("2026-01-05", "2026-01-06", "a"), entry("2026-01-05", "2026-01-06", "b")]
+    index = OOOIndex().ensure({"1": entries}, 1)
+    assert index.find_exact("1", to_ordinal("2026-01-05"), to_ordinal("2026-01-06")).entry["reason"] == "a"
+    assert index.find_exact("1", to_ordinal("2026-01-05"), to_ordinal("2026-01-05")) is None
+
+
+def test_parse_ordinal_accepts_only_valid_yyyy_mm_dd():
+    assert parse_ordinal("2026-01-05") == to_ordinal("2026-01-05")
+    for value in ("x", "", None, "2026-13-01", "2026-02-30", "20260105", "2026-W02-1", 5):
+        assert parse_ordinal(value) is None
+
+
+def test_add_ooo_rejects_bad_input_without_writing(client, team, add_member):
+    member_id = add_member("Ada")
+
+    def add(start, end, member=member_id):
+        return client.post(f"{team}/add_ooo", data={"member_id": member, "start_date": start, "end_date": end})
+
+    assert add("x", "2026-01-05").status_code == 400
+    assert add("2026-01-05", "2026-01-04").status_code == 400
+    assert add("2026-01-05", "2026-01-05", member="999").status_code == 400
+    assert client.get(f"{team}/api/availability/2026-01-05").get_json()[member_id]["available"]
+
+    assert add("2026-01-05", "2026-01-06").status_code == 200
+    assert not client.get(f"{team}/api/availability/2026-01-05").get_json()[member_id]["available"]
+
+
+def test_ooo_routes_reject_bad_dates(client, team, add_member):
+    member_id = add_member("Ada")
+    assert client.post(f"{team}/delete_ooo", json={"member_id": member_id, "date": "x"}).status_code == 400
+    assert client.get(f"{team}/api/ooo_details/{member_id}/2026-02-30").status_code == 400
+    canceled = {"member_id": member_id, "start_date": "x", "end_date": "y"}
+    assert client.post(f"{team}/cancel_vacation", json=canceled).status_code == 400
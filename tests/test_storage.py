@@ -0,0 +1,108 @@
+import sqlite3
+
+from storage import JsonStorage, SqliteStorage
+
+
+def test_sqlite_database_uses_wal_and_starts_every_dataset_at_version_0(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "leave.db"))
+    assert storage._conn().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert [storage.version(dataset) for dataset in ("members", "holidays", "ooo")] == [0, 0, 0]
+
+    # Reopening an existing database keeps its versions
+    storage.put_member("1", {"name": "Ada", "country": "Utopia", "region": ""})
+    assert SqliteStorage(str(tmp_path / "leave.db")).version("members") == 1
+
+
+def test_each_write_bumps_its_datasets_by_one(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "leave.db"))
+    storage.put_member("1", {"name": "Ada", "country": "Utopia", "region": ""})
+    before = {dataset: storage.version(dataset) for dataset in ("members", "ooo")}
+    storage.add_ooo("1", {"start_date": "2026-01-05", "end_date": "2026-01-06", "reason": "Vacation"})
+    assert storage.is_next_version(before["ooo"], storage.version("ooo"))
+    assert storage.version("members") == before["members"]
+
+    # Deleting a member with OOO entries writes both datasets
+    storage.delete_member("1")
+    assert storage.version("members") == before["members"] + 1
+    assert storage.version("ooo") == before["ooo"] + 2
+    assert storage.get_ooo() == {}
+    assert not storage.is_next_version(None, 1) and not storage.is_next_version(1, 3)
+
+
+def test_members_and_holidays_are_upserted(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "leave.db"))
+    storage.put_member("1", {"name": "Ada", "country": "Utopia", "region": None})
+    storage.put_member("1", {"name": "Ada L.", "country": "Utopia", "region": "North"})
+    assert storage.get_members() == {"1": {"name": "Ada L.", "country": "Utopia", "region": "North"}}
+
+    storage.put_holiday("Utopia", None, "2026-03-01", "Founding Day")
+    storage.put_holiday("Utopia", "", "2026-03-01", "Founders' Day")
+    assert storage.get_holidays()["national"] == {"Utopia": {"2026-03-01": "Founders' Day"}}
+
+
+def test_replacing_generated_holidays_touches_only_their_units_and_keeps_custom_ones(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "leave.db"))
+    first = {
+        "national": {"Utopia": {"2025-01-01": "New Year", "2026-01-01": "New Year", "2026-05-01": "Labour Day"}},
+        "regional": {"Utopia": {"North": {"2026-08-15": "Fair"}}},
+    }
+    units = [("Utopia", "", 2025), ("Utopia", "", 2026), ("Utopia", "North", 2026)]
+    storage.add_generated_holidays(first, units)
+    storage.put_holiday("Utopia", "", "2026-05-01", "Workers' Day")
+    assert storage.get_holidays()["resolved"] == {"Utopia": {"": [2025, 2026], "North": [2026]}}
+
+    # Regenerating the national 2026 unit drops its stale dates, keeps the manual one and leaves 2025 and North alone
+    regenerated = {"national": {"Utopia": {"2025-01-01": "Ignored", "2026-01-02": "New Year (observed)"}}}
+    storage.replace_generated_holidays(regenerated, [("Utopia", "", 2026)])
+    holidays_data = storage.get_holidays()
+    assert holidays_data["national"]["Utopia"] == {
+        "2025-01-01": "New Year",
+        "2026-05-01": "Workers' Day",
+        "2026-01-02": "New Year (observed)",
+    }
+    assert holidays_data["regional"]["Utopia"]["North"] == {"2026-08-15": "Fair"}
+
+    # Adding generated holidays never overwrites a manual one
+    storage.add_generated_holidays({"national": {"Utopia": {"2026-05-01": "Labour Day"}}}, [])
+    assert storage.get_holidays()["national"]["Utopia"]["2026-05-01"] == "Workers' Day"
+
+
+def test_versioned_reads_are_rebuilt_only_after_a_write(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "leave.db"))
+    storage.put_member("1", {"name": "Ada", "country": "Utopia", "region": ""})
+    members, version = storage.get_versioned("members")
+    assert storage.get_versioned("members") == (members, version)
+    assert storage.io_stats()["members"]["reads"] == 1
+
+    # A write made through another connection is seen on the next read
+    other = SqliteStorage(str(tmp_path / "leave.db"))
+    other.put_member("2", {"name": "Bo", "country": "Erewhon", "region": ""})
+    members, newer = storage.get_versioned("members")
+    assert list(members) == ["1", "2"] and newer == version + 1
+
+
+def test_import_from_json_storage(tmp_path):
+    source = JsonStorage(str(tmp_path))
+    source.put_member("1", {"name": "Ada", "country": "Utopia", "region": "North"})
+    source.put_member("2", {"name": "Bo", "country": "Erewhon", "region": ""})
+    source.add_ooo("1", {"start_date": "2026-01-05", "end_date": "2026-01-09", "reason": "Vacation"})
+    source.add_generated_holidays({"national": {"Utopia": {"2026-01-01": "New Year"}}}, [("Utopia", "", 2026)])
+    source.put_holiday("Utopia", "North", "2026-02-02", "Northern Day")
+    source.append_history({"timestamp": "2026-01-01T09:00:00", "operation_type": "add_member", "member_id": "1"})
+
+    target = SqliteStorage(str(tmp_path / "leave.db"))
+    target.put_member("9", {"name": "Stale", "country": "Nowhere", "region": ""})
+    counts = target.import_from(source)
+
+    assert counts == {"members": 2, "ooo": 1, "holidays": 2, "history": 1}
+    assert target.get_members() == source.get_members()
+    assert target.get_ooo() == source.get_ooo()
+    holidays_data = target.get_holidays()
+    assert holidays_data["national"] == {"Utopia": {"2026-01-01": "New Year"}}
+    assert holidays_data["resolved"] == {"Utopia": {"": [2026]}}
+
+    # Manual holidays stay manual: regenerating their unit keeps them
+    target.replace_generated_holidays({"regional": {}}, [("Utopia", "North", 2026)])
+    assert target.get_holidays()["regional"] == {"Utopia": {"North": {"2026-02-02": "Northern Day"}}}
+    with sqlite3.connect(str(tmp_path / "leave.db")) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM history").fetchone()[0] == 1
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+
+def test_generating_holidays_keeps_those_of_other_teams(app_module, client, team, add_member, wait_for_job):
+    current = datetime.now().year
+    other = "/t/other-" + team.rsplit("-", 1)[1]
+    app_module.teams.create(other[3:])
+
+    # Team B's members are in Australia; viewing the calendar resolves its holidays lazily
+    response = client.post(f"{other}/add_member", data={"name": "Bo", "country": "Australia", "region": ""})
+    assert response.status_code in (200, 302)
+    assert client.get(f"{other}/?year={current}&month=1").status_code == 200
+    client.post(f"{other}/add_holiday", data={"name": "Team day", "date": f"{current}-03-03", "country": "Australia"})
+
+    # Team A (United States) views a later year, then generates its holidays
+    add_member("Ada", "United States")
+    assert client.get(f"{team}/?year={current + 3}&month=1").status_code == 200
+    job = wait_for_job(client.post(f"{team}/api/generate_holidays"))
+    assert job["status"] == "succeeded", job
+
+    with app_module.app.test_request_context():
+        holidays_data = app_module.shared_storage.get_holidays()
+    australia = holidays_data["national"]["Australia"]
+    assert f"{current}-01-01" in australia and australia[f"{current}-03-03"] == "Team day"
+    assert current in holidays_data["resolved"]["Australia"][""]
+    us_years = holidays_data["resolved"]["United States"][""]
+    assert {current, current + 1, current + 3} <= set(us_years)
+    assert f"{current + 3}-07-04" in holidays_data["national"]["United States"]
+
+
+def test_generating_holidays_refreshes_the_years_already_resolved(app_module, client, team, add_member, wait_for_job):
+    current = datetime.now().year
+    add_member("Ada", "United States")
+    assert client.get(f"{team}/?year={current - 2}&month=1").status_code == 200
+
+    job = wait_for_job(client.post(f"{team}/api/generate_holidays"))
+    assert job["status"] == "succeeded", job
+    assert {current - 2, current, current + 1} <= set(job["result"]["years"])